@@ -48,4 +48,6 @@ def eval(toml_path):
               spect_key=cfg.spect_params.spect_key,
               timebins_key=cfg.spect_params.timebins_key,
               device=cfg.eval.device,
+              max_windows_per_batch=cfg.eval.max_windows_per_batch,
+              pack_windows=cfg.eval.pack_windows,
               logger=logger)
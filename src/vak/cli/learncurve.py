@@ -66,6 +66,21 @@ def learning_curve(toml_path):
                         val_step=cfg.learncurve.val_step,
                         ckpt_step=cfg.learncurve.ckpt_step,
                         patience=cfg.learncurve.patience,
+                        spect_cache_mb=cfg.learncurve.spect_cache_mb,
+                        shared_spect_cache=cfg.learncurve.shared_spect_cache,
+                        windows_per_file=cfg.learncurve.windows_per_file,
+                        prefetch_files=cfg.learncurve.prefetch_files,
+                        samples_per_epoch=cfg.learncurve.samples_per_epoch,
+                        sample_with_replacement=cfg.learncurve.sample_with_replacement,
+                        window_stride=cfg.learncurve.window_stride,
+                        random_window_offset=cfg.learncurve.random_window_offset,
+                        preload_mb=cfg.learncurve.preload_mb,
+                        tensor_loader=cfg.learncurve.tensor_loader,
+                        pin_memory=cfg.learncurve.pin_memory,
+                        train_whole_files=cfg.learncurve.train_whole_files,
+                        val_cache_mb=cfg.learncurve.val_cache_mb,
+                        max_windows_per_batch=cfg.learncurve.max_windows_per_batch,
+                        pack_windows=cfg.learncurve.pack_windows,
                         device=cfg.learncurve.device,
                         logger=logger,
                         )
@@ -51,4 +51,7 @@ def predict(toml_path):
                  output_dir=cfg.predict.output_dir,
                  min_segment_dur=cfg.predict.min_segment_dur,
                  majority_vote=cfg.predict.majority_vote,
+                 max_windows_per_batch=cfg.predict.max_windows_per_batch,
+                 pack_windows=cfg.predict.pack_windows,
+                 output=cfg.predict.output,
                  logger=logger)
@@ -106,6 +106,7 @@ def prep(toml_path):
                                  train_dur=cfg.prep.train_dur,
                                  val_dur=cfg.prep.val_dur,
                                  test_dur=cfg.prep.test_dur,
+                                 window_store=cfg.prep.window_store,
                                  logger=logger,
                                  )
 
@@ -62,6 +62,21 @@ def train(toml_path):
                val_step=cfg.train.val_step,
                ckpt_step=cfg.train.ckpt_step,
                patience=cfg.train.patience,
+               spect_cache_mb=cfg.train.spect_cache_mb,
+               shared_spect_cache=cfg.train.shared_spect_cache,
+               windows_per_file=cfg.train.windows_per_file,
+               prefetch_files=cfg.train.prefetch_files,
+               samples_per_epoch=cfg.train.samples_per_epoch,
+               sample_with_replacement=cfg.train.sample_with_replacement,
+               window_stride=cfg.train.window_stride,
+               random_window_offset=cfg.train.random_window_offset,
+               preload_mb=cfg.train.preload_mb,
+               tensor_loader=cfg.train.tensor_loader,
+               pin_memory=cfg.train.pin_memory,
+               train_whole_files=cfg.train.train_whole_files,
+               val_cache_mb=cfg.train.val_cache_mb,
+               max_windows_per_batch=cfg.train.max_windows_per_batch,
+               pack_windows=cfg.train.pack_windows,
                device=cfg.train.device,
                logger=logger,
                )
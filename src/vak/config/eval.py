@@ -36,6 +36,17 @@ class EvalConfig:
         path to a saved SpectScaler object used to normalize spectrograms.
         If spectrograms were normalized and this is not provided, will give
         incorrect results.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram that are fed through
+        the network at once. Longer spectrograms are fed through in chunks,
+        so memory used does not depend on their duration. Default is None,
+        in which case all windows from a spectrogram are fed through at once.
+    pack_windows : int
+        if specified, windows from consecutive spectrograms are packed into
+        batches of up to this many windows, instead of each spectrogram
+        being its own batch, so that short spectrograms are fed through the network
+        together. See ``vak.datasets.samplers.WindowPackingBatchSampler``.
+        Default is None.
     """
     # required, external files
     checkpoint_path = attr.ib(converter=expanded_user_path,
@@ -64,6 +75,10 @@ class EvalConfig:
     # optional, data loader
     num_workers = attr.ib(validator=instance_of(int), default=2)
     device = attr.ib(validator=instance_of(str), default=device.get_default())
+    max_windows_per_batch = attr.ib(converter=converters.optional(int),
+                                    validator=validators.optional(instance_of(int)), default=None)
+    pack_windows = attr.ib(converter=converters.optional(int),
+                           validator=validators.optional(instance_of(int)), default=None)
 
 
 REQUIRED_EVAL_OPTIONS = [
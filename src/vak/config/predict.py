@@ -11,6 +11,18 @@ from .. import device
 from ..converters import comma_separated_list, expanded_user_path
 
 
+VALID_OUTPUTS = {'labels', 'probs'}
+
+
+def is_valid_output(instance, attribute, value):
+    if value not in VALID_OUTPUTS:
+        raise ValueError(
+            f'Value for `output`, {value}, in [PREDICT] '
+            'section of .toml file is not recognized. Must be one '
+            f'of the following: {VALID_OUTPUTS}'
+        )
+
+
 @attr.s
 class PredictConfig:
     """class that represents [PREDICT] section of config.toml file
@@ -57,6 +69,21 @@ class PredictConfig:
         applied if the labelmap contains an 'unlabeled' label,
         because unlabeled segments makes it possible to identify
         the labeled segments. Default is False.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram that are fed through
+        the network at once. Longer spectrograms are fed through in chunks,
+        so memory used does not depend on their duration. Default is None,
+        in which case all windows from a spectrogram are fed through at once.
+    pack_windows : int
+        if specified, windows from consecutive spectrograms are packed into
+        batches of up to this many windows, instead of each spectrogram
+        being its own batch, so that short spectrograms are fed through the network
+        together. See ``vak.datasets.samplers.WindowPackingBatchSampler``.
+        Default is None.
+    output : str
+        what is kept from the output of the network for each file. One of {'labels', 'probs'}.
+        'probs' also saves the probabilities for each class in ``output_dir``.
+        See ``vak.core.predict``. Default is 'labels'.
     """
     # required, external files
     checkpoint_path = attr.ib(converter=expanded_user_path,
@@ -89,6 +116,11 @@ class PredictConfig:
     output_dir = attr.ib(converter=expanded_user_path, validator=is_a_directory, default=Path(os.getcwd()))
     min_segment_dur = attr.ib(validator=validators.optional(instance_of(float)), default=None)
     majority_vote = attr.ib(validator=instance_of(bool), default=True)
+    max_windows_per_batch = attr.ib(converter=converters.optional(int),
+                                    validator=validators.optional(instance_of(int)), default=None)
+    pack_windows = attr.ib(converter=converters.optional(int),
+                           validator=validators.optional(instance_of(int)), default=None)
+    output = attr.ib(validator=[instance_of(str), is_valid_output], default='labels')
 
 
 REQUIRED_PREDICT_OPTIONS = [
@@ -78,6 +78,10 @@ class PrepConfig:
         total duration of validation set, in seconds.
     test_dur : float
         total duration of test set, in seconds.
+    window_store : bool
+        if True, save all spectrograms from the training split in a single
+        array file that can be memory-mapped by ``vak.datasets.WindowDataset``.
+        See ``vak.io.window_store`` for details. Default is False.
     """
     data_dir = attr.ib(converter=expanded_user_path, validator=is_a_directory)
     output_dir = attr.ib(converter=expanded_user_path, validator=is_a_directory)
@@ -104,6 +108,7 @@ class PrepConfig:
     test_dur = attr.ib(converter=converters.optional(duration_from_toml_value),
                        validator=validators.optional(is_valid_duration),
                        default=None)
+    window_store = attr.ib(validator=instance_of(bool), default=False)
 
 
 REQUIRED_PREP_OPTIONS = [
@@ -26,6 +26,42 @@ def is_valid_transform_type(instance, attribute, value):
         )
 
 
+VALID_STORAGE_DTYPES = {'float16', 'uint8'}
+
+
+def is_valid_storage_dtype(instance, attribute, value):
+    if value not in VALID_STORAGE_DTYPES:
+        raise ValueError(
+            f'Value for `storage_dtype`, {value}, in [SPECT_PARAMS] '
+            'section of .toml file is not recognized. Must be one '
+            f'of the following: {VALID_STORAGE_DTYPES}'
+        )
+
+
+VALID_BACKENDS = {'numpy', 'torch'}
+
+
+def is_valid_backend(instance, attribute, value):
+    if value not in VALID_BACKENDS:
+        raise ValueError(
+            f'Value for `backend`, {value}, in [SPECT_PARAMS] '
+            'section of .toml file is not recognized. Must be one '
+            f'of the following: {VALID_BACKENDS}'
+        )
+
+
+VALID_DTYPES = {'float32', 'float64'}
+
+
+def is_valid_dtype(instance, attribute, value):
+    if value not in VALID_DTYPES:
+        raise ValueError(
+            f'Value for `dtype`, {value}, in [SPECT_PARAMS] '
+            'section of .toml file is not recognized. Must be one '
+            f'of the following: {VALID_DTYPES}'
+        )
+
+
 @attr.s
 class SpectParamsConfig:
     """represents parameters for making spectrograms from audio and saving in files
@@ -56,6 +92,22 @@ class SpectParamsConfig:
     audio_path_key : str
         key for accessing path to source audio file for spectogram in files.
         Default is 'audio_path'.
+    storage_dtype : str
+        one of {'float16', 'uint8'}. If specified, spectrograms are quantized to this
+        data type when they are saved in files, to reduce the size of files.
+        'uint8' saves a scale and offset for each file that are used to convert back.
+        Spectrograms are always loaded as float32 by ``vak.files.spect.load``.
+        Default is None, in which case spectrograms are saved without quantizing.
+    dtype : str
+        one of {'float32', 'float64'}. Floating point data type that spectrograms
+        are computed in. 'float32' is faster and uses half the memory.
+        Default is 'float64'.
+    backend : str
+        one of {'numpy', 'torch'}. Library used to compute spectrograms.
+        'numpy' computes each spectrogram with NumPy and SciPy, in parallel across files with dask.
+        'torch' computes spectrograms for batches of audio files with the same number of samples
+        using ``torch.stft``, on the CPU, with torch's intra-op thread pool,
+        see ``vak.spect.spectrograms_torch``. Default is 'numpy'.
     """
     fft_size = attr.ib(converter=int, validator=instance_of(int), default=512)
     step_size = attr.ib(converter=int, validator=instance_of(int), default=64)
@@ -70,6 +122,10 @@ class SpectParamsConfig:
     freqbins_key = attr.ib(validator=instance_of(str), default='f')
     timebins_key = attr.ib(validator=instance_of(str), default='t')
     audio_path_key = attr.ib(validator=instance_of(str), default='audio_path')
+    storage_dtype = attr.ib(validator=validators.optional([instance_of(str), is_valid_storage_dtype]),
+                            default=None)
+    dtype = attr.ib(validator=[instance_of(str), is_valid_dtype], default='float64')
+    backend = attr.ib(validator=[instance_of(str), is_valid_backend], default='numpy')
 
 
 def parse_spect_params_config(config_toml, toml_path):
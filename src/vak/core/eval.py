@@ -8,6 +8,8 @@ import torch.utils.data
 
 from .. import models
 from .. import transforms
+from ..datasets.collate import pack_windows as pack_windows_collate
+from ..datasets.samplers import WindowPackingBatchSampler
 from ..datasets.vocal_dataset import VocalDataset
 from ..logging import log_or_print
 
@@ -24,6 +26,8 @@ def eval(csv_path,
          spect_key='s',
          timebins_key='t',
          device=None,
+         max_windows_per_batch=None,
+         pack_windows=None,
          logger=None):
     """evaluate a trained model
 
@@ -64,6 +68,17 @@ def eval(csv_path,
     device : str
         Device on which to work with model + data.
         Defaults to 'cuda' if torch.cuda.is_available is True.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram that are fed through
+        the network at once. Longer spectrograms are fed through in chunks,
+        so memory used does not depend on their duration. Default is None,
+        in which case all windows from a spectrogram are fed through at once.
+    pack_windows : int
+        if specified, windows from consecutive spectrograms are packed into
+        batches of up to this many windows, instead of each spectrogram
+        being its own batch, so that short spectrograms are fed through the network
+        together. See ``vak.datasets.samplers.WindowPackingBatchSampler``.
+        Default is None.
 
     Other Parameters
     ----------------
@@ -114,11 +129,23 @@ def eval(csv_path,
                                         timebins_key=timebins_key,
                                         item_transform=item_transform,
                                         )
-    val_data = torch.utils.data.DataLoader(dataset=val_dataset,
-                                           shuffle=False,
-                                           # batch size 1 because each spectrogram reshaped into a batch of windows
-                                           batch_size=1,
-                                           num_workers=num_workers)
+    if pack_windows:
+        log_or_print(
+            f'packing windows from consecutive spectrograms into batches of up to {pack_windows} windows',
+            logger=logger, level='info'
+        )
+        val_data = torch.utils.data.DataLoader(dataset=val_dataset,
+                                               batch_sampler=WindowPackingBatchSampler.from_dataset(
+                                                   val_dataset, window_size, max_windows=pack_windows
+                                               ),
+                                               collate_fn=pack_windows_collate,
+                                               num_workers=num_workers)
+    else:
+        val_data = torch.utils.data.DataLoader(dataset=val_dataset,
+                                               shuffle=False,
+                                               # batch size 1 because each spectrogram reshaped into a batch of windows
+                                               batch_size=1,
+                                               num_workers=num_workers)
 
     # ---------------- do the actual evaluating ------------------------------------------------------------------------
     input_shape = val_dataset.shape
@@ -140,7 +167,8 @@ def eval(csv_path,
         )
         model.load(checkpoint_path)
         metric_vals = model.evaluate(eval_data=val_data,
-                                     device=device)
+                                     device=device,
+                                     max_windows_per_batch=max_windows_per_batch)
         # create a "DataFrame" with just one row which we will save as a csv;
         # the idea is to be able to concatenate csvs from multiple runs of eval
         row = OrderedDict(
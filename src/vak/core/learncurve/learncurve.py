@@ -12,6 +12,7 @@ from ... import (
     labels
 )
 from ...converters import expanded_user_path
+from ...datasets.window_index import WindowIndex
 from ...logging import log_or_print
 from ...paths import generate_results_dir_name_as_path
 
@@ -35,6 +36,21 @@ def learning_curve(model_config_map,
                    val_step=None,
                    ckpt_step=None,
                    patience=None,
+                   spect_cache_mb=None,
+                   shared_spect_cache=False,
+                   windows_per_file=None,
+                   prefetch_files=None,
+                   samples_per_epoch=None,
+                   sample_with_replacement=False,
+                   window_stride=1,
+                   random_window_offset=False,
+                   preload_mb=None,
+                   tensor_loader=False,
+                   pin_memory=False,
+                   train_whole_files=False,
+                   val_cache_mb=None,
+                   max_windows_per_batch=None,
+                   pack_windows=None,
                    device=None,
                    logger=None,
                    ):
@@ -112,6 +128,81 @@ def learning_curve(model_config_map,
         number of validation steps to wait without performance on the
         validation set improving before stopping the training.
         Default is None, in which case training only stops after the specified number of epochs.
+    spect_cache_mb : float
+        maximum size, in megabytes, of the cache of spectrograms that each
+        DataLoader worker keeps, so windows from the same file do not require
+        loading the file again. Default is None, in which case no cache is used.
+    shared_spect_cache : bool
+        if True, spect_cache_mb is instead the maximum size of a single cache
+        held in shared memory, that all DataLoader workers use, so that each file
+        is loaded by only one worker. Requires Python 3.8 or later. Default is False.
+    windows_per_file : int
+        if specified, and shuffle is True, training windows are shuffled in chunks of
+        this many windows that all come from the same spectrogram file,
+        using vak.datasets.samplers.FileLocalitySampler.
+        Combine with spect_cache_mb so that each file is loaded once per chunk.
+        Default is None, in which case windows are shuffled individually.
+    prefetch_files : int
+        if specified, spectrogram files needed for upcoming training windows,
+        and upcoming items in the validation set, are read this many files ahead
+        by background threads, using vak.datasets.samplers.PrefetchSampler.
+        Combine with shared_spect_cache so that prefetched files are loaded into
+        the cache that DataLoader workers use. Default is None.
+    samples_per_epoch : int
+        if specified, each epoch consists of this many randomly drawn training windows,
+        instead of every window in the training set, so that the time an epoch takes
+        does not depend on the size of the training set. Requires shuffle to be True.
+        If windows_per_file is also specified, windows are drawn in chunks from the same file.
+        Default is None.
+    sample_with_replacement : bool
+        if True, and samples_per_epoch is specified, windows are drawn with replacement.
+        Default is False. Not used when windows_per_file is specified.
+    window_stride : int
+        keep only every ``window_stride``-th valid start of a training window,
+        so that one epoch does not consist of windows that overlap almost entirely.
+        Default is 1, in which case every time bin is the start of a window.
+    random_window_offset : bool
+        if True, and window_stride is greater than 1, the first window start kept
+        in each run of valid starts is chosen at random, again every epoch. Default is False.
+    preload_mb : float
+        memory budget, in megabytes, for preloading training and validation sets.
+        If specified, each dataset whose spectrograms fit within this budget is loaded
+        into memory once, standardized if normalize_spectrograms is True, and windows
+        are then taken from memory instead of from files. Datasets that do not fit
+        are loaded lazily from files. Default is None, in which case nothing is preloaded.
+    tensor_loader : bool
+        if True, and the training set was preloaded (see preload_mb), batches of training
+        windows are taken directly from tensors on the training device by a
+        vak.datasets.WindowTensorLoader, instead of by a DataLoader with worker processes.
+        Default is False.
+    pin_memory : bool
+        if True, and tensor_loader is True, the tensors that training windows are taken from
+        are kept in pinned memory on the CPU instead of on the training device,
+        so that copying each batch to a GPU is faster. Use when the training set fits
+        in memory but not on the GPU. Default is False.
+    train_whole_files : bool
+        if True, train on whole spectrograms instead of on windows. Spectrograms
+        are padded to the same width in each batch, padding is excluded from the loss,
+        and batches contain spectrograms of similar widths to minimize padding.
+        Options that only apply to windows, such as window_stride, windows_per_file,
+        and tensor_loader, are ignored. Training subsets then contain all of each
+        spectrogram in the subset, so their durations can be larger than train_set_durs.
+        Default is False.
+    val_cache_mb : float
+        if specified, the batches of the validation set are kept in memory
+        after they are loaded and transformed for the first validation step,
+        and are reused on later validation steps, if they fit within this
+        many megabytes. Default is None, in which case the validation set
+        is loaded from files at every validation step.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram that are fed through
+        the network at once when evaluating on the validation and test sets.
+        Longer spectrograms are fed through in chunks. Default is None,
+        in which case all windows from a spectrogram are fed through at once.
+    pack_windows : int
+        if specified, windows from consecutive spectrograms in the validation and test sets
+        are packed into batches of up to this many windows, instead of each spectrogram
+        being its own batch. Default is None.
 
     Other Parameters
     ----------------
@@ -236,10 +327,17 @@ def learning_curve(model_config_map,
                 logger=logger, level='info'
             )
 
-            window_dataset_kwargs = {}
-            for window_dataset_kwarg in ['spect_id_vector', 'spect_inds_vector', 'x_inds']:
-                window_dataset_kwargs[window_dataset_kwarg] = np.load(
-                    this_train_dur_this_replicate_results_path.joinpath(f'{window_dataset_kwarg}.npy'))
+            window_index_path = this_train_dur_this_replicate_results_path.joinpath(
+                _train_dur_csv_paths.WINDOW_INDEX_FNAME
+            )
+            if window_index_path.exists():
+                window_index = WindowIndex.load(window_index_path)
+            else:
+                # results from previous versions of vak have vectors saved instead of a window index
+                window_index = WindowIndex.from_vectors(*[
+                    np.load(this_train_dur_this_replicate_results_path.joinpath(f'{vec_name}.npy'))
+                    for vec_name in ('spect_id_vector', 'spect_inds_vector', 'x_inds')
+                ])
 
             train(model_config_map,
                   this_train_dur_this_replicate_csv_path,
@@ -256,9 +354,24 @@ def learning_curve(model_config_map,
                   val_step=val_step,
                   ckpt_step=ckpt_step,
                   patience=patience,
+                  spect_cache_mb=spect_cache_mb,
+                  shared_spect_cache=shared_spect_cache,
+                  windows_per_file=windows_per_file,
+                  prefetch_files=prefetch_files,
+                  samples_per_epoch=samples_per_epoch,
+                  sample_with_replacement=sample_with_replacement,
+                  window_stride=window_stride,
+                  random_window_offset=random_window_offset,
+                  preload_mb=preload_mb,
+                  tensor_loader=tensor_loader,
+                  pin_memory=pin_memory,
+                  train_whole_files=train_whole_files,
+                  val_cache_mb=val_cache_mb,
+                  max_windows_per_batch=max_windows_per_batch,
+                  pack_windows=pack_windows,
                   device=device,
                   logger=logger,
-                  **window_dataset_kwargs
+                  window_index=window_index,
                   )
 
             log_or_print(
@@ -317,6 +430,8 @@ def learning_curve(model_config_map,
                      spect_key=spect_key,
                      timebins_key=timebins_key,
                      device=device,
+                     max_windows_per_batch=max_windows_per_batch,
+                     pack_windows=pack_windows,
                      logger=logger)
 
     # ---- make a csv for analysis -------------------------------------------------------------------------------------
@@ -4,11 +4,11 @@ from pprint import pprint
 import re
 import shutil
 
-import numpy as np
 import pandas as pd
 
 from vak import split
 from vak.datasets.window_dataset import WindowDataset
+from vak.datasets.window_index import WindowIndex
 from vak.logging import log_or_print
 
 
@@ -16,6 +16,11 @@ from vak.logging import log_or_print
 CSV_GLOB = '**/*prep*csv'
 # pattern used by re to get training subset duration
 TRAIN_DUR_PAT = r'train_dur_(\d+\.\d+|\d+)s'
+# name of file saved in the results directory of each replicate,
+# containing the vak.datasets.WindowIndex used with the WindowDataset for that replicate
+WINDOW_INDEX_FNAME = 'window_index.npz'
+# files containing vectors used with WindowDataset, saved instead of WindowIndex by previous versions of vak
+SPECT_VECTOR_FNAMES = ('spect_id_vector.npy', 'spect_inds_vector.npy', 'x_inds.npy')
 
 
 def from_dir(previous_run_path,
@@ -142,28 +147,16 @@ def from_dir(previous_run_path,
                             dst=results_path_this_replicate.joinpath(csv_path.name))
             )
 
-            subset_df = pd.read_csv(csv_path)
-            # ---- use *just* train subset to get spect vectors for WindowDataset
-            (spect_id_vector,
-             spect_inds_vector,
-             x_inds) = WindowDataset.spect_vectors_from_df(subset_df,
-                                                           window_size,
-                                                           spect_key,
-                                                           timebins_key,
-                                                           crop_dur=train_dur,
-                                                           timebin_dur=timebin_dur,
-                                                           labelmap=labelmap)
-            for vec_name, vec in zip(['spect_id_vector', 'spect_inds_vector', 'x_inds'],
-                                     [spect_id_vector, spect_inds_vector, x_inds]):
-                np.save(results_path_this_replicate.joinpath(f'{vec_name}.npy'),
-                        vec)
-
-            # also need to copy the spect_id_vectors, etc. used with WindowDataset
-            for vec_name in ('spect_id_vector', 'spect_inds_vector', 'x_inds'):
-                src_vec_path = csv_path.parent.joinpath(f'{vec_name}.npy')
+            # also need to copy the window index used with WindowDataset,
+            # or the spect_id_vector, etc. if the previous run is from an older version of vak
+            if csv_path.parent.joinpath(WINDOW_INDEX_FNAME).exists():
+                src_paths = [csv_path.parent.joinpath(WINDOW_INDEX_FNAME)]
+            else:
+                src_paths = [csv_path.parent.joinpath(vec_fname) for vec_fname in SPECT_VECTOR_FNAMES]
+            for src_path in src_paths:
                 shutil.copy(
-                    src=src_vec_path,
-                    dst=results_path_this_replicate.joinpath(src_vec_path.name)
+                    src=src_path,
+                    dst=results_path_this_replicate.joinpath(src_path.name)
                 )
 
         train_dur_csv_paths[train_dur] = new_csv_paths
@@ -260,10 +253,9 @@ def from_df(dataset_df,
                                                            crop_dur=train_dur,
                                                            timebin_dur=timebin_dur,
                                                            labelmap=labelmap)
-            for vec_name, vec in zip(['spect_id_vector', 'spect_inds_vector', 'x_inds'],
-                                     [spect_id_vector, spect_inds_vector, x_inds]):
-                np.save(results_path_this_replicate.joinpath(f'{vec_name}.npy'),
-                        vec)
+            WindowIndex.from_vectors(spect_id_vector,
+                                     spect_inds_vector,
+                                     x_inds).save(results_path_this_replicate.joinpath(WINDOW_INDEX_FNAME))
             # keep the same validation and test set by concatenating them with the train subset
             subset_df = pd.concat(
                 (subset_df,
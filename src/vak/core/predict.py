@@ -1,6 +1,7 @@
 import json
 import os
 from pathlib import Path
+import tempfile
 
 import crowsetta
 import joblib
@@ -16,9 +17,37 @@ from ..logging import log_or_print
 from .. import models
 from .. import transforms
 from ..datasets import VocalDataset
+from ..datasets.collate import pack_windows as pack_windows_collate
+from ..datasets.samplers import WindowPackingBatchSampler
 from ..device import get_default as get_default_device
 
 
+def _append_annot(annot, annot_csv_file, tmp_csv_path, write_header):
+    """append a crowsetta.Annotation to an open .csv file of annotations.
+
+    The annotation is written to a temporary file with ``crowsetta.csv.annot2csv``,
+    and then the lines of that file are appended, so that the .csv file
+    has exactly the format that crowsetta writes and reads.
+
+    Parameters
+    ----------
+    annot : crowsetta.Annotation
+        annotation to append.
+    annot_csv_file : file object
+        .csv file of annotations, opened for writing with ``newline=''``.
+    tmp_csv_path : pathlib.Path
+        path to temporary file that annotation is written to. Overwritten each time.
+    write_header : bool
+        if True, also append the header written by crowsetta,
+        i.e. for the first annotation in the file.
+    """
+    crowsetta.csv.annot2csv(annot=[annot], csv_filename=tmp_csv_path)
+    with tmp_csv_path.open('r', newline='') as tmp_csv_file:
+        if not write_header:
+            next(tmp_csv_file, None)
+        annot_csv_file.writelines(tmp_csv_file)
+
+
 def predict(csv_path,
             checkpoint_path,
             labelmap_path,
@@ -33,11 +62,19 @@ def predict(csv_path,
             output_dir=None,
             min_segment_dur=None,
             majority_vote=False,
+            max_windows_per_batch=None,
+            pack_windows=None,
+            output='labels',
             logger=None,
             ):
     """make predictions on dataset with trained model specified in config.toml file.
     Function called by command-line interface.
 
+    Predictions are made in a single pass through the dataset:
+    each spectrogram file is loaded once, and for each file the output of the network
+    is converted to labeled timebins, then to segments, and then to an annotation,
+    that is written to the .csv file of annotations before the next file is processed.
+
     Parameters
     ----------
     csv_path : str
@@ -85,6 +122,24 @@ def predict(csv_path,
         applied if the labelmap contains an 'unlabeled' label,
         because unlabeled segments makes it possible to identify
         the labeled segments. Default is False.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram that are fed through
+        the network at once. Longer spectrograms are fed through in chunks,
+        so memory used does not depend on their duration. Default is None,
+        in which case all windows from a spectrogram are fed through at once.
+    pack_windows : int
+        if specified, windows from consecutive spectrograms are packed into
+        batches of up to this many windows, instead of each spectrogram
+        being its own batch, so that short spectrograms are fed through the network
+        together. See ``vak.datasets.samplers.WindowPackingBatchSampler``.
+        Default is None.
+    output : str
+        what is kept from the output of the network for each file. One of {'labels', 'probs'}.
+        'labels' keeps only the predicted label for each time bin, that is converted to
+        the annotation. 'probs' also saves the probabilities for each class as float16 arrays,
+        one .npy file per spectrogram, in a directory in ``output_dir`` named after
+        the dataset .csv, with '.probs' appended to it; the annotation is made from the labels
+        with the highest probability. See ``vak.engine.model.Model.predict``. Default is 'labels'.
 
     Other Parameters
     ----------------
@@ -105,6 +160,11 @@ def predict(csv_path,
             f'value specified for output_dir is not recognized as a directory: {output_dir}'
         )
 
+    if output not in {'labels', 'probs'}:
+        raise ValueError(
+            f"output must be one of {{'labels', 'probs'}}, but was: {output}"
+        )
+
     if device is None:
         device = get_default_device()
 
@@ -134,13 +194,26 @@ def predict(csv_path,
                                          spect_key=spect_key,
                                          timebins_key=timebins_key,
                                          item_transform=item_transform,
+                                         return_timebins=True,
                                          )
 
-    pred_data = torch.utils.data.DataLoader(dataset=pred_dataset,
-                                            shuffle=False,
-                                            # batch size 1 because each spectrogram reshaped into a batch of windows
-                                            batch_size=1,
-                                            num_workers=num_workers)
+    if pack_windows:
+        log_or_print(
+            f'packing windows from consecutive spectrograms into batches of up to {pack_windows} windows',
+            logger=logger, level='info'
+        )
+        pred_data = torch.utils.data.DataLoader(dataset=pred_dataset,
+                                                batch_sampler=WindowPackingBatchSampler.from_dataset(
+                                                    pred_dataset, window_size, max_windows=pack_windows
+                                                ),
+                                                collate_fn=pack_windows_collate,
+                                                num_workers=num_workers)
+    else:
+        pred_data = torch.utils.data.DataLoader(dataset=pred_dataset,
+                                                shuffle=False,
+                                                # batch size 1 because each spectrogram reshaped into a batch of windows
+                                                batch_size=1,
+                                                num_workers=num_workers)
 
     # ---------------- set up to convert predictions to annotation files -----------------------------------------------
     if annot_csv_filename is None:
@@ -148,6 +221,13 @@ def predict(csv_path,
     annot_csv_path = Path(output_dir).joinpath(annot_csv_filename)
     log_or_print(f'will save annotations in .csv file: {annot_csv_path}',
                  logger=logger, level='info')
+    if output == 'probs':
+        probs_dir = Path(output_dir).joinpath(Path(csv_path).stem + '.probs')
+        probs_dir.mkdir(exist_ok=True)
+        log_or_print(f'will save probabilities in directory: {probs_dir}',
+                     logger=logger, level='info')
+    else:
+        probs_dir = None
 
     dataset_df = pd.read_csv(csv_path)
     timebin_dur = io.dataframe.validate_and_get_timebin_dur(dataset_df)
@@ -175,40 +255,38 @@ def predict(csv_path,
         log_or_print(f'loading checkpoint for {model_name} from path: {checkpoint_path}',
                      logger=logger, level='info')
         model.load(checkpoint_path)
-        log_or_print(f'running predict method of {model_name}',
+        log_or_print(f'running predict method of {model_name}, '
+                     'and converting predictions to annotations',
                      logger=logger, level='info')
-        pred_dict = model.predict(pred_data=pred_data,
-                                  device=device)
 
-        # ----------------  converting to annotations ------------------------------------------------------------------
-        progress_bar = tqdm(pred_data)
+        progress_bar = tqdm(model.predict_batches(pred_data=pred_data,
+                                                  device=device,
+                                                  max_windows_per_batch=max_windows_per_batch,
+                                                  output=output,
+                                                  probs_dir=probs_dir),
+                            total=len(pred_dataset))
+        with annot_csv_path.open('w', newline='') as annot_csv_file, tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_csv_path = Path(tmp_dir).joinpath(annot_csv_path.name)
+            n_annots = 0
+            # predictions have padding removed already, by ``Model.predict_batches``
+            for batch, y_pred in progress_bar:
+                spect_path = batch['spect_path']
+                if isinstance(spect_path, list) and len(spect_path) == 1:
+                    spect_path = spect_path[0]
+                if output == 'probs':
+                    y_pred = np.argmax(y_pred, axis=0)
 
-        annots = []
-        log_or_print('converting predictions to annotations',
-                     logger=logger, level='info')
-        for ind, batch in enumerate(progress_bar):
-            padding_mask, spect_path = batch['padding_mask'], batch['spect_path']
-            padding_mask = np.squeeze(padding_mask)
-            if isinstance(spect_path, list) and len(spect_path) == 1:
-                spect_path = spect_path[0]
-            y_pred = pred_dict[spect_path]
-            y_pred = torch.argmax(y_pred, dim=1)  # assumes class dimension is 1
-            y_pred = torch.flatten(y_pred).cpu().numpy()[padding_mask]
-
-            spect_dict = files.spect.load(spect_path)
-            t = spect_dict[timebins_key]
-            labels, onsets_s, offsets_s = labeled_timebins.lbl_tb2segments(y_pred,
-                                                                           labelmap=labelmap,
-                                                                           t=t,
-                                                                           min_segment_dur=min_segment_dur,
-                                                                           majority_vote=majority_vote)
-            seq = crowsetta.Sequence.from_keyword(labels=labels,
-                                                  onsets_s=onsets_s,
-                                                  offsets_s=offsets_s)
-
-            audio_fname = files.spect.find_audio_fname(spect_path)
-            annot = crowsetta.Annotation(seq=seq, audio_path=audio_fname, annot_path=annot_csv_path.name)
-            annots.append(annot)
-
-        crowsetta.csv.annot2csv(annot=annots,
-                                csv_filename=annot_csv_path)
+                t = np.squeeze(batch['timebins'].numpy())
+                labels, onsets_s, offsets_s = labeled_timebins.lbl_tb2segments(y_pred,
+                                                                               labelmap=labelmap,
+                                                                               t=t,
+                                                                               min_segment_dur=min_segment_dur,
+                                                                               majority_vote=majority_vote)
+                seq = crowsetta.Sequence.from_keyword(labels=labels,
+                                                      onsets_s=onsets_s,
+                                                      offsets_s=offsets_s)
+
+                audio_fname = files.spect.find_audio_fname(spect_path)
+                annot = crowsetta.Annotation(seq=seq, audio_path=audio_fname, annot_path=annot_csv_path.name)
+                _append_annot(annot, annot_csv_file, tmp_csv_path, write_header=(n_annots == 0))
+                n_annots += 1
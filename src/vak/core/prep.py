@@ -4,7 +4,7 @@ import warnings
 
 from .. import split
 from ..converters import expanded_user_path, labelset_to_set
-from ..io import dataframe
+from ..io import dataframe, window_store as window_store_module
 from ..logging import log_or_print
 
 
@@ -28,6 +28,7 @@ def prep(data_dir,
          train_dur=None,
          val_dur=None,
          test_dur=None,
+         window_store=False,
          logger=None,
          ):
     """prepare datasets from vocalizations.
@@ -75,6 +76,11 @@ def prep(data_dir,
         total duration of validation set, in seconds. Default is None.
     test_dur : float
         total duration of test set, in seconds. Default is None.
+    window_store : bool
+        if True, save all spectrograms from the training split in a single
+        array file that can be memory-mapped by ``vak.datasets.WindowDataset``,
+        and add the location of each spectrogram in that file to the .csv.
+        See ``vak.io.window_store`` for details. Default is False.
 
     Other Parameters
     ----------------
@@ -230,6 +236,26 @@ def prep(data_dir,
 
         vak_df = dataframe.add_split_col(vak_df, split=split_name)
 
+    if window_store:
+        if (vak_df['split'] == 'train').any():
+            store_path = output_dir.joinpath(f'{csv_fname_stem}{window_store_module.WINDOW_STORE_EXT}')
+            if spect_params is None:
+                spect_key = 's'
+            elif type(spect_params) is dict:
+                spect_key = spect_params.get('spect_key', 's')
+            else:
+                spect_key = spect_params.spect_key
+            vak_df = window_store_module.to_window_store(vak_df,
+                                                         store_path,
+                                                         split='train',
+                                                         spect_key=spect_key,
+                                                         logger=logger)
+        else:
+            log_or_print(
+                msg='window_store is True but dataset has no training split, will not save window store',
+                logger=logger, level='warning'
+            )
+
     log_or_print(msg=f'saving dataset as a .csv file: {csv_path}', logger=logger, level='info')
     vak_df.to_csv(csv_path, index=False)  # index is False to avoid having "Unnamed: 0" column when loading
 
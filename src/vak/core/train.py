@@ -10,6 +10,12 @@ from .. import labels
 from .. import models
 from .. import summary_writer
 from .. import transforms
+from ..datasets.cache import SharedSpectCache, SpectCache
+from ..datasets.cached_loader import CachedLoader
+from ..datasets.collate import pack_windows as pack_windows_collate, pad_collate
+from ..datasets.samplers import (FileLocalitySampler, LengthBucketBatchSampler, PrefetchSampler,
+                                RandomWindowSampler, WindowPackingBatchSampler)
+from ..datasets.tensor_loader import WindowTensorLoader
 from ..datasets.window_dataset import WindowDataset
 from ..datasets.vocal_dataset import VocalDataset
 from ..device import get_default as get_default_device
@@ -33,10 +39,26 @@ def train(model_config_map,
           spect_id_vector=None,
           spect_inds_vector=None,
           x_inds=None,
+          window_index=None,
           shuffle=True,
           val_step=None,
           ckpt_step=None,
           patience=None,
+          spect_cache_mb=None,
+          shared_spect_cache=False,
+          windows_per_file=None,
+          prefetch_files=None,
+          samples_per_epoch=None,
+          sample_with_replacement=False,
+          window_stride=1,
+          random_window_offset=False,
+          preload_mb=None,
+          tensor_loader=False,
+          pin_memory=False,
+          train_whole_files=False,
+          val_cache_mb=None,
+          max_windows_per_batch=None,
+          pack_windows=None,
           device=None,
           logger=None,
           ):
@@ -101,6 +123,10 @@ def train(model_config_map,
         spect_inds_vector to index into the spectrogram itself
         and get the window.
         Default is None.
+    window_index : vak.datasets.window_index.WindowIndex
+        Parameter for WindowDataset. Compact representation of
+        spect_id_vector, spect_inds_vector, and x_inds, that can be
+        specified instead of those vectors. Default is None.
     val_step : int
         Step on which to estimate accuracy using validation set.
         If val_step is n, then validation is carried out every time
@@ -115,6 +141,82 @@ def train(model_config_map,
         number of validation steps to wait without performance on the
         validation set improving before stopping the training.
         Default is None, in which case training only stops after the specified number of epochs.
+    spect_cache_mb : float
+        maximum size, in megabytes, of the cache of spectrograms that each
+        DataLoader worker keeps, so windows from the same file do not require
+        loading the file again. Default is None, in which case no cache is used.
+    shared_spect_cache : bool
+        if True, spect_cache_mb is instead the maximum size of a single cache
+        held in shared memory, that all DataLoader workers use, so that each file
+        is loaded by only one worker. Requires Python 3.8 or later. Default is False.
+    windows_per_file : int
+        if specified, and shuffle is True, training windows are shuffled in chunks of
+        this many windows that all come from the same spectrogram file,
+        using vak.datasets.samplers.FileLocalitySampler.
+        Combine with spect_cache_mb so that each file is loaded once per chunk.
+        Default is None, in which case windows are shuffled individually.
+    prefetch_files : int
+        if specified, spectrogram files needed for upcoming training windows,
+        and upcoming items in the validation set, are read this many files ahead
+        by background threads, using vak.datasets.samplers.PrefetchSampler.
+        Combine with shared_spect_cache so that prefetched files are loaded into
+        the cache that DataLoader workers use. Default is None.
+    samples_per_epoch : int
+        if specified, each epoch consists of this many randomly drawn training windows,
+        instead of every window in the training set, so that the time an epoch takes
+        does not depend on the size of the training set. Requires shuffle to be True.
+        If windows_per_file is also specified, windows are drawn in chunks from the same file.
+        Default is None.
+    sample_with_replacement : bool
+        if True, and samples_per_epoch is specified, windows are drawn with replacement.
+        Default is False. Not used when windows_per_file is specified.
+    window_stride : int
+        keep only every ``window_stride``-th valid start of a training window,
+        so that one epoch does not consist of windows that overlap almost entirely.
+        Default is 1, in which case every time bin is the start of a window.
+    random_window_offset : bool
+        if True, and window_stride is greater than 1, the first window start kept
+        in each run of valid starts is chosen at random, again every epoch. Default is False.
+    preload_mb : float
+        memory budget, in megabytes, for preloading training and validation sets.
+        If specified, each dataset whose spectrograms fit within this budget is loaded
+        into memory once, standardized if normalize_spectrograms is True, and windows
+        are then taken from memory instead of from files. Datasets that do not fit
+        are loaded lazily from files. Default is None, in which case nothing is preloaded.
+    tensor_loader : bool
+        if True, and the training set was preloaded (see preload_mb), batches of training
+        windows are taken directly from tensors on the training device by a
+        vak.datasets.WindowTensorLoader, instead of by a DataLoader with worker processes.
+        Default is False.
+    pin_memory : bool
+        if True, and tensor_loader is True, the tensors that training windows are taken from
+        are kept in pinned memory on the CPU instead of on the training device,
+        so that copying each batch to a GPU is faster. Use when the training set fits
+        in memory but not on the GPU. Default is False.
+    train_whole_files : bool
+        if True, train on whole spectrograms instead of on windows. Spectrograms
+        are padded to the same width in each batch, padding is excluded from the loss,
+        and batches contain spectrograms of similar widths to minimize padding.
+        Options that only apply to windows, such as window_stride, windows_per_file,
+        and tensor_loader, are ignored. Default is False.
+    val_cache_mb : float
+        if specified, the batches of the validation set are kept in memory
+        after they are loaded and transformed for the first validation step,
+        and are reused on later validation steps, if they fit within this
+        many megabytes. Default is None, in which case the validation set
+        is loaded from files at every validation step.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram that are fed through
+        the network at once when evaluating on the validation set.
+        Longer spectrograms are fed through in chunks, so memory used
+        does not depend on their duration. Default is None,
+        in which case all windows from a spectrogram are fed through at once.
+    pack_windows : int
+        if specified, windows from consecutive spectrograms in the validation set
+        are packed into batches of up to this many windows, instead of each spectrogram
+        being its own batch, so that short spectrograms are fed through the network
+        together. See ``vak.datasets.samplers.WindowPackingBatchSampler``.
+        Validation items are then not prefetched. Default is None.
 
     Other Parameters
     ----------------
@@ -138,6 +240,11 @@ def train(model_config_map,
             f"val_step set to {val_step} but dataset does not contain a validation set; "
             f"please run `vak prep` with a config.toml file that specifies a duration for the validation set."
         )
+    if samples_per_epoch and not shuffle:
+        raise ValueError(
+            f"samples_per_epoch set to {samples_per_epoch} but shuffle is False; "
+            f"windows can only be drawn at random when shuffle is True."
+        )
 
     # ---- set up directory to save output -----------------------------------------------------------------------------
     if results_path:
@@ -198,82 +305,278 @@ def train(model_config_map,
     transform, target_transform = transforms.get_defaults('train',
                                                           spect_standardizer)
 
-    train_dataset = WindowDataset.from_csv(csv_path=csv_path,
-                                           x_inds=x_inds,
-                                           spect_id_vector=spect_id_vector,
-                                           spect_inds_vector=spect_inds_vector,
-                                           split='train',
-                                           labelmap=labelmap,
-                                           window_size=window_size,
-                                           spect_key=spect_key,
-                                           timebins_key=timebins_key,
-                                           transform=transform,
-                                           target_transform=target_transform
-                                           )
-    log_or_print(
-        f'Duration of WindowDataset used for training, in seconds: {train_dataset.duration()}',
-        logger=logger, level='info'
-    )
-    train_data = torch.utils.data.DataLoader(dataset=train_dataset,
-                                             shuffle=shuffle,
-                                             batch_size=batch_size,
-                                             num_workers=num_workers)
-
-    # ---------------- load validation set (if there is one) -----------------------------------------------------------
-    if val_step:
-        item_transform = transforms.get_defaults('eval',
-                                                 spect_standardizer,
-                                                 window_size=window_size,
-                                                 return_padding_mask=True,
-                                                 )
-        val_dataset = VocalDataset.from_csv(csv_path=csv_path,
-                                            split='val',
-                                            labelmap=labelmap,
-                                            spect_key=spect_key,
-                                            timebins_key=timebins_key,
-                                            item_transform=item_transform,
-                                            )
-        val_data = torch.utils.data.DataLoader(dataset=val_dataset,
-                                               shuffle=False,
-                                               # batch size 1 because each spectrogram reshaped into a batch of windows
-                                               batch_size=1,
-                                               num_workers=num_workers)
-        val_dur = dataframe.split_dur(dataset_df, 'val')
+    if spect_cache_mb and shared_spect_cache:
         log_or_print(
-            f'Total duration of validation split from dataset (in s): {val_dur}',
+            f'will cache up to {spect_cache_mb} MB of spectrograms in shared memory used by all DataLoader workers',
             logger=logger, level='info'
         )
-
+        spect_cache = SharedSpectCache.from_mb(spect_cache_mb,
+                                               n_keys=(dataset_df['split'] == 'train').sum())
+    elif spect_cache_mb:
         log_or_print(
-            f'will measure error on validation set every {val_step} steps of training',
+            f'will cache up to {spect_cache_mb} MB of spectrograms in each DataLoader worker',
             logger=logger, level='info'
         )
+        spect_cache = SpectCache.from_mb(spect_cache_mb)
     else:
-        val_data = None
+        spect_cache = None
 
-    if device is None:
-        device = get_default_device()
+    try:
+        if device is None:
+            device = get_default_device()
 
-    models_map = models.from_model_config_map(
-        model_config_map,
-        num_classes=len(labelmap),
-        input_shape=train_dataset.shape,
-        logger=logger,
-    )
-    for model_name, model in models_map.items():
-        results_model_root = results_path.joinpath(model_name)
-        results_model_root.mkdir()
-        ckpt_root = results_model_root.joinpath('checkpoints')
-        ckpt_root.mkdir()
-        log_or_print(f'training {model_name}', logger=logger, level='info')
-        writer = summary_writer.get_summary_writer(log_dir=results_model_root,
-                                                   filename_suffix=model_name)
-        model.summary_writer = writer
-        model.fit(train_data=train_data,
-                  num_epochs=num_epochs,
-                  ckpt_root=ckpt_root,
-                  val_data=val_data,
-                  val_step=val_step,
-                  ckpt_step=ckpt_step,
-                  patience=patience,
-                  device=device)
+        if train_whole_files:
+            log_or_print(
+                'will train on whole spectrograms, padded to the same width in each batch',
+                logger=logger, level='info'
+            )
+            item_transform = transforms.get_defaults('train_whole_file',
+                                                     spect_standardizer,
+                                                     window_size=window_size,
+                                                     )
+            train_dataset = VocalDataset.from_csv(csv_path=csv_path,
+                                                  split='train',
+                                                  labelmap=labelmap,
+                                                  spect_key=spect_key,
+                                                  timebins_key=timebins_key,
+                                                  item_transform=item_transform,
+                                                  spect_cache=spect_cache,
+                                                  )
+            if preload_mb:
+                if train_dataset.preload(spect_standardizer, max_mb=preload_mb):
+                    log_or_print(
+                        'preloaded training set into memory',
+                        logger=logger, level='info'
+                    )
+                    train_dataset.item_transform = transforms.get_defaults('train_whole_file',
+                                                                           window_size=window_size,
+                                                                           )
+                else:
+                    log_or_print(
+                        f'training set is larger than preload_mb, {preload_mb} MB; will load items from files',
+                        logger=logger, level='info'
+                    )
+            # put spectrograms of similar widths in the same batch, to minimize padding
+            train_batch_sampler = LengthBucketBatchSampler.from_dataset(train_dataset,
+                                                                        batch_size=batch_size,
+                                                                        shuffle=shuffle)
+            train_data = torch.utils.data.DataLoader(dataset=train_dataset,
+                                                     batch_sampler=train_batch_sampler,
+                                                     collate_fn=pad_collate,
+                                                     num_workers=num_workers)
+        else:
+            train_dataset = WindowDataset.from_csv(csv_path=csv_path,
+                                                   x_inds=x_inds,
+                                                   spect_id_vector=spect_id_vector,
+                                                   spect_inds_vector=spect_inds_vector,
+                                                   window_index=window_index,
+                                                   split='train',
+                                                   labelmap=labelmap,
+                                                   window_size=window_size,
+                                                   spect_key=spect_key,
+                                                   timebins_key=timebins_key,
+                                                   transform=transform,
+                                                   target_transform=target_transform,
+                                                   spect_cache=spect_cache,
+                                                   window_stride=window_stride,
+                                                   random_window_offset=random_window_offset,
+                                                   )
+            log_or_print(
+                f'Duration of WindowDataset used for training, in seconds: {train_dataset.duration()}',
+                logger=logger, level='info'
+            )
+            if preload_mb:
+                if train_dataset.preload(spect_standardizer, max_mb=preload_mb):
+                    log_or_print(
+                        'preloaded training set into memory',
+                        logger=logger, level='info'
+                    )
+                    # spectrograms were standardized once when preloading, so don't standardize every window
+                    train_dataset.transform, _ = transforms.get_defaults('train')
+                else:
+                    log_or_print(
+                        f'training set is larger than preload_mb, {preload_mb} MB; will load windows from files',
+                        logger=logger, level='info'
+                    )
+            if samples_per_epoch:
+                log_or_print(
+                    f'will draw {samples_per_epoch} random training windows every epoch, '
+                    f'out of {len(train_dataset)} windows in training set',
+                    logger=logger, level='info'
+                )
+            if window_stride > 1:
+                log_or_print(
+                    f'using every {window_stride}th window start in training set, '
+                    f'number of training windows: {len(train_dataset)}',
+                    logger=logger, level='info'
+                )
+            if train_dataset.window_store_path is not None:
+                log_or_print(
+                    f'taking training windows from window store: {train_dataset.window_store_path}',
+                    logger=logger, level='info'
+                )
+            if shuffle and windows_per_file:
+                log_or_print(
+                    f'will shuffle training windows in chunks of {windows_per_file} windows from the same file',
+                    logger=logger, level='info'
+                )
+                train_sampler = FileLocalitySampler.from_dataset(train_dataset, windows_per_file,
+                                                                 num_samples=samples_per_epoch)
+            elif samples_per_epoch:
+                train_sampler = RandomWindowSampler.from_dataset(train_dataset, samples_per_epoch,
+                                                                 replacement=sample_with_replacement)
+            elif shuffle:
+                train_sampler = torch.utils.data.RandomSampler(train_dataset)
+            else:
+                train_sampler = torch.utils.data.SequentialSampler(train_dataset)
+
+            if tensor_loader and train_dataset.preloaded:
+                if pin_memory:
+                    log_or_print(
+                        'will take batches of training windows from tensors in pinned memory, '
+                        f'and copy them to device: {device}',
+                        logger=logger, level='info'
+                    )
+                else:
+                    log_or_print(
+                        f'will take batches of training windows from tensors on device: {device}',
+                        logger=logger, level='info'
+                    )
+                train_data = WindowTensorLoader.from_dataset(train_dataset,
+                                                             batch_size=batch_size,
+                                                             shuffle=shuffle,
+                                                             # only need sampler for FileLocalitySampler
+                                                             # or RandomWindowSampler; loader shuffles on its own otherwise
+                                                             sampler=(train_sampler if shuffle and (windows_per_file or samples_per_epoch)
+                                                                      else None),
+                                                             # pinned tensors stay on the CPU
+                                                             device=(None if pin_memory else device),
+                                                             pin_memory=pin_memory)
+            else:
+                if tensor_loader:
+                    log_or_print(
+                        'training set was not preloaded, will use DataLoader instead of WindowTensorLoader',
+                        logger=logger, level='warning'
+                    )
+                if prefetch_files and not train_dataset.preloaded and train_dataset.window_store_path is None:
+                    log_or_print(
+                        f'will read spectrogram files for training windows {prefetch_files} files ahead',
+                        logger=logger, level='info'
+                    )
+                    train_sampler = PrefetchSampler(train_sampler, train_dataset, files_ahead=prefetch_files)
+                # sample the indices for a whole batch at once, and turn off automatic batching,
+                # so that WindowDataset gathers and transforms all the windows in a batch together
+                train_batch_sampler = torch.utils.data.BatchSampler(train_sampler, batch_size=batch_size, drop_last=False)
+                train_data = torch.utils.data.DataLoader(dataset=train_dataset,
+                                                         sampler=train_batch_sampler,
+                                                         batch_size=None,
+                                                         num_workers=num_workers)
+
+        # ---------------- load validation set (if there is one) -----------------------------------------------------------
+        if val_step:
+            item_transform = transforms.get_defaults('eval',
+                                                     spect_standardizer,
+                                                     window_size=window_size,
+                                                     return_padding_mask=True,
+                                                     )
+            val_dataset = VocalDataset.from_csv(csv_path=csv_path,
+                                                split='val',
+                                                labelmap=labelmap,
+                                                spect_key=spect_key,
+                                                timebins_key=timebins_key,
+                                                item_transform=item_transform,
+                                                )
+            if preload_mb:
+                if val_dataset.preload(spect_standardizer, max_mb=preload_mb):
+                    log_or_print(
+                        'preloaded validation set into memory',
+                        logger=logger, level='info'
+                    )
+                    val_dataset.item_transform = transforms.get_defaults('eval',
+                                                                         window_size=window_size,
+                                                                         return_padding_mask=True,
+                                                                         )
+                else:
+                    log_or_print(
+                        f'validation set is larger than preload_mb, {preload_mb} MB; will load items from files',
+                        logger=logger, level='info'
+                    )
+            if pack_windows:
+                log_or_print(
+                    f'packing windows from consecutive spectrograms in validation set '
+                    f'into batches of up to {pack_windows} windows',
+                    logger=logger, level='info'
+                )
+                val_data = torch.utils.data.DataLoader(dataset=val_dataset,
+                                                       batch_sampler=WindowPackingBatchSampler.from_dataset(
+                                                           val_dataset, window_size, max_windows=pack_windows
+                                                       ),
+                                                       collate_fn=pack_windows_collate,
+                                                       num_workers=num_workers)
+            else:
+                if prefetch_files and not val_dataset.preloaded:
+                    val_sampler = PrefetchSampler(torch.utils.data.SequentialSampler(val_dataset), val_dataset,
+                                                  files_ahead=prefetch_files)
+                else:
+                    val_sampler = None
+                val_data = torch.utils.data.DataLoader(dataset=val_dataset,
+                                                       shuffle=False,
+                                                       sampler=val_sampler,
+                                                       # batch size 1 because each spectrogram reshaped into a batch of windows
+                                                       batch_size=1,
+                                                       num_workers=num_workers)
+            if val_cache_mb:
+                log_or_print(
+                    f'will keep up to {val_cache_mb} MB of transformed validation data in memory '
+                    'after the first validation step',
+                    logger=logger, level='info'
+                )
+                val_data = CachedLoader(val_data, max_mb=val_cache_mb)
+            val_dur = dataframe.split_dur(dataset_df, 'val')
+            log_or_print(
+                f'Total duration of validation split from dataset (in s): {val_dur}',
+                logger=logger, level='info'
+            )
+
+            log_or_print(
+                f'will measure error on validation set every {val_step} steps of training',
+                logger=logger, level='info'
+            )
+        else:
+            val_data = None
+
+        models_map = models.from_model_config_map(
+            model_config_map,
+            num_classes=len(labelmap),
+            input_shape=train_dataset.shape,
+            logger=logger,
+        )
+        for model_name, model in models_map.items():
+            results_model_root = results_path.joinpath(model_name)
+            results_model_root.mkdir()
+            ckpt_root = results_model_root.joinpath('checkpoints')
+            ckpt_root.mkdir()
+            log_or_print(f'training {model_name}', logger=logger, level='info')
+            writer = summary_writer.get_summary_writer(log_dir=results_model_root,
+                                                       filename_suffix=model_name)
+            model.summary_writer = writer
+            model.fit(train_data=train_data,
+                      num_epochs=num_epochs,
+                      ckpt_root=ckpt_root,
+                      val_data=val_data,
+                      val_step=val_step,
+                      ckpt_step=ckpt_step,
+                      patience=patience,
+                      device=device,
+                      max_windows_per_batch=max_windows_per_batch)
+
+        if spect_cache is not None and (shared_spect_cache or num_workers == 0):
+            # with worker processes, each worker has its own copy of a SpectCache, that we can't inspect from here
+            log_or_print(
+                f'spectrogram cache statistics: {spect_cache.info()}',
+                logger=logger, level='info'
+            )
+    finally:
+        # free shared memory even if training fails, or it stays allocated until the machine restarts
+        if isinstance(spect_cache, SharedSpectCache):
+            spect_cache.close()
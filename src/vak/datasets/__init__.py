@@ -1,7 +1,30 @@
+from . import collate
+from .cache import SharedSpectCache, SpectCache
+from .cached_loader import CachedLoader
+from .samplers import (
+    FileLocalitySampler,
+    LengthBucketBatchSampler,
+    PrefetchSampler,
+    RandomWindowSampler,
+    WindowPackingBatchSampler,
+)
+from .tensor_loader import WindowTensorLoader
 from .vocal_dataset import VocalDataset
 from .window_dataset import WindowDataset
+from .window_index import WindowIndex
 
 __all__ = [
+    'collate',
+    'CachedLoader',
+    'FileLocalitySampler',
+    'LengthBucketBatchSampler',
+    'PrefetchSampler',
+    'RandomWindowSampler',
+    'SharedSpectCache',
+    'SpectCache',
     'VocalDataset',
-    'WindowDataset'
+    'WindowDataset',
+    'WindowIndex',
+    'WindowPackingBatchSampler',
+    'WindowTensorLoader',
 ]
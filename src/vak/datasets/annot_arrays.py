@@ -0,0 +1,83 @@
+"""compact representation of the annotations in a dataset, as numpy arrays"""
+from collections import namedtuple
+
+import numpy as np
+
+
+# minimal stand-ins for crowsetta.Annotation and crowsetta.Sequence,
+# with the attributes that vak uses to label time bins
+AnnotView = namedtuple('AnnotView', ['seq'])
+SeqView = namedtuple('SeqView', ['labels', 'onsets_s', 'offsets_s'])
+
+
+class AnnotArrays:
+    """Compact representation of a list of annotations,
+    as flat arrays of labels, onsets, and offsets of segments
+    from all the annotations, concatenated.
+
+    Used by WindowDataset instead of a list of ``crowsetta.Annotation`` instances,
+    so that pickling the dataset, e.g. when it is sent to DataLoader worker processes,
+    only requires pickling a few arrays instead of many Python objects.
+
+    Indexing returns a view of one annotation with a ``seq`` attribute
+    that has ``labels``, ``onsets_s``, and ``offsets_s``, like a ``crowsetta.Annotation``,
+    where each is a view of the flat arrays.
+
+    Attributes
+    ----------
+    labels : numpy.ndarray
+        labels of segments in all annotations.
+    onsets_s : numpy.ndarray
+        onset times of segments in all annotations, in seconds.
+    offsets_s : numpy.ndarray
+        offset times of segments in all annotations, in seconds.
+    annot_offsets : numpy.ndarray
+        index in the flat arrays of the first segment of each annotation.
+    """
+    def __init__(self, labels, onsets_s, offsets_s, annot_offsets):
+        self.labels = np.asarray(labels)
+        self.onsets_s = np.asarray(onsets_s, dtype=np.float64)
+        self.offsets_s = np.asarray(offsets_s, dtype=np.float64)
+        self.annot_offsets = np.asarray(annot_offsets, dtype=np.int64)
+        if not (self.labels.shape == self.onsets_s.shape == self.offsets_s.shape):
+            raise ValueError(
+                'labels, onsets_s, and offsets_s should all have the same shape'
+            )
+
+    @classmethod
+    def from_annots(cls, annots):
+        """create AnnotArrays from a list of ``crowsetta.Annotation`` instances"""
+        n_segments = [len(annot.seq.labels) for annot in annots]
+        annot_offsets = np.cumsum([0] + n_segments[:-1]) if annots else np.array([], dtype=np.int64)
+
+        def _concat(attr):
+            arrs = [np.asarray(getattr(annot.seq, attr)) for annot in annots]
+            return np.concatenate(arrs) if arrs else np.array([])
+
+        return cls(labels=_concat('labels').astype(str),
+                   onsets_s=_concat('onsets_s'),
+                   offsets_s=_concat('offsets_s'),
+                   annot_offsets=annot_offsets)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(
+                f'index {idx} is out of range for AnnotArrays with {len(self)} annotations'
+            )
+        start = self.annot_offsets[idx]
+        stop = self.annot_offsets[idx + 1] if idx + 1 < len(self) else self.labels.shape[-1]
+        return AnnotView(seq=SeqView(labels=self.labels[start:stop],
+                                     onsets_s=self.onsets_s[start:stop],
+                                     offsets_s=self.offsets_s[start:stop]))
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __len__(self):
+        return self.annot_offsets.shape[-1]
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(n_annots={len(self)}, n_segments={self.labels.shape[-1]})'
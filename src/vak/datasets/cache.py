@@ -0,0 +1,463 @@
+"""caches used by datasets to avoid loading the same spectrogram files repeatedly"""
+from collections import OrderedDict
+import multiprocessing
+import time
+import uuid
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+def nbytes(value):
+    """number of bytes in an array, or in a tuple / list of arrays"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, (tuple, list)):
+        return sum([nbytes(element) for element in value])
+    else:
+        raise TypeError(
+            f'cannot determine number of bytes for value of type: {type(value)}'
+        )
+
+
+class SpectCache:
+    """least-recently-used cache of arrays loaded from spectrogram files,
+    bounded by the total number of bytes it holds.
+
+    Used by datasets to avoid decoding the same file once for every window
+    taken from it. When a ``torch.utils.data.DataLoader`` uses worker processes,
+    each worker gets its own copy of the dataset and therefore its own cache;
+    the cache is always emptied when it is pickled, so workers start out with
+    an empty cache instead of a copy of whatever the parent process loaded.
+
+    Attributes
+    ----------
+    max_bytes : int
+        maximum total size of cached arrays, in bytes.
+        When adding a value would go over this size,
+        the least recently used values are evicted.
+    nbytes : int
+        total size of arrays currently in cache, in bytes.
+    hits : int
+        number of times ``get`` found a value in the cache.
+    misses : int
+        number of times ``get`` did not find a value in the cache.
+    """
+    def __init__(self, max_bytes):
+        """initialize a new SpectCache instance
+
+        Parameters
+        ----------
+        max_bytes : int
+            maximum total size of cached arrays, in bytes.
+        """
+        if max_bytes < 0:
+            raise ValueError(
+                f'max_bytes must be a non-negative number but was: {max_bytes}'
+            )
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_mb(cls, max_mb):
+        """create a SpectCache with a maximum size specified in megabytes"""
+        return cls(max_bytes=int(max_mb * 2 ** 20))
+
+    def get(self, key):
+        """get value from cache, or None if key is not in cache"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        else:
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """add value to cache, evicting least recently used values
+        as needed to stay within ``max_bytes``.
+        Values larger than ``max_bytes`` are not cached."""
+        value_nbytes = nbytes(value)
+        if value_nbytes > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.nbytes -= nbytes(self._entries.pop(key))
+
+        while self.nbytes + value_nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= nbytes(evicted)
+
+        self._entries[key] = value
+        self.nbytes += value_nbytes
+
+    def cancel(self, key):
+        """called when loading a value for key failed after ``get`` returned None.
+        Does nothing, since no other process waits for values in this cache;
+        defined so that datasets can use either kind of cache the same way."""
+        pass
+
+    def clear(self):
+        """remove all values from cache and reset counters"""
+        self._entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """return a dict with hit and miss counts and current size of cache,
+        that can be used to choose a value for ``max_bytes``"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'n_entries': len(self._entries),
+            'nbytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # don't copy cached arrays into DataLoader worker processes
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(max_bytes={self.max_bytes}, '
+                f'nbytes={self.nbytes}, hits={self.hits}, misses={self.misses})')
+
+
+class SharedSpectCache:
+    """least-recently-used cache of arrays loaded from spectrogram files,
+    held in shared memory, so that it is shared by all the worker processes
+    of a ``torch.utils.data.DataLoader``, and bounded by a single total number of bytes.
+
+    Unlike ``SpectCache``, where each worker has its own copy of the cache,
+    a file is decoded only once by whichever process needs it first,
+    and then every other process maps the same memory without copying.
+    While one process is loading a file, other processes that ``get`` it
+    wait for it to be ``put`` in the cache (up to ``wait_timeout`` seconds)
+    instead of decoding it again.
+
+    Keys must be integers in the range [0, n_keys), e.g. the ids of spectrograms
+    in a dataset. Values are arrays, or tuples of up to ``MAX_ARRAYS`` arrays,
+    each with at most 2 dimensions. Arrays returned by ``get`` are views
+    of shared memory and should not be modified.
+
+    The process that creates the cache owns the shared memory, and should
+    call ``close`` when it is done with the cache, to free the memory,
+    e.g. by using the cache as a context manager.
+    If a process fails to load a value after ``get`` returned None,
+    it should call ``cancel`` so that other processes stop waiting for that value.
+    Requires Python 3.8 or later, for ``multiprocessing.shared_memory``.
+
+    Attributes
+    ----------
+    max_bytes : int
+        maximum total size of cached arrays, in bytes, across all processes.
+    n_keys : int
+        number of keys, i.e. the range of valid keys.
+    wait_timeout : float
+        maximum time, in seconds, to wait for another process to load a value.
+    """
+    MAX_ARRAYS = 2
+    # states of entries in index
+    EMPTY, LOADING, READY = 0, 1, 2
+    INDEX_DTYPE = np.dtype([
+        ('state', np.int8),
+        ('generation', np.int64),
+        ('last_used', np.int64),
+        ('nbytes', np.int64),
+        ('n_arrays', np.int8),
+        ('dtypes', 'S8', (MAX_ARRAYS,)),
+        ('ndims', np.int8, (MAX_ARRAYS,)),
+        ('shapes', np.int64, (MAX_ARRAYS, 2)),
+    ])
+    # counters kept after index, in the same block of shared memory
+    NBYTES, CLOCK, HITS, MISSES = range(4)
+    N_COUNTERS = 4
+    # time to sleep between checks when waiting for another process to load a value
+    WAIT_INTERVAL = 0.001
+
+    def __init__(self, max_bytes, n_keys, wait_timeout=10.):
+        """initialize a new SharedSpectCache instance
+
+        Parameters
+        ----------
+        max_bytes : int
+            maximum total size of cached arrays, in bytes.
+        n_keys : int
+            number of keys, e.g. number of spectrogram files in a dataset.
+        wait_timeout : float
+            maximum time, in seconds, to wait for another process to load a value,
+            after which ``get`` returns None so the caller loads the value itself.
+            Default is 10.
+        """
+        if shared_memory is None:
+            raise ImportError(
+                'SharedSpectCache requires multiprocessing.shared_memory, available in Python 3.8 or later'
+            )
+        if max_bytes < 0:
+            raise ValueError(
+                f'max_bytes must be a non-negative number but was: {max_bytes}'
+            )
+        self.max_bytes = int(max_bytes)
+        self.n_keys = int(n_keys)
+        self.wait_timeout = wait_timeout
+        self._lock = multiprocessing.Lock()
+        # keep names short, since some platforms limit length of shared memory names
+        self._prefix = f'vak_{uuid.uuid4().hex[:8]}'
+        index_nbytes = self.INDEX_DTYPE.itemsize * self.n_keys + np.dtype(np.int64).itemsize * self.N_COUNTERS
+        self._index_shm = shared_memory.SharedMemory(name=self._prefix, create=True, size=index_nbytes)
+        self._owner = True
+        self._attach_index()
+        self._index[:] = np.zeros(self.n_keys, dtype=self.INDEX_DTYPE)
+        self._counters[:] = 0
+
+    @classmethod
+    def from_mb(cls, max_mb, n_keys, wait_timeout=10.):
+        """create a SharedSpectCache with a maximum size specified in megabytes"""
+        return cls(max_bytes=int(max_mb * 2 ** 20), n_keys=n_keys, wait_timeout=wait_timeout)
+
+    def _attach_index(self):
+        """make arrays that are views of index and counters in shared memory"""
+        self._index = np.ndarray((self.n_keys,), dtype=self.INDEX_DTYPE, buffer=self._index_shm.buf)
+        self._counters = np.ndarray((self.N_COUNTERS,), dtype=np.int64, buffer=self._index_shm.buf,
+                                    offset=self.INDEX_DTYPE.itemsize * self.n_keys)
+        # blocks of shared memory with cached values that this process has opened,
+        # and blocks that could not be closed yet because arrays still use them
+        self._blocks = {}
+        self._stale_blocks = []
+
+    def _block_name(self, key, generation):
+        return f'{self._prefix}_{key}_{generation}'
+
+    @property
+    def nbytes(self):
+        """total size of arrays currently in cache, in bytes"""
+        return int(self._counters[self.NBYTES])
+
+    @property
+    def hits(self):
+        """number of times ``get`` found a value in the cache, in all processes"""
+        return int(self._counters[self.HITS])
+
+    @property
+    def misses(self):
+        """number of times ``get`` did not find a value in the cache, in all processes"""
+        return int(self._counters[self.MISSES])
+
+    def _touch(self, key):
+        self._counters[self.CLOCK] += 1
+        self._index['last_used'][key] = self._counters[self.CLOCK]
+
+    def _close_block(self, block):
+        try:
+            block.close()
+        except BufferError:
+            # an array returned by ``get`` still uses this block; try again later
+            self._stale_blocks.append(block)
+
+    def _close_stale_blocks(self):
+        stale_blocks, self._stale_blocks = self._stale_blocks, []
+        for block in stale_blocks:
+            self._close_block(block)
+
+    def _map(self, key):
+        """get value for key from its block of shared memory,
+        opening the block if this process has not already"""
+        generation = int(self._index['generation'][key])
+        block = self._blocks.get(key)
+        if block is None or block.name.lstrip('/') != self._block_name(key, generation):
+            if block is not None:
+                self._close_block(block)
+            block = shared_memory.SharedMemory(name=self._block_name(key, generation))
+            self._blocks[key] = block
+
+        entry = self._index[key]
+        arrays = []
+        offset = 0
+        for array_ind in range(entry['n_arrays']):
+            shape = tuple(entry['shapes'][array_ind][:entry['ndims'][array_ind]])
+            arr = np.ndarray(shape, dtype=np.dtype(entry['dtypes'][array_ind].decode()),
+                             buffer=block.buf, offset=offset)
+            offset += arr.nbytes
+            arrays.append(arr)
+        return arrays[0] if len(arrays) == 1 else tuple(arrays)
+
+    def get(self, key):
+        """get value from cache, or None if key is not in cache.
+
+        If another process is currently loading the value for this key,
+        waits for it to be added to the cache.
+        If None is returned, the caller is expected to load the value and ``put`` it."""
+        key = int(key)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                self._close_stale_blocks()
+                state = self._index['state'][key]
+                if state == self.READY:
+                    self._touch(key)
+                    self._counters[self.HITS] += 1
+                    return self._map(key)
+                elif state == self.EMPTY or time.monotonic() > deadline:
+                    # this process will load the value
+                    self._index['state'][key] = self.LOADING
+                    self._counters[self.MISSES] += 1
+                    return None
+            time.sleep(self.WAIT_INTERVAL)
+
+    def cancel(self, key):
+        """called when loading a value for key failed after ``get`` returned None,
+        e.g. because reading the file raised an error.
+        Marks the key as empty again, so that other processes waiting for the value
+        stop waiting and load it themselves, instead of waiting until ``wait_timeout``."""
+        key = int(key)
+        with self._lock:
+            if self._index['state'][key] == self.LOADING:
+                self._index['state'][key] = self.EMPTY
+
+    def _evict(self, key):
+        """remove value from cache; called with lock held"""
+        block = self._blocks.pop(key, None)
+        if block is not None:
+            self._close_block(block)
+        name = self._block_name(key, int(self._index['generation'][key]))
+        try:
+            evicted = shared_memory.SharedMemory(name=name)
+            evicted.close()
+            evicted.unlink()
+        except FileNotFoundError:
+            pass
+        self._counters[self.NBYTES] -= self._index['nbytes'][key]
+        self._index['nbytes'][key] = 0
+        self._index['state'][key] = self.EMPTY
+
+    def put(self, key, value):
+        """add value to cache, evicting least recently used values
+        as needed to stay within ``max_bytes``.
+        Values larger than ``max_bytes`` are not cached."""
+        key = int(key)
+        arrays = [np.ascontiguousarray(arr)
+                  for arr in (value if isinstance(value, (tuple, list)) else (value,))]
+        if len(arrays) > self.MAX_ARRAYS or any([arr.ndim > 2 for arr in arrays]):
+            raise ValueError(
+                f'SharedSpectCache can only cache up to {self.MAX_ARRAYS} arrays '
+                'with at most 2 dimensions for each key'
+            )
+        value_nbytes = sum([arr.nbytes for arr in arrays])
+
+        with self._lock:
+            if self._index['state'][key] == self.READY:
+                return
+            if value_nbytes > self.max_bytes:
+                self._index['state'][key] = self.EMPTY
+                return
+
+            while self._counters[self.NBYTES] + value_nbytes > self.max_bytes:
+                ready = np.flatnonzero(self._index['state'] == self.READY)
+                self._evict(int(ready[np.argmin(self._index['last_used'][ready])]))
+
+            generation = int(self._index['generation'][key]) + 1
+            block = shared_memory.SharedMemory(name=self._block_name(key, generation),
+                                               create=True, size=max(value_nbytes, 1))
+            offset = 0
+            entry = np.zeros((), dtype=self.INDEX_DTYPE)
+            for array_ind, arr in enumerate(arrays):
+                block.buf[offset:offset + arr.nbytes] = arr.tobytes()
+                offset += arr.nbytes
+                entry['dtypes'][array_ind] = arr.dtype.str.encode()
+                entry['ndims'][array_ind] = arr.ndim
+                entry['shapes'][array_ind][:arr.ndim] = arr.shape
+            entry['state'] = self.READY
+            entry['generation'] = generation
+            entry['nbytes'] = value_nbytes
+            entry['n_arrays'] = len(arrays)
+            self._index[key] = entry
+            self._touch(key)
+            self._counters[self.NBYTES] += value_nbytes
+            old_block = self._blocks.pop(key, None)
+            if old_block is not None:
+                self._close_block(old_block)
+            self._blocks[key] = block
+
+    def clear(self):
+        """remove all values from cache and reset counters"""
+        with self._lock:
+            for key in np.flatnonzero(self._index['state'] == self.READY):
+                self._evict(int(key))
+            self._index['state'][:] = self.EMPTY
+            self._counters[:] = 0
+
+    def close(self):
+        """close shared memory used by cache in this process.
+        If this process created the cache, also free all the shared memory."""
+        if self._owner:
+            self.clear()
+        for block in self._blocks.values():
+            self._close_block(block)
+        self._blocks = {}
+        # views of the index have to be deleted before it can be closed
+        del self._index, self._counters
+        self._index_shm.close()
+        if self._owner:
+            self._index_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def info(self):
+        """return a dict with hit and miss counts and current size of cache,
+        that can be used to choose a value for ``max_bytes``"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'n_entries': len(self),
+            'nbytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def __contains__(self, key):
+        return bool(self._index['state'][int(key)] == self.READY)
+
+    def __len__(self):
+        return int(np.count_nonzero(self._index['state'] == self.READY))
+
+    def __getstate__(self):
+        # workers attach to the same shared memory, instead of getting a copy
+        return {'max_bytes': self.max_bytes,
+                'n_keys': self.n_keys,
+                'wait_timeout': self.wait_timeout,
+                'lock': self._lock,
+                'prefix': self._prefix}
+
+    def __setstate__(self, state):
+        self.max_bytes = state['max_bytes']
+        self.n_keys = state['n_keys']
+        self.wait_timeout = state['wait_timeout']
+        self._lock = state['lock']
+        self._prefix = state['prefix']
+        self._index_shm = shared_memory.SharedMemory(name=self._prefix)
+        self._owner = False
+        self._attach_index()
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(max_bytes={self.max_bytes}, n_keys={self.n_keys}, '
+                f'nbytes={self.nbytes}, hits={self.hits}, misses={self.misses})')
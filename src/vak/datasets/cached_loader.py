@@ -0,0 +1,96 @@
+"""loader that keeps batches from another loader in memory, to replay them instead of loading them again"""
+import torch
+
+
+def _batch_nbytes(batch):
+    """number of bytes in the tensors in a batch"""
+    if isinstance(batch, torch.Tensor):
+        return batch.element_size() * batch.numel()
+    elif isinstance(batch, dict):
+        return sum([_batch_nbytes(value) for value in batch.values()])
+    elif isinstance(batch, (tuple, list)):
+        return sum([_batch_nbytes(element) for element in batch])
+    else:
+        # e.g. paths to spectrogram files
+        return 0
+
+
+def _clone(batch):
+    """copy tensors in a batch, e.g. so they are not kept in
+    shared memory that a DataLoader worker process used to send them"""
+    if isinstance(batch, torch.Tensor):
+        return batch.clone()
+    elif isinstance(batch, dict):
+        return {key: _clone(value) for key, value in batch.items()}
+    elif isinstance(batch, tuple):
+        return tuple(_clone(element) for element in batch)
+    elif isinstance(batch, list):
+        return [_clone(element) for element in batch]
+    else:
+        return batch
+
+
+class CachedLoader:
+    """Iterable that wraps a loader, e.g. a ``torch.utils.data.DataLoader``,
+    and keeps the batches it yields in memory the first time it is iterated over,
+    so that later iterations replay the same batches without loading
+    and transforming the data again.
+
+    Used for validation data during training, that is evaluated
+    every ``val_step`` training steps. Without a cache, each validation step
+    loads every spectrogram file, labels time bins, standardizes, pads,
+    and reshapes into windows, and the results are the same every time.
+    Should only be used with loaders that yield the same batches in the same order
+    every time, i.e. no shuffling or random transforms.
+
+    If the batches need more memory than ``max_mb``, none are kept,
+    and every iteration uses the wrapped loader. Batches are only kept
+    if an iteration goes through the whole loader.
+
+    Attributes
+    ----------
+    loader : torch.utils.data.DataLoader
+        loader that is wrapped.
+    max_mb : float
+        maximum size, in megabytes, of the tensors in batches that are kept in memory.
+    cached : bool
+        True if batches are kept in memory and are replayed when iterating.
+    """
+    def __init__(self, loader, max_mb):
+        self.loader = loader
+        self.max_mb = max_mb
+        self._batches = None
+        # set to True if batches didn't fit in memory, so we don't keep trying to cache them
+        self._too_big = False
+
+    @property
+    def cached(self):
+        return self._batches is not None
+
+    @property
+    def dataset(self):
+        """dataset of wrapped loader, e.g. used by ``vak.engine.model.Model._eval`` to get the labelmap"""
+        return self.loader.dataset
+
+    def __iter__(self):
+        if self._batches is not None:
+            yield from self._batches
+            return
+
+        max_bytes = self.max_mb * 2 ** 20
+        batches = [] if not self._too_big else None
+        batches_nbytes = 0
+        for batch in self.loader:
+            if batches is not None:
+                batches_nbytes += _batch_nbytes(batch)
+                if batches_nbytes > max_bytes:
+                    self._too_big = True
+                    batches = None
+                else:
+                    batch = _clone(batch)
+                    batches.append(batch)
+            yield batch
+        self._batches = batches
+
+    def __len__(self):
+        return len(self.loader)
@@ -0,0 +1,134 @@
+"""functions that combine items from datasets into batches, and split them back"""
+import numpy as np
+import torch
+
+
+def pad_collate(items):
+    """combine items with spectrograms of different widths into a batch,
+    by padding them at the end to the width of the widest.
+
+    Used as the ``collate_fn`` of a ``torch.utils.data.DataLoader``
+    when training on whole spectrograms, with items returned by a
+    ``VocalDataset`` using ``vak.transforms.defaults.WholeFileTrainItemTransform``.
+    To keep the amount of padding small, use a
+    ``vak.datasets.samplers.LengthBucketBatchSampler``
+    so that each batch contains spectrograms of similar widths.
+
+    Parameters
+    ----------
+    items : list
+        of dict, each with keys 'source', a tensor with shape
+        (channel, frequency bins, time bins), 'annot', a vector of labeled timebins,
+        and 'padding_mask', a boolean vector that is True where time bins are
+        not padding. Items may also have key 'spect_path'.
+
+    Returns
+    -------
+    batch : dict
+        with key 'source', a tensor with shape (batch, channel, frequency bins, time bins),
+        'annot', a tensor with shape (batch, time bins), 'padding_mask', a boolean tensor
+        with shape (batch, time bins) that is False wherever padding was added,
+        and 'spect_path', a list, if items have spectrogram paths.
+    """
+    max_width = max([item['source'].shape[-1] for item in items])
+    n_channels, n_freqbins = items[0]['source'].shape[:2]
+
+    source = torch.zeros((len(items), n_channels, n_freqbins, max_width), dtype=items[0]['source'].dtype)
+    annot = torch.zeros((len(items), max_width), dtype=torch.long)
+    padding_mask = torch.zeros((len(items), max_width), dtype=torch.bool)
+    for item_ind, item in enumerate(items):
+        width = item['source'].shape[-1]
+        source[item_ind, ..., :width] = item['source']
+        annot[item_ind, :width] = torch.as_tensor(item['annot'])
+        padding_mask[item_ind, :width] = torch.as_tensor(np.asarray(item['padding_mask']))
+
+    batch = {
+        'source': source,
+        'annot': annot,
+        'padding_mask': padding_mask,
+    }
+    if 'spect_path' in items[0]:
+        batch['spect_path'] = [item['spect_path'] for item in items]
+    return batch
+
+
+def pack_windows(items):
+    """combine items from several spectrograms, each reshaped into a stack of windows,
+    into a single batch of windows.
+
+    Used as the ``collate_fn`` of a ``torch.utils.data.DataLoader``
+    when evaluating or predicting, with items returned by a ``VocalDataset``
+    using ``vak.transforms.defaults.EvalItemTransform`` or
+    ``vak.transforms.defaults.PredictItemTransform``, and a
+    ``vak.datasets.samplers.WindowPackingBatchSampler`` that determines
+    which items go in each batch. Outputs of a network for the whole batch
+    can be split back into outputs for each spectrogram
+    with ``vak.datasets.collate.unpack_windows``.
+
+    Parameters
+    ----------
+    items : list
+        of dict, each with key 'source', a tensor with shape
+        (windows, channel, frequency bins, time bins). Items may also have keys
+        'annot', 'padding_mask', 'spect_path', and 'timebins'.
+
+    Returns
+    -------
+    batch : dict
+        with key 'source', a tensor with shape (windows, channel, frequency bins, time bins)
+        that contains windows from all items, and 'window_offsets', a tensor
+        with the index of the first window of each item in 'source',
+        followed by the total number of windows.
+        If items have 'padding_mask', the batch has a boolean vector 'padding_mask'
+        that is the concatenated masks of all items. If items have 'annot',
+        'spect_path' or 'timebins', the batch has a list of those values, one per item.
+    """
+    n_windows = [item['source'].shape[0] for item in items]
+    batch = {
+        'source': torch.cat([item['source'] for item in items]),
+        'window_offsets': torch.as_tensor(np.cumsum([0] + n_windows), dtype=torch.int64),
+    }
+    if 'padding_mask' in items[0]:
+        batch['padding_mask'] = torch.cat(
+            [torch.as_tensor(np.asarray(item['padding_mask'])) for item in items]
+        )
+    for key in ('annot', 'spect_path', 'timebins'):
+        if key in items[0]:
+            batch[key] = [item[key] for item in items]
+    return batch
+
+
+def unpack_windows(batch, out):
+    """split the output of a network for a batch made by
+    ``vak.datasets.collate.pack_windows`` into outputs for each spectrogram.
+
+    Parameters
+    ----------
+    batch : dict
+        returned by ``vak.datasets.collate.pack_windows``.
+    out : torch.Tensor
+        output of network for all windows in ``batch['source']``,
+        with windows as the first dimension.
+
+    Yields
+    ------
+    item_batch : dict
+        batch for one spectrogram, in the same format as a batch from a
+        ``torch.utils.data.DataLoader`` with a batch size of 1:
+        'padding_mask', 'annot' and 'timebins' are tensors with a first dimension of size 1,
+        and 'spect_path' is a list with one path.
+    item_out : torch.Tensor
+        output of network for windows from that spectrogram.
+    """
+    window_size = batch['source'].shape[-1]
+    window_offsets = batch['window_offsets'].tolist()
+    for item_ind, (start, stop) in enumerate(zip(window_offsets[:-1], window_offsets[1:])):
+        item_batch = {}
+        if 'padding_mask' in batch:
+            item_batch['padding_mask'] = batch['padding_mask'][start * window_size:stop * window_size].unsqueeze(0)
+        for key in ('annot', 'timebins'):
+            if key in batch:
+                item_batch[key] = torch.as_tensor(batch[key][item_ind]).unsqueeze(0)
+        if 'spect_path' in batch:
+            item_batch['spect_path'] = [batch['spect_path'][item_ind]]
+        yield item_batch, out[start:stop]
@@ -0,0 +1,399 @@
+"""samplers that determine the order in which windows are drawn from datasets"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch.utils.data
+
+from .. import files
+
+
+class FileLocalitySampler(torch.utils.data.Sampler):
+    """Sampler that shuffles a WindowDataset in "chunks" of windows
+    that all come from the same spectrogram file.
+
+    The default ``torch.utils.data.RandomSampler`` used by a
+    ``DataLoader`` with ``shuffle=True`` draws windows uniformly at random,
+    so a batch of windows will often require loading ``batch_size`` different
+    spectrogram files. This sampler instead shuffles the windows within each file,
+    splits the windows from each file into chunks of ``windows_per_file``,
+    and then shuffles the chunks. Each batch therefore contains
+    several windows from each file it touches, and when the dataset
+    has a ``vak.datasets.cache.SpectCache``, each file is loaded once per chunk,
+    instead of once per window.
+
+    The value of ``windows_per_file`` determines the degree of randomness:
+    with ``windows_per_file=1`` the order is the same as
+    a ``RandomSampler``, and larger values mean fewer files
+    are touched by any one batch.
+
+    Attributes
+    ----------
+    spect_ids : numpy.ndarray
+        id of the spectrogram that each index into the dataset belongs to,
+        i.e. ``dataset.window_index[np.arange(len(dataset))][0]``.
+    windows_per_file : int
+        number of windows in a chunk from the same file.
+    generator : torch.Generator
+        used to shuffle. Default is None, in which case
+        the default torch random number generator is used,
+        so that ``torch.manual_seed`` makes the order reproducible.
+    num_samples : int
+        number of windows per epoch. Default is None, in which case
+        every window in the dataset is used once per epoch.
+        If less than the number of windows in the dataset, a different subset
+        of chunks is used every epoch. If greater, chunks are drawn
+        from more than one shuffled order of the dataset.
+    """
+    def __init__(self, spect_ids, windows_per_file, generator=None, num_samples=None):
+        if windows_per_file < 1:
+            raise ValueError(
+                f'windows_per_file must be a positive integer but was: {windows_per_file}'
+            )
+        if num_samples is not None and num_samples < 1:
+            raise ValueError(
+                f'num_samples must be a positive integer but was: {num_samples}'
+            )
+        self.spect_ids = np.asarray(spect_ids)
+        self.windows_per_file = int(windows_per_file)
+        self.generator = generator
+        self.num_samples = int(num_samples) if num_samples is not None else None
+
+    @classmethod
+    def from_dataset(cls, dataset, windows_per_file, generator=None, num_samples=None):
+        """create a FileLocalitySampler from a WindowDataset"""
+        spect_ids, _ = dataset.window_index[np.arange(len(dataset))]
+        return cls(spect_ids, windows_per_file, generator, num_samples)
+
+    def __iter__(self):
+        if self.spect_ids.shape[-1] == 0:
+            return iter([])
+        if self.num_samples is None:
+            return iter(self._order().tolist())
+
+        orders = []
+        n_samples = 0
+        while n_samples < self.num_samples:
+            orders.append(self._order())
+            n_samples += orders[-1].shape[-1]
+        return iter(np.concatenate(orders)[:self.num_samples].tolist())
+
+    def _order(self):
+        """indices of all windows, shuffled in chunks of windows from the same file"""
+        n_windows = self.spect_ids.shape[-1]
+
+        # shuffle all windows, then do a stable sort by file,
+        # so windows are grouped by file but in random order within each file
+        perm = torch.randperm(n_windows, generator=self.generator).numpy()
+        inds = perm[np.argsort(self.spect_ids[perm], kind='stable')]
+
+        # split the windows from each file into chunks of windows_per_file
+        sorted_ids = self.spect_ids[inds]
+        file_starts = np.flatnonzero(np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1])))
+        file_lens = np.diff(np.append(file_starts, n_windows))
+        ind_in_file = np.arange(n_windows) - np.repeat(file_starts, file_lens)
+        chunk_id = np.cumsum(ind_in_file % self.windows_per_file == 0) - 1
+
+        # then shuffle the chunks
+        n_chunks = chunk_id[-1] + 1
+        chunk_rank = np.empty(n_chunks, dtype=np.int64)
+        chunk_rank[torch.randperm(n_chunks, generator=self.generator).numpy()] = np.arange(n_chunks)
+        return inds[np.argsort(chunk_rank[chunk_id], kind='stable')]
+
+    def __len__(self):
+        if self.num_samples is not None:
+            return self.num_samples
+        return self.spect_ids.shape[-1]
+
+
+class RandomWindowSampler(torch.utils.data.Sampler):
+    """Sampler that draws a fixed number of random windows every epoch,
+    instead of every window in the dataset.
+
+    The number of windows in a WindowDataset scales with the total number of
+    time bins, so the time an epoch takes does too. With this sampler,
+    the number of training steps per epoch is the same for any dataset,
+    e.g. for training subsets of different sizes in a learning curve.
+
+    Attributes
+    ----------
+    n_windows : int
+        number of windows in dataset.
+    num_samples : int
+        number of windows drawn every epoch.
+    replacement : bool
+        if True, windows are drawn with replacement, so the same window can occur
+        more than once in an epoch. If False, windows are drawn without replacement,
+        and if ``num_samples`` is greater than ``n_windows``, from more than one
+        random permutation of the windows. Default is False.
+    generator : torch.Generator
+        used to draw windows. Default is None, in which case
+        the default torch random number generator is used.
+    """
+    def __init__(self, n_windows, num_samples, replacement=False, generator=None):
+        if num_samples < 1:
+            raise ValueError(
+                f'num_samples must be a positive integer but was: {num_samples}'
+            )
+        self.n_windows = int(n_windows)
+        self.num_samples = int(num_samples)
+        self.replacement = replacement
+        self.generator = generator
+
+    @classmethod
+    def from_dataset(cls, dataset, num_samples, replacement=False, generator=None):
+        """create a RandomWindowSampler from a WindowDataset"""
+        return cls(len(dataset), num_samples, replacement, generator)
+
+    def __iter__(self):
+        if self.n_windows == 0:
+            return iter([])
+        if self.replacement:
+            inds = torch.randint(self.n_windows, (self.num_samples,), generator=self.generator)
+        else:
+            n_perms = (self.num_samples + self.n_windows - 1) // self.n_windows
+            inds = torch.cat([torch.randperm(self.n_windows, generator=self.generator)
+                              for _ in range(n_perms)])[:self.num_samples]
+        return iter(inds.tolist())
+
+    def __len__(self):
+        return self.num_samples
+
+
+class PrefetchSampler(torch.utils.data.Sampler):
+    """Sampler that wraps another sampler, and uses the order of indices
+    it returns to read spectrogram files before they are needed.
+
+    At the start of each epoch, the indices from the wrapped sampler
+    are determined all at once. These are converted to the sequence of
+    spectrogram files that items will be loaded from, the "plan" for the epoch.
+    Then, while indices are returned one at a time, the next ``files_ahead`` files
+    in the plan are read by a pool of background threads, using ``dataset.prefetch``,
+    so that reading files overlaps with loading items and training.
+    This hides the latency of opening and reading files, e.g. on a network file system.
+
+    When the dataset has a ``vak.datasets.cache.SharedSpectCache``,
+    files are loaded into the cache, where DataLoader workers find them.
+    Otherwise files are only read, so that they are in the operating system's file cache.
+
+    Prefetching is best effort: errors in background threads are ignored,
+    and the file will be loaded as usual when it is needed.
+
+    Attributes
+    ----------
+    sampler : torch.utils.data.Sampler
+        sampler that determines the order of indices, e.g. a ``FileLocalitySampler``
+    dataset : vak.datasets.WindowDataset, vak.datasets.VocalDataset
+        dataset that indices are for. Must have methods ``spect_ids``
+        and ``prefetch``.
+    files_ahead : int
+        number of files to read ahead of the file needed by the current index.
+    num_threads : int
+        number of threads used to read files. Default is 4.
+    """
+    def __init__(self, sampler, dataset, files_ahead, num_threads=4):
+        if files_ahead < 1:
+            raise ValueError(
+                f'files_ahead must be a positive integer but was: {files_ahead}'
+            )
+        self.sampler = sampler
+        self.dataset = dataset
+        self.files_ahead = int(files_ahead)
+        self.num_threads = int(num_threads)
+
+    def plan(self, inds):
+        """determine sequence of files that will be needed for a sequence of indices
+
+        Parameters
+        ----------
+        inds : numpy.ndarray
+            indices into the dataset, in the order they will be used.
+
+        Returns
+        -------
+        run_starts : numpy.ndarray
+            position in ``inds`` where each run of indices from the same file starts.
+        run_spect_ids : numpy.ndarray
+            id of the spectrogram file for each run.
+        """
+        spect_ids = self.dataset.spect_ids(inds)
+        run_starts = np.flatnonzero(np.concatenate(([True], spect_ids[1:] != spect_ids[:-1])))
+        return run_starts, spect_ids[run_starts]
+
+    def __iter__(self):
+        inds = list(iter(self.sampler))
+        if len(inds) == 0:
+            return
+        run_starts, run_spect_ids = self.plan(np.asarray(inds))
+        n_runs = run_starts.shape[-1]
+
+        # create threads when iteration starts, so they are not copied into forked DataLoader workers
+        executor = ThreadPoolExecutor(max_workers=self.num_threads)
+        futures = deque()
+        current_run = -1
+        next_run = 0  # next run whose file will be prefetched
+        try:
+            for position, idx in enumerate(inds):
+                if current_run + 1 < n_runs and run_starts[current_run + 1] == position:
+                    current_run += 1
+                    # don't prefetch the file that is being used now
+                    next_run = max(next_run, current_run + 1)
+                while next_run < n_runs and next_run <= current_run + self.files_ahead:
+                    futures.append(executor.submit(self.dataset.prefetch, int(run_spect_ids[next_run])))
+                    next_run += 1
+                while futures and futures[0].done():
+                    futures.popleft()
+                yield idx
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def __len__(self):
+        return len(self.sampler)
+
+
+class LengthBucketBatchSampler(torch.utils.data.Sampler):
+    """Batch sampler that groups items of similar length into the same batch,
+    so that little padding is needed when items are padded to the same length.
+
+    Used when training on whole spectrograms of different widths,
+    see ``vak.datasets.collate.pad_collate``.
+    Items are shuffled, split into "buckets" of ``batch_size * batches_per_bucket`` items,
+    and sorted by length within each bucket. Each bucket is then split into batches,
+    and the order of all the batches is shuffled.
+    Larger values of ``batches_per_bucket`` mean less padding, but less random batches.
+
+    Attributes
+    ----------
+    lengths : numpy.ndarray
+        length of each item in the dataset, e.g. number of time bins in each spectrogram.
+    batch_size : int
+        number of items in a batch.
+    batches_per_bucket : int
+        number of batches in each bucket of items that are sorted by length. Default is 50.
+    shuffle : bool
+        if True, shuffle items before splitting them into buckets, and shuffle batches.
+        Default is True. If False, items are sorted by length within each bucket
+        of consecutive indices.
+    drop_last : bool
+        if True, drop batches with fewer than ``batch_size`` items. Default is False.
+    generator : torch.Generator
+        used to shuffle. Default is None, in which case
+        the default torch random number generator is used.
+    """
+    def __init__(self, lengths, batch_size, batches_per_bucket=50, shuffle=True, drop_last=False, generator=None):
+        if batch_size < 1:
+            raise ValueError(
+                f'batch_size must be a positive integer but was: {batch_size}'
+            )
+        if batches_per_bucket < 1:
+            raise ValueError(
+                f'batches_per_bucket must be a positive integer but was: {batches_per_bucket}'
+            )
+        self.lengths = np.asarray(lengths)
+        self.batch_size = int(batch_size)
+        self.batches_per_bucket = int(batches_per_bucket)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    @classmethod
+    def from_dataset(cls, dataset, batch_size, batches_per_bucket=50, shuffle=True, drop_last=False, generator=None):
+        """create a LengthBucketBatchSampler from a VocalDataset,
+        using the number of time bins in each spectrogram"""
+        if dataset.n_timebins is not None:
+            lengths = dataset.n_timebins
+        else:
+            lengths = [files.spect.shape(spect_path, dataset.spect_key)[-1] for spect_path in dataset.spect_paths]
+        return cls(lengths, batch_size, batches_per_bucket, shuffle, drop_last, generator)
+
+    def __iter__(self):
+        n_items = self.lengths.shape[-1]
+        if self.shuffle:
+            inds = torch.randperm(n_items, generator=self.generator).numpy()
+        else:
+            inds = np.arange(n_items)
+
+        bucket_size = self.batch_size * self.batches_per_bucket
+        batches = []
+        for bucket_start in range(0, n_items, bucket_size):
+            bucket = inds[bucket_start:bucket_start + bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind='stable')]
+            batches.extend([bucket[batch_start:batch_start + self.batch_size]
+                            for batch_start in range(0, bucket.shape[-1], self.batch_size)])
+        if self.drop_last:
+            batches = [batch for batch in batches if batch.shape[-1] == self.batch_size]
+
+        if self.shuffle:
+            batches = [batches[batch_ind] for batch_ind in torch.randperm(len(batches), generator=self.generator)]
+        return iter([batch.tolist() for batch in batches])
+
+    def __len__(self):
+        n_items = self.lengths.shape[-1]
+        bucket_size = self.batch_size * self.batches_per_bucket
+        n_full_buckets, last_bucket_size = divmod(n_items, bucket_size)
+        n_batches = n_full_buckets * self.batches_per_bucket
+        if self.drop_last:
+            return n_batches + last_bucket_size // self.batch_size
+        return n_batches + (last_bucket_size + self.batch_size - 1) // self.batch_size
+
+
+class WindowPackingBatchSampler(torch.utils.data.Sampler):
+    """Batch sampler that packs consecutive spectrograms into batches
+    with up to a target number of windows.
+
+    Used when evaluating or predicting, where each spectrogram is reshaped
+    into a stack of windows (see ``vak.transforms.defaults.EvalItemTransform``),
+    with ``vak.datasets.collate.pack_windows`` as the ``collate_fn``.
+    Instead of one forward pass per spectrogram, windows from several short
+    spectrograms are fed through the network at once.
+    Spectrograms stay in order. A spectrogram that has more windows
+    than ``max_windows`` is put in a batch by itself.
+
+    Attributes
+    ----------
+    n_windows : numpy.ndarray
+        number of windows in each item in the dataset.
+    max_windows : int
+        maximum number of windows in a batch, unless a single item has more.
+    batches : list
+        of lists of indices into the dataset, one list per batch.
+    """
+    def __init__(self, n_windows, max_windows):
+        if max_windows < 1:
+            raise ValueError(
+                f'max_windows must be a positive integer but was: {max_windows}'
+            )
+        self.n_windows = np.asarray(n_windows, dtype=np.int64)
+        self.max_windows = int(max_windows)
+
+        self.batches = []
+        batch, batch_windows = [], 0
+        for ind, item_windows in enumerate(self.n_windows.tolist()):
+            if batch and batch_windows + item_windows > self.max_windows:
+                self.batches.append(batch)
+                batch, batch_windows = [], 0
+            batch.append(ind)
+            batch_windows += item_windows
+        if batch:
+            self.batches.append(batch)
+
+    @classmethod
+    def from_dataset(cls, dataset, window_size, max_windows):
+        """create a WindowPackingBatchSampler from a VocalDataset,
+        using the number of time bins in each spectrogram,
+        padded to a multiple of ``window_size``"""
+        if dataset.n_timebins is not None:
+            lengths = np.asarray(dataset.n_timebins)
+        else:
+            lengths = np.array([files.spect.shape(spect_path, dataset.spect_key)[-1]
+                                for spect_path in dataset.spect_paths])
+        n_windows = -(-lengths // window_size)  # ceiling division, same as padding with PadToWindow
+        return cls(n_windows, max_windows)
+
+    def __iter__(self):
+        return iter([list(batch) for batch in self.batches])
+
+    def __len__(self):
+        return len(self.batches)
@@ -0,0 +1,172 @@
+"""loader that takes batches of windows from a WindowDataset held in memory as torch tensors"""
+import numpy as np
+import torch
+
+
+class WindowTensorLoader:
+    """Iterable that yields batches of training windows from a preloaded WindowDataset,
+    without using a ``torch.utils.data.DataLoader``.
+
+    All spectrograms in the dataset are kept in a single tensor,
+    with time bins as rows (see ``WindowDataset.preload``), along with
+    a single tensor of labeled timebins. A batch is gathered with one
+    advanced indexing operation on each tensor, using a tensor of window start indices.
+    There is no per-item Python code and there are no worker processes,
+    so there is no cost of starting workers or pickling items between processes.
+    The tensors can be put on the device used for training, so that
+    windows are also sliced on that device.
+
+    Batches are tuples ``(windows, labelvecs)`` where ``windows`` has shape
+    (batch, channel, frequency bins, time bins) and ``labelvecs`` has shape
+    (batch, time bins), the same as batches from a ``DataLoader``
+    using the default training transforms. This means it can be passed to
+    ``vak.engine.model.Model.fit`` as ``train_data``.
+
+    Attributes
+    ----------
+    spects : torch.Tensor
+        all spectrograms in dataset, with shape (time bins, frequency bins).
+    lbl_tb : torch.Tensor
+        labeled timebins for all spectrograms in dataset.
+    window_starts : torch.Tensor
+        index in ``spects`` and ``lbl_tb`` of the first time bin of each window in the dataset.
+    window_size : int
+        number of time bins in windows.
+    batch_size : int
+        number of windows per batch.
+    shuffle : bool
+        if True, windows are in a random order every time the loader is iterated over.
+    sampler : torch.utils.data.Sampler
+        if specified, determines order of windows, instead of ``shuffle``,
+        e.g. a ``vak.datasets.samplers.FileLocalitySampler``. Default is None.
+    drop_last : bool
+        if True, drop the last batch if it has fewer than ``batch_size`` windows.
+        Default is False.
+    dataset : vak.datasets.WindowDataset
+        dataset that tensors were made from. If specified, ``set_epoch``
+        calls ``dataset.set_epoch`` and then gets ``window_starts`` from the dataset again,
+        so that windows change every epoch when the dataset uses random window offsets.
+        Default is None.
+    """
+    def __init__(self,
+                 spects,
+                 lbl_tb,
+                 window_starts,
+                 window_size,
+                 batch_size,
+                 shuffle=True,
+                 sampler=None,
+                 drop_last=False,
+                 dataset=None):
+        self.spects = spects
+        self.lbl_tb = lbl_tb
+        self.window_starts = window_starts
+        self.window_size = int(window_size)
+        self.batch_size = int(batch_size)
+        self.shuffle = shuffle
+        self.sampler = sampler
+        self.drop_last = drop_last
+        self.dataset = dataset
+        self._window_offsets = torch.arange(self.window_size, device=self.window_starts.device)
+
+    @classmethod
+    def from_dataset(cls,
+                     dataset,
+                     batch_size,
+                     shuffle=True,
+                     sampler=None,
+                     drop_last=False,
+                     device=None,
+                     pin_memory=False):
+        """create a WindowTensorLoader from a WindowDataset
+        that has been loaded into memory with ``WindowDataset.preload``.
+
+        Parameters
+        ----------
+        dataset : vak.datasets.WindowDataset
+            preloaded dataset. Any standardization should have been applied
+            when preloading, because ``dataset.transform`` is not used.
+        batch_size : int
+            number of windows per batch.
+        shuffle : bool
+            if True, shuffle windows every time loader is iterated over. Default is True.
+        sampler : torch.utils.data.Sampler
+            determines order of windows, instead of ``shuffle``. Default is None.
+        drop_last : bool
+            if True, drop the last batch if it has fewer than ``batch_size`` windows.
+            Default is False.
+        device : str, torch.device
+            device where tensors are kept, and where windows are sliced.
+            Default is None, in which case tensors are kept on the CPU.
+        pin_memory : bool
+            if True, and tensors are kept on the CPU, put them in pinned memory,
+            so that copying batches to a GPU is faster. Default is False.
+
+        Returns
+        -------
+        loader : WindowTensorLoader
+        """
+        if not dataset.preloaded:
+            raise ValueError(
+                'dataset must be preloaded with WindowDataset.preload to create a WindowTensorLoader'
+            )
+
+        window_starts = cls.window_starts_from_dataset(dataset)
+        spects = torch.from_numpy(dataset.window_store)
+        lbl_tb = torch.from_numpy(dataset.lbl_tb).long()
+
+        if device is not None:
+            spects, lbl_tb, window_starts = (tensor.to(device) for tensor in (spects, lbl_tb, window_starts))
+        if pin_memory and spects.device.type == 'cpu':
+            spects, lbl_tb = spects.pin_memory(), lbl_tb.pin_memory()
+
+        return cls(spects, lbl_tb, window_starts, dataset.window_size, batch_size, shuffle, sampler, drop_last,
+                   dataset)
+
+    @staticmethod
+    def window_starts_from_dataset(dataset):
+        """index of the first time bin of each window in a preloaded WindowDataset,
+        within the array of all its spectrograms"""
+        spect_ids, window_start_inds = dataset.window_index[np.arange(len(dataset))]
+        # after preloading, offsets of spectrograms are the same in window store and labeled timebins
+        return torch.from_numpy(dataset.spect_offsets[spect_ids] + window_start_inds)
+
+    def set_epoch(self, epoch):
+        """call ``set_epoch`` of the dataset the loader was made from, if any,
+        and use the windows it has for this epoch.
+        Called by ``vak.engine.model.Model`` at the start of every training epoch."""
+        if self.dataset is not None:
+            self.dataset.set_epoch(epoch)
+            self.window_starts = self.window_starts_from_dataset(self.dataset).to(self.window_starts.device)
+
+    def _order(self):
+        """indices of windows, in the order they will be returned in batches"""
+        n_windows = self.window_starts.shape[-1]
+        if self.sampler is not None:
+            order = torch.as_tensor(list(iter(self.sampler)), dtype=torch.int64)
+        elif self.shuffle:
+            order = torch.randperm(n_windows)
+        else:
+            order = torch.arange(n_windows)
+        return order.to(self.window_starts.device)
+
+    def __iter__(self):
+        order = self._order()
+        for batch_start in range(0, len(self) * self.batch_size, self.batch_size):
+            batch_inds = order[batch_start:batch_start + self.batch_size]
+            # indices of every time bin in every window
+            timebin_inds = self.window_starts[batch_inds].unsqueeze(1) + self._window_offsets
+            # spects has time bins as rows, so windows have shape (batch, time bins, frequency bins)
+            windows = self.spects[timebin_inds].transpose(1, 2).unsqueeze(1)
+            labelvecs = self.lbl_tb[timebin_inds]
+            yield windows, labelvecs
+
+    def __len__(self):
+        """number of batches"""
+        if self.sampler is not None:
+            n_windows = len(self.sampler)
+        else:
+            n_windows = self.window_starts.shape[-1]
+        if self.drop_last:
+            return n_windows // self.batch_size
+        return (n_windows + self.batch_size - 1) // self.batch_size
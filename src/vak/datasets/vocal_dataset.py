@@ -1,8 +1,11 @@
+import numpy as np
 import pandas as pd
 
 from .. import annotation
 from .. import files
+from .. import io
 from .. import labeled_timebins
+from .cache import SharedSpectCache
 
 
 class VocalDataset:
@@ -19,6 +22,10 @@ class VocalDataset:
                  spect_key='s',
                  timebins_key='t',
                  item_transform=None,
+                 n_freqbins=None,
+                 n_timebins=None,
+                 spect_cache=None,
+                 return_timebins=False,
                  ):
         """initialize a VocalDataset instance
 
@@ -46,6 +53,22 @@ class VocalDataset:
             and optionally a target array or Tensor, and returns a dictionary.
             This dictionary is the item returned when indexing into the dataset.
             Default is None.
+        n_freqbins : int
+            number of frequency bins in spectrograms, e.g. from the 'n_freqbins'
+            column of a dataset csv. Default is None.
+        n_timebins : numpy.ndarray
+            number of time bins in each spectrogram in spect_paths,
+            e.g. from the 'n_timebins' column of a dataset csv. Default is None.
+            If both n_freqbins and n_timebins are specified, they are used
+            to determine ``shape`` without loading a spectrogram file.
+        spect_cache : vak.datasets.cache.SpectCache, vak.datasets.cache.SharedSpectCache
+            cache of spectrograms, and their labeled timebins, loaded from files,
+            e.g. so that a validation set is not loaded from files every time
+            it is used. Default is None, in which case every item is loaded from its file.
+        return_timebins : bool
+            if True, each item includes the vector of time bins from the spectrogram file,
+            with the key 'timebins', e.g. so that predictions can be converted
+            to annotations without loading the file again. Default is False.
         """
         self.csv_path = csv_path
         self.spect_paths = spect_paths
@@ -60,21 +83,77 @@ class VocalDataset:
             # just assign dummy value that will end up getting replaced by actual labels by label_timebins()
             self.unlabeled_label = 0
         self.item_transform = item_transform
+        self.n_freqbins = n_freqbins
+        self.n_timebins = n_timebins
+        self.spect_cache = spect_cache
+        self.return_timebins = return_timebins
+        # determined lazily, see ``shape`` property
+        self._shape = None
 
-        tmp_x_ind = 0
-        tmp_item = self.__getitem__(tmp_x_ind)
-        # used by vak functions that need to determine size of input,
-        # e.g. when initializing a neural network model
-        self.shape = tmp_item['source'].shape
+        # set by ``preload``
+        self.preloaded = False
+        self._spects = None
+        self._lbl_tb = None
+        self._spect_offsets = None
 
-    def __getitem__(self, idx):
-        spect_path = self.spect_paths[idx]
-        spect_dict = files.spect.load(spect_path)
+    @property
+    def shape(self):
+        """shape of 'source' in the first item in the dataset.
+
+        Used by vak functions that need to determine size of input,
+        e.g. when initializing a neural network model.
+        If ``n_freqbins`` and ``n_timebins`` are known, this is found by applying
+        ``item_transform`` to arrays of zeros with the shape of the first spectrogram
+        and its labeled timebins, so no file is loaded.
+        """
+        if self._shape is None:
+            if self.n_freqbins is not None and self.n_timebins is not None:
+                tmp_spect = np.zeros((self.n_freqbins, self.n_timebins[0]), dtype=np.float32)
+                if self.annots is not None:
+                    tmp_lbl_tb = np.full((self.n_timebins[0],), self.unlabeled_label, dtype=np.int64)
+                    tmp_item = self.item_transform(tmp_spect, tmp_lbl_tb)
+                else:
+                    tmp_item = self.item_transform(tmp_spect)
+            else:
+                tmp_x_ind = 0
+                tmp_item = self.__getitem__(tmp_x_ind)
+            self._shape = tuple(tmp_item['source'].shape)
+        return self._shape
+
+    def _load_spect_lbl_tb(self, idx):
+        """load spectrogram, and labeled timebins if there are annotations,
+        given an index into the dataset.
+        Uses the cache if there is one, otherwise loads from the file"""
+        if self.spect_cache is not None:
+            cached = self.spect_cache.get(idx)
+            if cached is not None:
+                if self.annots is not None:
+                    spect, lbl_tb = cached
+                else:
+                    spect, lbl_tb = cached, None
+                # copy so transforms can't modify cached array in place
+                return spect.copy(), lbl_tb
+
+        try:
+            spect, lbl_tb, _ = self._load_from_file(idx)
+        except BaseException:
+            if self.spect_cache is not None:
+                # so other processes don't wait for a value that will never be put in the cache
+                self.spect_cache.cancel(idx)
+            raise
+
+        if self.spect_cache is not None:
+            self.spect_cache.put(idx, (spect, lbl_tb) if lbl_tb is not None else spect)
+        return spect, lbl_tb
+
+    def _load_from_file(self, idx):
+        """load spectrogram, labeled timebins if there are annotations,
+        and vector of time bins, from the file for an index into the dataset"""
+        spect_dict = files.spect.load(self.spect_paths[idx])
         spect = spect_dict[self.spect_key]
+        timebins = spect_dict[self.timebins_key]
 
         if self.annots is not None:
-            timebins = spect_dict[self.timebins_key]
-
             annot = self.annots[idx]
             lbls_int = [self.labelmap[lbl] for lbl in annot.seq.labels]
             # "lbl_tb": labeled timebins. Target for output of network
@@ -83,10 +162,110 @@ class VocalDataset:
                                                      annot.seq.offsets_s,
                                                      timebins,
                                                      unlabeled_label=self.unlabeled_label)
+        else:
+            lbl_tb = None
+
+        return spect, lbl_tb, timebins
+
+    def spect_ids(self, indices):
+        """ids of spectrograms that items come from, given indices into the dataset.
+        Each item is one spectrogram, so these are the indices."""
+        return np.asarray(indices)
+
+    def prefetch(self, spect_id):
+        """read spectrogram file for a spectrogram id before it is needed,
+        e.g. in a background thread started by ``vak.datasets.samplers.PrefetchSampler``.
+
+        If the dataset has a ``SharedSpectCache``, the spectrogram is loaded into the cache,
+        that DataLoader workers will take it from. Otherwise the file is read
+        so that its contents are in the operating system's file cache.
+        Does nothing if the dataset was preloaded.
+        """
+        if self.preloaded:
+            return
+        if isinstance(self.spect_cache, SharedSpectCache):
+            if spect_id not in self.spect_cache:
+                self._load_spect_lbl_tb(spect_id)
+        else:
+            files.spect.read_ahead(self.spect_paths[spect_id])
+
+    def preload_nbytes(self):
+        """estimated size in bytes of all spectrograms in the dataset,
+        when loaded into memory as a float32 array by ``VocalDataset.preload``"""
+        if self.n_freqbins is not None and self.n_timebins is not None:
+            n_freqbins, total_timebins = self.n_freqbins, int(np.sum(self.n_timebins))
+        else:
+            spect_shapes = [files.spect.shape(spect_path, self.spect_key) for spect_path in self.spect_paths]
+            n_freqbins = spect_shapes[0][0]
+            total_timebins = sum([spect_shape[-1] for spect_shape in spect_shapes])
+        return total_timebins * n_freqbins * np.dtype(np.float32).itemsize
+
+    def preload(self, spect_standardizer=None, max_mb=None):
+        """load all spectrograms in the dataset, and their labeled timebins,
+        into memory, as a single float32 array and a single vector of labels.
+        After preloading, items are sliced from these instead of being loaded from files.
+
+        Parameters
+        ----------
+        spect_standardizer : vak.transforms.StandardizeSpect
+            if specified, applied once to every spectrogram when it is loaded.
+            In that case, ``item_transform`` should not also standardize spectrograms.
+            Default is None.
+        max_mb : float
+            memory budget, in megabytes. If the estimated size of the preloaded array
+            is larger, the dataset is not preloaded. Default is None, in which case
+            the dataset is always preloaded.
+
+        Returns
+        -------
+        preloaded : bool
+            True if the dataset was preloaded, False if it was too large.
+        """
+        if self.preloaded:
+            return True
+        if max_mb is not None and self.preload_nbytes() > max_mb * 2 ** 20:
+            return False
+
+        spects, lbl_tbs = [], []
+        for idx in range(len(self)):
+            spect, lbl_tb = self._load_spect_lbl_tb(idx)
+            if spect_standardizer is not None:
+                spect = spect_standardizer(spect)
+            spects.append(spect.astype(np.float32))
+            lbl_tbs.append(lbl_tb)
+
+        n_timebins_per_spect = [spect.shape[-1] for spect in spects]
+        self._spect_offsets = np.cumsum([0] + n_timebins_per_spect)
+        self._spects = np.concatenate(spects, axis=1)
+        if self.annots is not None:
+            self._lbl_tb = np.concatenate(lbl_tbs)
+        self.preloaded = True
+        return True
+
+    def __getitem__(self, idx):
+        spect_path = self.spect_paths[idx]
+        timebins = None
+        if self.preloaded:
+            start_ind, stop_ind = self._spect_offsets[idx], self._spect_offsets[idx + 1]
+            # copy so transforms can't modify preloaded array in place
+            spect = self._spects[:, start_ind:stop_ind].copy()
+            lbl_tb = self._lbl_tb[start_ind:stop_ind] if self.annots is not None else None
+        elif self.return_timebins and self.spect_cache is None:
+            # read the file once, for the spectrogram and the time bins
+            spect, lbl_tb, timebins = self._load_from_file(idx)
+        else:
+            spect, lbl_tb = self._load_spect_lbl_tb(idx)
+
+        if self.annots is not None:
             item = self.item_transform(spect, lbl_tb, spect_path)
         else:
             item = self.item_transform(spect, spect_path)
 
+        if self.return_timebins:
+            if timebins is None:
+                timebins = files.spect.load(spect_path)[self.timebins_key]
+            item['timebins'] = timebins
+
         return item
 
     def __len__(self):
@@ -95,7 +274,8 @@ class VocalDataset:
 
     @classmethod
     def from_csv(cls, csv_path, split, labelmap,
-                 spect_key='s', timebins_key='t', item_transform=None):
+                 spect_key='s', timebins_key='t', item_transform=None, spect_cache=None,
+                 return_timebins=False):
         """given a path to a csv representing a dataset,
         returns an initialized VocalDataset.
 
@@ -123,6 +303,12 @@ class VocalDataset:
             and optionally a target array or Tensor, and returns a dictionary.
             This dictionary is the item returned when indexing into the dataset.
             Default is None.
+        spect_cache : vak.datasets.cache.SpectCache, vak.datasets.cache.SharedSpectCache
+            cache of spectrograms, and their labeled timebins, loaded from files.
+            Default is None, in which case every item is loaded from its file.
+        return_timebins : bool
+            if True, each item includes the vector of time bins from the spectrogram file,
+            with the key 'timebins'. Default is False.
 
         Returns
         -------
@@ -142,6 +328,12 @@ class VocalDataset:
         # this is intended behavior; makes it possible to use same dataset class for prediction
         annots = annotation.from_df(df)
 
+        n_freqbins = io.dataframe.n_freqbins_from_df(df)
+        if 'n_timebins' in df.columns and not df['n_timebins'].isnull().any():
+            n_timebins = df['n_timebins'].values.astype(np.int64)
+        else:
+            n_timebins = None
+
         return cls(csv_path,
                    spect_paths,
                    annots,
@@ -149,4 +341,8 @@ class VocalDataset:
                    spect_key,
                    timebins_key,
                    item_transform,
+                   n_freqbins,
+                   n_timebins,
+                   spect_cache,
+                   return_timebins,
                    )
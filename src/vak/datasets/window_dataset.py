@@ -9,6 +9,9 @@ from .. import files
 from .. import io
 from .. import labeled_timebins
 from .. import validators
+from .annot_arrays import AnnotArrays
+from .cache import SharedSpectCache
+from .window_index import WindowIndex
 
 
 class WindowDataset(VisionDataset):
@@ -36,10 +39,12 @@ class WindowDataset(VisionDataset):
         valid indices of windows we can grab from each spectrogram
     spect_paths : numpy.ndarray
         column from DataFrame that represents dataset,
-        consisting of paths to files containing spectrograms as arrays
-    annots : list
-        of crowsetta.Annotation instances,
-        loaded from from DataFrame that represents dataset, using vak.annotation.from_df.
+        consisting of paths to files containing spectrograms as arrays.
+        Converted to an array of strings, so that it can be pickled compactly.
+    annots : vak.datasets.annot_arrays.AnnotArrays
+        annotations loaded from from DataFrame that represents dataset,
+        using vak.annotation.from_df, converted from a list of crowsetta.Annotation
+        instances to arrays, so that the dataset can be pickled compactly.
     labelmap : dict
         that maps labels from dataset to a series of consecutive integer.
         To create a label map, pass a set of labels to the `vak.utils.labels.to_map` function.
@@ -57,6 +62,36 @@ class WindowDataset(VisionDataset):
         Default is None.
     target_transform : callable
         A function/transform that takes in the target and transforms it.
+    lbl_tb : numpy.ndarray
+        labeled timebins for all spectrograms in spect_paths, concatenated.
+        Built once when the dataset is initialized, so that labels for a window
+        are a slice of this vector instead of being computed from annotations.
+    spect_offsets : numpy.ndarray
+        index in lbl_tb of the first time bin of each spectrogram in spect_paths
+    spect_cache : vak.datasets.cache.SpectCache, vak.datasets.cache.SharedSpectCache
+        cache of spectrograms loaded from files.
+        Default is None, in which case every window is loaded from its file.
+    window_store_path : str
+        path to a window store, a single array file containing all spectrograms
+        in spect_paths, created by ``vak.io.window_store.to_window_store``.
+        Default is None, in which case windows are loaded from the spectrogram files.
+    window_store_offsets : numpy.ndarray
+        index in window store of the first time bin of each spectrogram in spect_paths.
+    preloaded : bool
+        if True, all spectrograms have been loaded into memory by ``WindowDataset.preload``,
+        and windows are sliced from a single in-memory array.
+    n_freqbins : int
+        number of frequency bins in spectrograms. Used to determine ``shape``
+        without loading a window. Default is None.
+    shape : tuple
+        shape of windows returned by the dataset, after transforms are applied.
+        Determined the first time it is accessed.
+    window_stride : int
+        only every ``window_stride``-th valid window start is used. Default is 1.
+    random_window_offset : bool
+        if True, the first window start used in each run of valid starts
+        is chosen at random, and chosen again every epoch by ``set_epoch``.
+        Default is False.
 
     Notes
     -----
@@ -77,6 +112,13 @@ class WindowDataset(VisionDataset):
     When we want to grab a batch of size b of windows, we get b indices from x,
     and then index into vectors (1) and (2) so we know which spectrogram files to
     load, and which windows to grab from each spectrogram
+
+    Because these vectors have one element per time bin, the dataset
+    does not actually store them. Instead it uses a
+    ``vak.datasets.window_index.WindowIndex``, that represents the same
+    information with a few elements per spectrogram file.
+    The vectors can still be passed in when creating a dataset,
+    and can be computed from the WindowIndex with ``WindowDataset.to_vectors``.
     """
 
     # class attribute, constant used by several methods
@@ -97,6 +139,15 @@ class WindowDataset(VisionDataset):
                  timebins_key='t',
                  transform=None,
                  target_transform=None,
+                 spect_cache=None,
+                 window_store_path=None,
+                 window_store_offsets=None,
+                 window_index=None,
+                 n_freqbins=None,
+                 window_stride=1,
+                 random_window_offset=False,
+                 n_timebins=None,
+                 timebin_bounds=None,
                  ):
         """initialize a WindowDataset instance
 
@@ -121,9 +172,10 @@ class WindowDataset(VisionDataset):
         spect_paths : numpy.ndarray
             column from DataFrame that represents dataset,
             consisting of paths to files containing spectrograms as arrays
-        annots : list
+        annots : list, vak.datasets.annot_arrays.AnnotArrays
             of crowsetta.Annotation instances,
             loaded from from DataFrame that represents dataset, using vak.annotation.from_df.
+            Converted to AnnotArrays.
         labelmap : dict
             that maps labels from dataset to a series of consecutive integer.
             To create a label map, pass a set of labels to the `vak.utils.labels.to_map` function.
@@ -141,16 +193,73 @@ class WindowDataset(VisionDataset):
             Default is None.
         target_transform : callable
             A function/transform that takes in the target and transforms it.
+        spect_cache : vak.datasets.cache.SpectCache, vak.datasets.cache.SharedSpectCache
+            cache of spectrograms loaded from files.
+            Each DataLoader worker process gets its own (initially empty) copy
+            of a SpectCache, while all workers use the same SharedSpectCache.
+            Default is None, in which case every window is loaded from its file.
+        window_store_path : str, pathlib.Path
+            path to a window store, a single array file containing all spectrograms
+            in spect_paths, created by ``vak.io.window_store.to_window_store``.
+            If specified, windows are sliced from the window store,
+            opened as a memory-mapped array, instead of being loaded from
+            spectrogram files. Default is None.
+        window_store_offsets : numpy.ndarray
+            index in window store of the first time bin of each spectrogram in spect_paths.
+            Required if window_store_path is specified.
+        window_index : vak.datasets.window_index.WindowIndex
+            compact representation of x_inds, spect_id_vector, and spect_inds_vector.
+            If specified, those three vectors should be None. Default is None,
+            in which case the WindowIndex is created from the vectors.
+        n_freqbins : int
+            number of frequency bins in spectrograms, e.g. from the 'n_freqbins'
+            column of a dataset csv. Used to determine ``shape`` without loading
+            a window from a spectrogram file. Default is None, in which case
+            the first window in the dataset is loaded the first time
+            ``shape`` is accessed.
+        window_stride : int
+            keep only every ``window_stride``-th valid window start,
+            so that an epoch does not consist of windows that overlap almost entirely.
+            Applied to each run of consecutive valid starts, so it can be combined
+            with windows from a cropped dataset. Default is 1, in which case every
+            valid start is used. See ``vak.datasets.window_index.WindowIndex.strided``.
+        random_window_offset : bool
+            if True, and window_stride is greater than 1, the first window start kept
+            in each run is chosen at random (using ``numpy.random``)
+            instead of always being the first valid start.
+            The starts are chosen again each time ``set_epoch`` is called,
+            so that different windows are used every epoch. Default is False.
+        n_timebins : numpy.ndarray
+            number of time bins in each spectrogram in spect_paths,
+            e.g. from the 'n_timebins' column of a dataset csv. Default is None.
+        timebin_bounds : numpy.ndarray
+            times in seconds of the first and last time bin in each spectrogram,
+            e.g. from the 'first_timebin' and 'last_timebin' columns of a dataset csv.
+            If both n_timebins and timebin_bounds are specified, labeled timebins
+            are made without opening spectrogram files, except for those whose row is NaN.
+            Default is None, in which case the vector of time bins is loaded from each file.
         """
         super(WindowDataset, self).__init__(root, transform=transform,
                                             target_transform=target_transform)
-        self.x_inds = x_inds
-        self.spect_id_vector = spect_id_vector
-        self.spect_inds_vector = spect_inds_vector
-        self.spect_paths = spect_paths
+        if window_index is None:
+            if any([vec is None for vec in [x_inds, spect_id_vector, spect_inds_vector]]):
+                raise ValueError(
+                    'must specify either window_index, or all of: x_inds, spect_id_vector, spect_inds_vector'
+                )
+            window_index = WindowIndex.from_vectors(spect_id_vector, spect_inds_vector, x_inds)
+        elif any([vec is not None for vec in [x_inds, spect_id_vector, spect_inds_vector]]):
+            raise ValueError(
+                'cannot specify window_index and x_inds, spect_id_vector, or spect_inds_vector'
+            )
+        self.window_stride = window_stride
+        self.random_window_offset = random_window_offset
+        # keep every valid window start, so that ``set_epoch`` can choose different starts
+        self._unstrided_window_index = window_index
+        self.window_index = window_index.strided(window_stride, random_window_offset)
+        self.spect_paths = np.asarray(spect_paths, dtype=str)
         self.spect_key = spect_key
         self.timebins_key = timebins_key
-        self.annots = annots
+        self.annots = annots if isinstance(annots, AnnotArrays) else AnnotArrays.from_annots(annots)
         self.labelmap = labelmap
         self.timebin_dur = timebin_dur
         if 'unlabeled' in self.labelmap:
@@ -160,12 +269,219 @@ class WindowDataset(VisionDataset):
             # just assign dummy value that will end up getting replaced by actual labels by label_timebins()
             self.unlabeled_label = 0
         self.window_size = window_size
+        self.spect_cache = spect_cache
+
+        if window_store_path is not None and window_store_offsets is None:
+            raise ValueError(
+                'must specify window_store_offsets when specifying window_store_path'
+            )
+        self.window_store_path = window_store_path
+        self.window_store_offsets = window_store_offsets
+        # memory-mapped array, opened lazily in each process that uses the dataset,
+        # or array in memory if dataset is preloaded
+        self._window_store = None
+        self.preloaded = False
+
+        # labeled timebins, expanded lazily from segments after unpickling, see ``lbl_tb``
+        self._lbl_tb = None
+        self._lbl_tb_segments = None
+        self.lbl_tb, self.spect_offsets = self.lbl_tb_from_annots(self.spect_paths,
+                                                                  self.annots,
+                                                                  labelmap,
+                                                                  timebins_key,
+                                                                  n_timebins,
+                                                                  timebin_bounds)
+
+        self.n_freqbins = n_freqbins
+        # determined lazily, see ``shape`` property
+        self._shape = None
+
+    @property
+    def shape(self):
+        """shape of windows returned by the dataset, after transforms are applied.
+
+        Used by vak functions that need to determine size of window,
+        e.g. when initializing a neural network model.
+        If ``n_freqbins`` is known, this is found by applying the transform
+        to an array of zeros with the shape of a window, so no file is loaded.
+        """
+        if self._shape is None:
+            if self.n_freqbins is not None:
+                one_x = np.zeros((self.n_freqbins, self.window_size), dtype=np.float32)
+                if self.transform is not None:
+                    one_x = self.transform(one_x)
+            else:
+                tmp_x_ind = 0
+                one_x, _ = self.__getitem__(tmp_x_ind)
+            self._shape = tuple(one_x.shape)
+        return self._shape
+
+    def set_epoch(self, epoch):
+        """choose new random window starts for an epoch,
+        if ``random_window_offset`` is True and ``window_stride`` is greater than 1.
+        Otherwise the dataset does not change.
+
+        Called by ``vak.engine.model.Model`` at the start of every training epoch.
+        The number of windows is the same for every epoch,
+        so samplers made from the dataset can still be used.
+        Starts are drawn with ``numpy.random``, so ``epoch`` does not determine them.
+        """
+        if self.random_window_offset and self.window_stride > 1:
+            self.window_index = self._unstrided_window_index.strided(self.window_stride, random_offset=True)
+
+    def to_vectors(self):
+        """get the vectors ``spect_id_vector``, ``spect_inds_vector``, and ``x_inds``
+        that represent the dataset (see Notes in class docstring), computed from ``window_index``.
+
+        Each vector has one element per time bin, or per window, in the dataset,
+        and all three are made every time this is called. To look up the window
+        for an index into the dataset, use ``window_index[idx]`` or ``window_index.x_ind(idx)``
+        instead.
+
+        Returns
+        -------
+        spect_id_vector : numpy.ndarray
+        spect_inds_vector : numpy.ndarray
+        x_inds : numpy.ndarray
+        """
+        return self.window_index.to_vectors()
+
+    @property
+    def window_store(self):
+        """window store, opened as a memory-mapped array,
+        or array with all spectrograms if dataset was preloaded"""
+        if self._window_store is None and self.window_store_path is not None:
+            self._window_store = io.window_store.load(self.window_store_path)
+        return self._window_store
+
+    @property
+    def lbl_tb(self):
+        """labeled timebins for all spectrograms in spect_paths, concatenated.
+
+        When the dataset is pickled, e.g. to send it to a DataLoader worker process,
+        only the labels, onset indices and offset indices of the segments in
+        this vector are pickled, and it is expanded again the first time it is used.
+        """
+        if self._lbl_tb is None and self._lbl_tb_segments is not None:
+            self._lbl_tb = labeled_timebins._unsegment_lbl_tb(*self._lbl_tb_segments)
+        return self._lbl_tb
+
+    @lbl_tb.setter
+    def lbl_tb(self, lbl_tb):
+        self._lbl_tb = lbl_tb
+        self._lbl_tb_segments = None
+
+    def __getstate__(self):
+        # don't pickle the memory map, each DataLoader worker opens its own
+        state = self.__dict__.copy()
+        if not self.preloaded:
+            state['_window_store'] = None
+        # pickle segments instead of one label per time bin
+        if self._lbl_tb_segments is None and self._lbl_tb is not None and self._lbl_tb.shape[-1] > 0:
+            self._lbl_tb_segments = labeled_timebins._segment_lbl_tb(self._lbl_tb)
+        if self._lbl_tb_segments is not None:
+            state['_lbl_tb_segments'] = self._lbl_tb_segments
+            state['_lbl_tb'] = None
+        return state
+
+    def preload_nbytes(self):
+        """estimated size in bytes of all spectrograms in the dataset,
+        when loaded into memory as a float32 array by ``WindowDataset.preload``"""
+        if self.n_freqbins is not None:
+            n_freqbins = self.n_freqbins
+        else:
+            n_freqbins = files.spect.shape(self.spect_paths[0], self.spect_key)[0]
+        return self.lbl_tb.shape[-1] * n_freqbins * np.dtype(io.window_store.WINDOW_STORE_DTYPE).itemsize
 
-        tmp_x_ind = 0
-        one_x, _ = self.__getitem__(tmp_x_ind)
-        # used by vak functions that need to determine size of window,
-        # e.g. when initializing a neural network model
-        self.shape = one_x.shape
+    def preload(self, spect_standardizer=None, max_mb=None):
+        """load all spectrograms in the dataset into memory,
+        as a single float32 array with time bins as rows, like a window store.
+        After preloading, windows are sliced from this array
+        instead of being loaded from files.
+
+        Parameters
+        ----------
+        spect_standardizer : vak.transforms.StandardizeSpect
+            if specified, applied once to every spectrogram when it is loaded.
+            In that case, ``transform`` should not also standardize windows.
+            Default is None.
+        max_mb : float
+            memory budget, in megabytes. If the estimated size of the preloaded array
+            is larger, the dataset is not preloaded. Default is None, in which case
+            the dataset is always preloaded.
+
+        Returns
+        -------
+        preloaded : bool
+            True if the dataset was preloaded, False if it was too large.
+        """
+        if self.preloaded:
+            return True
+        if max_mb is not None and self.preload_nbytes() > max_mb * 2 ** 20:
+            return False
+
+        n_timebins_per_spect = np.diff(np.append(self.spect_offsets, self.lbl_tb.shape[-1]))
+        store = None
+        for spect_id, n_timebins in enumerate(n_timebins_per_spect):
+            if self.window_store is not None:
+                store_start_ind = self.window_store_offsets[spect_id]
+                spect = self.window_store[store_start_ind:store_start_ind + n_timebins].T
+            else:
+                spect = files.spect.load(self.spect_paths[spect_id])[self.spect_key]
+            if spect_standardizer is not None:
+                spect = spect_standardizer(spect)
+            if store is None:
+                store = np.empty((self.lbl_tb.shape[-1], spect.shape[0]),
+                                 dtype=io.window_store.WINDOW_STORE_DTYPE)
+            store_start_ind = self.spect_offsets[spect_id]
+            store[store_start_ind:store_start_ind + n_timebins] = spect.T
+
+        self._window_store = store
+        self.window_store_offsets = self.spect_offsets
+        self.preloaded = True
+        return True
+
+    def _load_spect(self, spect_id):
+        """load spectrogram for a spectrogram id,
+        from the cache if there is one, otherwise from the file"""
+        if self.spect_cache is not None:
+            spect = self.spect_cache.get(spect_id)
+            if spect is not None:
+                return spect
+
+        try:
+            spect = files.spect.load(self.spect_paths[spect_id])[self.spect_key]
+        except BaseException:
+            if self.spect_cache is not None:
+                # so other processes don't wait for a value that will never be put in the cache
+                self.spect_cache.cancel(spect_id)
+            raise
+
+        if self.spect_cache is not None:
+            self.spect_cache.put(spect_id, spect)
+        return spect
+
+    def spect_ids(self, indices):
+        """ids of spectrograms that windows come from, given indices into the dataset"""
+        spect_ids, _ = self.window_index[np.asarray(indices)]
+        return spect_ids
+
+    def prefetch(self, spect_id):
+        """read spectrogram file for a spectrogram id before it is needed,
+        e.g. in a background thread started by ``vak.datasets.samplers.PrefetchSampler``.
+
+        If the dataset has a ``SharedSpectCache``, the spectrogram is loaded into the cache,
+        that DataLoader workers will take it from. Otherwise the file is read
+        so that its contents are in the operating system's file cache.
+        Does nothing if windows are taken from a window store, or the dataset was preloaded.
+        """
+        if self.window_store_path is not None or self.preloaded:
+            return
+        if isinstance(self.spect_cache, SharedSpectCache):
+            if spect_id not in self.spect_cache:
+                self._load_spect(spect_id)
+        else:
+            files.spect.read_ahead(self.spect_paths[spect_id])
 
     def __get_window_labelvec(self, idx):
         """helper function that gets batches of training pairs,
@@ -183,32 +499,81 @@ class WindowDataset(VisionDataset):
         labelvec : numpy.ndarray
             vector of labels for each timebin in window from spectrogram
         """
-        x_ind = self.x_inds[idx]
-        spect_id = self.spect_id_vector[x_ind]
-        window_start_ind = self.spect_inds_vector[x_ind]
-
-        spect_path = self.spect_paths[spect_id]
-        spect_dict = files.spect.load(spect_path)
-        spect = spect_dict[self.spect_key]
-        timebins = spect_dict[self.timebins_key]
-
-        annot = self.annots[spect_id]  # "annot id" == spect_id if both were taken from rows of DataFrame
-        lbls_int = [self.labelmap[lbl] for lbl in annot.seq.labels]
-        lbl_tb = labeled_timebins.label_timebins(lbls_int,
-                                                 annot.seq.onsets_s,
-                                                 annot.seq.offsets_s,
-                                                 timebins,
-                                                 unlabeled_label=self.unlabeled_label)
-
-        window = spect[:, window_start_ind:window_start_ind + self.window_size]
-        labelvec = lbl_tb[window_start_ind:window_start_ind + self.window_size]
+        spect_id, window_start_ind = self.window_index[idx]
+
+        if self.window_store is not None:
+            store_start_ind = self.window_store_offsets[spect_id] + window_start_ind
+            # store has time bins as rows; transpose, and copy so the returned array is writable
+            window = np.ascontiguousarray(
+                self.window_store[store_start_ind:store_start_ind + self.window_size].T
+            )
+        else:
+            spect = self._load_spect(spect_id)
+            window = spect[:, window_start_ind:window_start_ind + self.window_size]
+        lbl_tb_start_ind = self.spect_offsets[spect_id] + window_start_ind
+        labelvec = self.lbl_tb[lbl_tb_start_ind:lbl_tb_start_ind + self.window_size]
 
         return window, labelvec
 
+    def __get_windows_labelvecs(self, idx):
+        """helper function that gets a batch of training pairs at once,
+        given an array of indices into dataset.
+
+        Indices are grouped by spectrogram, so each spectrogram is loaded
+        once per batch, and all windows from one spectrogram are
+        gathered with a single fancy indexing operation.
+
+        Parameters
+        ----------
+        idx : numpy.ndarray
+            1-d array of indices into dataset
+
+        Returns
+        -------
+        windows : numpy.ndarray
+            windows from spectrograms, with shape (batch, frequency bins, time bins)
+        labelvecs : numpy.ndarray
+            vectors of labels for each timebin in windows, with shape (batch, time bins)
+        """
+        spect_ids, window_start_inds = self.window_index[idx]
+        # add to start indices to get indices of every time bin in every window
+        window_offsets = np.arange(self.window_size)
+
+        if self.window_store is not None:
+            store_start_inds = self.window_store_offsets[spect_ids] + window_start_inds
+            windows = self.window_store[store_start_inds[:, np.newaxis] + window_offsets]
+            # store has time bins as rows, so windows have shape (batch, time bins, frequency bins)
+            windows = np.ascontiguousarray(windows.transpose(0, 2, 1))
+        else:
+            windows = None
+            for spect_id in np.unique(spect_ids):
+                in_spect = np.flatnonzero(spect_ids == spect_id)
+                spect = self._load_spect(spect_id)
+                spect_windows = spect[:, window_start_inds[in_spect, np.newaxis] + window_offsets]
+                if windows is None:
+                    windows = np.empty((idx.shape[-1], spect.shape[0], self.window_size), dtype=spect.dtype)
+                windows[in_spect] = np.moveaxis(spect_windows, 1, 0)
+
+        lbl_tb_start_inds = self.spect_offsets[spect_ids] + window_start_inds
+        labelvecs = self.lbl_tb[lbl_tb_start_inds[:, np.newaxis] + window_offsets]
+
+        return windows, labelvecs
+
     def __getitem__(self, idx):
+        """get a window and its vector of labels, given an index into the dataset.
+
+        If ``idx`` is a sequence of indices, returns a batch of windows and
+        a batch of label vectors instead, with the transforms applied once
+        to each batch. To use this with a ``torch.utils.data.DataLoader``,
+        pass a ``torch.utils.data.BatchSampler`` as the ``sampler``,
+        and set ``batch_size=None``.
+        """
         if torch.is_tensor(idx):
             idx = idx.tolist()
-        window, labelvec = self.__get_window_labelvec(idx)
+        if isinstance(idx, (list, tuple, np.ndarray)):
+            window, labelvec = self.__get_windows_labelvecs(np.asarray(idx, dtype=np.int64))
+        else:
+            window, labelvec = self.__get_window_labelvec(idx)
 
         if self.transform is not None:
             window = self.transform(window)
@@ -218,13 +583,45 @@ class WindowDataset(VisionDataset):
 
         return window, labelvec
 
+    def __getitems__(self, indices):
+        """get a list of (window, labelvec) tuples, given a list of indices into the dataset.
+
+        Called by ``torch.utils.data.DataLoader`` (in versions of torch that support it)
+        to fetch all the items in a batch at once, before they are collated.
+        Items are gathered and transformed as a batch, then split back up.
+        """
+        windows, labelvecs = self[list(indices)]
+        return list(zip(windows, labelvecs))
+
     def __len__(self):
         """number of batches"""
-        return len(self.x_inds)
+        return len(self.window_index)
 
     def duration(self):
         """duration of WindowDataset, in seconds"""
-        return self.spect_inds_vector.shape[-1] * self.timebin_dur
+        return self.window_index.n_timebins * self.timebin_dur
+
+    @staticmethod
+    def _has_all_classes(lbl_tb, classes):
+        """check whether the unique values in labeled timebins
+        are exactly the classes, using ``np.bincount``
+        instead of sorting with ``np.unique``"""
+        if lbl_tb.size == 0:
+            return classes.size == 0
+        counts = np.bincount(lbl_tb, minlength=classes.max() + 1)
+        return bool(np.all(counts[classes] > 0) and np.count_nonzero(counts) == classes.size)
+
+    @staticmethod
+    def _mask_from_segments(starts, stops, length):
+        """make a boolean mask of length ``length`` that is True
+        in all the segments [start, stop). Empty segments are ignored."""
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        nonempty = stops > starts
+        boundaries = np.zeros(length + 1, dtype=np.int64)
+        np.add.at(boundaries, starts[nonempty], 1)
+        np.add.at(boundaries, stops[nonempty], -1)
+        return np.cumsum(boundaries[:-1]) > 0
 
     @staticmethod
     def crop_spect_vectors_keep_classes(lbl_tb,
@@ -314,13 +711,13 @@ class WindowDataset(VisionDataset):
             # try cropping off the end first
             lbl_tb_cropped = lbl_tb[:cropped_length]
 
-            if np.array_equal(np.unique(lbl_tb_cropped), classes):
+            if WindowDataset._has_all_classes(lbl_tb_cropped, classes):
                 x_inds[cropped_length:] = WindowDataset.INVALID_WINDOW_VAL
                 return spect_id_vector[:cropped_length], spect_inds_vector[:cropped_length], x_inds
 
             # try truncating off the front instead
             lbl_tb_cropped = lbl_tb[-cropped_length:]
-            if np.array_equal(np.unique(lbl_tb_cropped), classes):
+            if WindowDataset._has_all_classes(lbl_tb_cropped, classes):
                 # set every index *up to but not including* the first valid window start to "invalid"
                 x_inds[:-cropped_length] = WindowDataset.INVALID_WINDOW_VAL
                 # also need to 'reset' the indexing so it starts at 0. First find current minimum index value
@@ -394,53 +791,51 @@ class WindowDataset(VisionDataset):
             segment_ind = np.arange(len(num_potential_ignored_data_bins))
             random.shuffle(segment_ind)
             last_ind = np.where(np.cumsum(num_potential_ignored_data_bins[segment_ind]) >= num_bins_to_crop)[0][0]
-            bins_to_ignore = np.array([], dtype=int)
-            for cnt in range(last_ind):
-                if border_onsets[segment_ind[cnt]]:  # remove silences at file onsets
-                    bins_to_ignore = np.concatenate([bins_to_ignore,
-                                                     np.arange(unlabeled_onsets[segment_ind[cnt]],
-                                                               unlabeled_offsets[segment_ind[cnt]] - 1)])
-                elif border_offsets[segment_ind[cnt]]:  # remove silences at file offsets
-                    bins_to_ignore = np.concatenate([bins_to_ignore,
-                                                     np.arange(unlabeled_onsets[segment_ind[cnt]] + 1,
-                                                               unlabeled_offsets[segment_ind[cnt]])])
-                else:  # remove silences within the files
-                    bins_to_ignore = np.concatenate([bins_to_ignore,
-                                                     np.arange(unlabeled_onsets[segment_ind[cnt]] + 1,
-                                                               unlabeled_offsets[segment_ind[cnt]] - 1)])
-            left_to_crop = num_bins_to_crop - sum(num_potential_ignored_data_bins[segment_ind[:last_ind]])-border_onsets[segment_ind[last_ind]]*window_size
-            if border_onsets[segment_ind[last_ind]]:
-                bins_to_ignore = np.concatenate([bins_to_ignore,
-                                             np.arange(unlabeled_onsets[segment_ind[last_ind]],
-                                                       unlabeled_onsets[segment_ind[last_ind]] + left_to_crop)])
-            elif border_offsets[segment_ind[last_ind]]:
-                if left_to_crop < num_potential_ignored_data_bins[segment_ind[last_ind]] - window_size:
-                    bins_to_ignore = np.concatenate([bins_to_ignore,
-                                             np.arange(unlabeled_onsets[segment_ind[last_ind]] + 1,
-                                                       unlabeled_onsets[segment_ind[last_ind]] + left_to_crop)])
+
+            # get start and stop of bins to ignore in each segment we fully crop,
+            # then build a boolean mask from them in a single pass
+            cropped_segs = segment_ind[:last_ind]
+            seg_starts = np.where(border_onsets[cropped_segs],
+                                  unlabeled_onsets[cropped_segs],  # remove silences at file onsets
+                                  unlabeled_onsets[cropped_segs] + 1)  # remove silences at file offsets / within files
+            seg_stops = np.where(border_offsets[cropped_segs] & ~border_onsets[cropped_segs],
+                                 unlabeled_offsets[cropped_segs],
+                                 unlabeled_offsets[cropped_segs] - 1)
+
+            last_seg = segment_ind[last_ind]
+            left_to_crop = (num_bins_to_crop
+                            - num_potential_ignored_data_bins[cropped_segs].sum()
+                            - border_onsets[last_seg] * window_size)
+            if border_onsets[last_seg]:
+                last_start = unlabeled_onsets[last_seg]
+                last_stop = unlabeled_onsets[last_seg] + left_to_crop
+            elif border_offsets[last_seg]:
+                last_start = unlabeled_onsets[last_seg] + 1
+                if left_to_crop < num_potential_ignored_data_bins[last_seg] - window_size:
+                    last_stop = unlabeled_onsets[last_seg] + left_to_crop
                 else:
-                    bins_to_ignore = np.concatenate([bins_to_ignore,
-                                             np.arange(unlabeled_onsets[segment_ind[last_ind]] + 1,
-                                                       unlabeled_onsets[segment_ind[last_ind]] + left_to_crop - window_size)])
+                    last_stop = unlabeled_onsets[last_seg] + left_to_crop - window_size
             else:
-                bins_to_ignore = np.concatenate([bins_to_ignore,
-                                             np.arange(unlabeled_onsets[segment_ind[last_ind]] + 1,
-                                                       unlabeled_onsets[segment_ind[last_ind]] + left_to_crop)])
-            
-            x_inds[bins_to_ignore] = WindowDataset.INVALID_WINDOW_VAL
-        
+                last_start = unlabeled_onsets[last_seg] + 1
+                last_stop = unlabeled_onsets[last_seg] + left_to_crop
+
+            seg_starts = np.append(seg_starts, last_start)
+            seg_stops = np.append(seg_stops, last_stop)
+            ignore = WindowDataset._mask_from_segments(seg_starts, seg_stops, len(lbl_tb))
+            x_inds[ignore] = WindowDataset.INVALID_WINDOW_VAL
+
             # we may still need to crop. Try doing it from the beginning of the dataset
             if crop_more > 0:  # This addition can lead to imprecision but only in cases where we ask for very small datasets
-                if crop_more > sum(x_inds != WindowDataset.INVALID_WINDOW_VAL):
-                     raise ValueError(
+                if crop_more > np.count_nonzero(x_inds != WindowDataset.INVALID_WINDOW_VAL):
+                    raise ValueError(
                         "was not able to crop spect vectors to specified duration "
                         "in a way that maintained all classes in dataset"
-                        )
+                    )
                 extra_bins = x_inds[x_inds != WindowDataset.INVALID_WINDOW_VAL][:crop_more]
-                bins_to_ignore = np.concatenate([bins_to_ignore, extra_bins])
-                x_inds[bins_to_ignore] = WindowDataset.INVALID_WINDOW_VAL
+                ignore[extra_bins] = True
+                x_inds[ignore] = WindowDataset.INVALID_WINDOW_VAL
 
-            if np.array_equal(np.unique(lbl_tb[np.setdiff1d(np.arange(len(lbl_tb)), bins_to_ignore)]), classes):
+            if WindowDataset._has_all_classes(lbl_tb[~ignore], classes):
                 return spect_id_vector, spect_inds_vector, x_inds
 
         raise ValueError(
@@ -448,6 +843,84 @@ class WindowDataset(VisionDataset):
                 "in a way that maintained all classes in dataset"
             )
 
+    @staticmethod
+    def lbl_tb_from_annots(spect_paths,
+                           annots,
+                           labelmap,
+                           timebins_key='t',
+                           n_timebins=None,
+                           timebin_bounds=None):
+        """get one vector of labeled timebins for all spectrograms in a dataset,
+        by concatenating the labeled timebins for each spectrogram.
+
+        If ``n_timebins`` and ``timebin_bounds`` are specified,
+        e.g. from the columns that ``vak prep`` adds to the dataset csv,
+        the time bins nearest to onsets and offsets are found from them
+        with ``vak.labeled_timebins.label_timebins_from_bounds``,
+        and no array file is opened, except for spectrograms whose
+        row in ``timebin_bounds`` is NaN. Otherwise the vector of time bins
+        is loaded from each array file.
+
+        Parameters
+        ----------
+        spect_paths : numpy.ndarray
+            column from DataFrame that represents dataset,
+            consisting of paths to files containing spectrograms as arrays
+        annots : list, vak.datasets.annot_arrays.AnnotArrays
+            of crowsetta.Annotation instances, one for each path in spect_paths.
+        labelmap : dict
+            that maps labels from dataset to a series of consecutive integers.
+            To create a label map, pass a set of labels to the `vak.utils.labels.to_map` function.
+        timebins_key : str
+            key to access time bin vector in array files. Default is 't'.
+        n_timebins : numpy.ndarray
+            number of time bins in each spectrogram. Default is None.
+        timebin_bounds : numpy.ndarray
+            with shape (number of spectrograms, 2), times in seconds
+            of the first and last time bin in each spectrogram,
+            e.g. as returned by ``vak.io.dataframe.timebin_bounds_from_df``.
+            Rows that are NaN mean the time bins are loaded from that spectrogram's file.
+            Default is None.
+
+        Returns
+        -------
+        lbl_tb : numpy.ndarray
+            labeled timebins for all spectrograms, concatenated
+        spect_offsets : numpy.ndarray
+            index in lbl_tb of the first time bin of each spectrogram
+        """
+        if 'unlabeled' in labelmap:
+            unlabeled_label = labelmap['unlabeled']
+        else:
+            unlabeled_label = 0
+
+        if n_timebins is None or timebin_bounds is None:
+            n_timebins = [None] * len(spect_paths)
+            timebin_bounds = np.full((len(spect_paths), 2), np.nan)
+
+        lbl_tb_per_spect = []
+        for spect_path, annot, n_tb, (first_timebin, last_timebin) in zip(spect_paths, annots,
+                                                                          n_timebins, timebin_bounds):
+            lbls_int = [labelmap[lbl] for lbl in annot.seq.labels]
+            if n_tb is not None and np.isfinite(first_timebin) and np.isfinite(last_timebin):
+                lbl_tb_per_spect.append(labeled_timebins.label_timebins_from_bounds(lbls_int,
+                                                                                    annot.seq.onsets_s,
+                                                                                    annot.seq.offsets_s,
+                                                                                    n_tb,
+                                                                                    first_timebin,
+                                                                                    last_timebin,
+                                                                                    unlabeled_label=unlabeled_label))
+            else:
+                timebins = files.spect.load(spect_path)[timebins_key]
+                lbl_tb_per_spect.append(labeled_timebins.label_timebins(lbls_int,
+                                                                        annot.seq.onsets_s,
+                                                                        annot.seq.offsets_s,
+                                                                        timebins,
+                                                                        unlabeled_label=unlabeled_label))
+        spect_offsets = np.cumsum([0] + [lbl_tb.shape[-1] for lbl_tb in lbl_tb_per_spect[:-1]])
+        lbl_tb = np.concatenate(lbl_tb_per_spect)
+        return lbl_tb, spect_offsets
+
     @staticmethod
     def n_time_bins_spect(spect_path, spect_key='s'):
         """get number of time bins in a spectrogram,
@@ -465,9 +938,61 @@ class WindowDataset(VisionDataset):
         spect.shape[-1], the number of time bins in the spectrogram.
         Assumes spectrogram is a 2-d matrix where rows are frequency bins,
         and columns are time bins.
+
+        Notes
+        -----
+        Uses ``vak.files.spect.shape``, so that for .npz files
+        only the array header is read, not the whole spectrogram.
         """
-        spect = files.spect.load(spect_path)[spect_key]
-        return spect.shape[-1]
+        return files.spect.shape(spect_path, spect_key)[-1]
+
+    @staticmethod
+    def n_time_bins_from_df(df, spect_key='s'):
+        """get number of time bins in each spectrogram
+        in a dataframe that represents a dataset of vocalizations.
+
+        Uses the 'n_timebins' column added to the dataframe by ``vak prep``
+        if it is present. If not, e.g. for datasets prepared with
+        previous versions of vak, gets the number of time bins
+        from each spectrogram file with ``WindowDataset.n_time_bins_spect``.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            that represents a dataset of vocalizations.
+        spect_key : str
+            key to access spectograms in array files. Default is 's'.
+
+        Returns
+        -------
+        n_timebins_per_spect : numpy.ndarray
+            number of time bins in each spectrogram, in the same order as rows in df.
+        """
+        if 'n_timebins' in df.columns and not df['n_timebins'].isnull().any():
+            return df['n_timebins'].values.astype(np.int64)
+        return np.array([WindowDataset.n_time_bins_spect(spect_path, spect_key)
+                         for spect_path in df['spect_path'].values], dtype=np.int64)
+
+    @staticmethod
+    def window_index_from_df(df, window_size, spect_key='s'):
+        """get a WindowIndex that represents all possible windows
+        from the spectrograms in a dataframe that represents a dataset of vocalizations.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            that represents a dataset of vocalizations.
+        window_size : int
+            number of time bins in windows that will be taken from spectrograms
+        spect_key : str
+            key to access spectograms in array files. Default is 's'.
+
+        Returns
+        -------
+        window_index : vak.datasets.window_index.WindowIndex
+        """
+        n_timebins_per_spect = WindowDataset.n_time_bins_from_df(df, spect_key)
+        return WindowIndex.from_spect_lens(n_timebins_per_spect, window_size)
 
     @staticmethod
     def spect_vectors_from_df(df,
@@ -533,12 +1058,6 @@ class WindowDataset(VisionDataset):
             crop_dur = float(crop_dur)
             timebin_dur = float(timebin_dur)
             annots = annotation.from_df(df)
-            if 'unlabeled' in labelmap:
-                unlabeled_label = labelmap['unlabeled']
-            else:
-                # if there is no "unlabeled label" (e.g., because all segments have labels)
-                # just assign dummy value that will end up getting replaced by actual labels by label_timebins()
-                unlabeled_label = 0
         else:
             crop_to_dur = False
 
@@ -550,12 +1069,20 @@ class WindowDataset(VisionDataset):
         total_tb = 0
 
         if crop_to_dur:
-            lbl_tb = []
             spect_annot_map = annotation.source_annot_map(spect_paths, annots)
-            for ind, (spect_path, annot) in enumerate(spect_annot_map.items()):
-                spect_dict = files.spect.load(spect_path)
-                n_tb_spect = spect_dict[spect_key].shape[-1]
-
+            timebin_bounds = io.dataframe.timebin_bounds_from_df(df)
+            if timebin_bounds is not None:
+                n_timebins = WindowDataset.n_time_bins_from_df(df, spect_key)
+            else:
+                n_timebins = None
+            lbl_tb, spect_offsets = WindowDataset.lbl_tb_from_annots(list(spect_annot_map.keys()),
+                                                                     list(spect_annot_map.values()),
+                                                                     labelmap,
+                                                                     timebins_key,
+                                                                     n_timebins,
+                                                                     timebin_bounds)
+            n_tb_per_spect = np.diff(np.append(spect_offsets, lbl_tb.shape[-1]))
+            for ind, n_tb_spect in enumerate(n_tb_per_spect):
                 spect_id_vector.append(np.ones((n_tb_spect,), dtype=np.int64) * ind)
                 spect_inds_vector.append(np.arange(n_tb_spect))
 
@@ -566,17 +1093,8 @@ class WindowDataset(VisionDataset):
 
                 total_tb += n_tb_spect
 
-                lbls_int = [labelmap[lbl] for lbl in annot.seq.labels]
-                timebins = spect_dict[timebins_key]
-                lbl_tb.append(labeled_timebins.label_timebins(lbls_int,
-                                                              annot.seq.onsets_s,
-                                                              annot.seq.offsets_s,
-                                                              timebins,
-                                                              unlabeled_label=unlabeled_label))
-
             spect_id_vector = np.concatenate(spect_id_vector)
             spect_inds_vector = np.concatenate(spect_inds_vector)
-            lbl_tb = np.concatenate(lbl_tb)
             x_inds = np.concatenate(x_inds)
 
             (spect_id_vector,
@@ -591,8 +1109,8 @@ class WindowDataset(VisionDataset):
                                                                      window_size)
 
         else:  # crop_to_dur is False
-            for ind, spect_path in enumerate(spect_paths):
-                n_tb_spect = WindowDataset.n_time_bins_spect(spect_path, spect_key)
+            n_tb_per_spect = WindowDataset.n_time_bins_from_df(df, spect_key)
+            for ind, n_tb_spect in enumerate(n_tb_per_spect):
 
                 spect_id_vector.append(np.ones((n_tb_spect,), dtype=np.int64) * ind)
                 spect_inds_vector.append(np.arange(n_tb_spect))
@@ -689,10 +1207,18 @@ class WindowDataset(VisionDataset):
                  spect_inds_vector=None,
                  x_inds=None,
                  transform=None,
-                 target_transform=None):
+                 target_transform=None,
+                 spect_cache=None,
+                 window_index=None,
+                 window_stride=1,
+                 random_window_offset=False):
         """given a path to a csv representing a dataset,
         returns an initialized WindowDataset.
 
+        If the csv has columns with the location of each spectrogram
+        in a window store (created by ``vak prep`` with the ``window_store`` option),
+        then windows are taken from the window store.
+
         Parameters
         ----------
         csv_path : str, Path
@@ -726,11 +1252,30 @@ class WindowDataset(VisionDataset):
             Default is None.
         target_transform : callable
             A function/transform that takes in the target and transforms it.
+        spect_cache : vak.datasets.cache.SpectCache, vak.datasets.cache.SharedSpectCache
+            cache of spectrograms loaded from files.
+            Default is None, in which case every window is loaded from its file.
+        window_index : vak.datasets.window_index.WindowIndex
+            compact representation of spect_id_vector, spect_inds_vector, and x_inds.
+            Cannot be specified along with those vectors.
+            Default is None, in which case the WindowIndex is created from the vectors
+            if they are specified, or else from all windows in the split.
+        window_stride : int
+            keep only every ``window_stride``-th valid window start. Default is 1.
+        random_window_offset : bool
+            if True, the first window start kept in each run of valid starts
+            is chosen at random. Default is False.
 
         Returns
         -------
         initialized instance of WindowDataset
         """
+        if window_index is not None and any([vec is not None
+                                             for vec in [spect_id_vector, spect_inds_vector, x_inds]]):
+            raise ValueError(
+                'cannot specify window_index and spect_id_vector, spect_inds_vector, or x_inds'
+            )
+
         if any([vec is not None for vec in [spect_id_vector, spect_inds_vector, x_inds]]):
             if not all([vec is not None for vec in [spect_id_vector, spect_inds_vector, x_inds]]):
 
@@ -757,6 +1302,7 @@ class WindowDataset(VisionDataset):
                     f'spect_id_vector.shape[-1] is {spect_id_vector.shape[-1]} and '
                     f'spect_inds_vector.shape[-1] is {spect_inds_vector.shape[-1]}.'
                 )
+            window_index = WindowIndex.from_vectors(spect_id_vector, spect_inds_vector, x_inds)
 
         df = pd.read_csv(csv_path)
         if not df['split'].str.contains(split).any():
@@ -766,19 +1312,29 @@ class WindowDataset(VisionDataset):
         else:
             df = df[df['split'] == split]
         spect_paths = df['spect_path'].values
+        if io.window_store.has_window_store(df):
+            window_store_path, window_store_offsets = io.window_store.from_df(df)
+        else:
+            window_store_path, window_store_offsets = None, None
 
-        if all([vec is None for vec in [spect_id_vector, spect_inds_vector, x_inds]]):
-            # see Notes in class docstring to understand what these vectors do
-            spect_id_vector, spect_inds_vector, x_inds = cls.spect_vectors_from_df(df, window_size)
+        if window_index is None:
+            # see Notes in class docstring to understand what the window index represents
+            window_index = cls.window_index_from_df(df, window_size, spect_key)
 
         annots = annotation.from_df(df)
         timebin_dur = io.dataframe.validate_and_get_timebin_dur(df)
+        n_freqbins = io.dataframe.n_freqbins_from_df(df)
+        timebin_bounds = io.dataframe.timebin_bounds_from_df(df)
+        if timebin_bounds is not None:
+            n_timebins = cls.n_time_bins_from_df(df, spect_key)
+        else:
+            n_timebins = None
 
         # note that we set "root" to csv path
         return cls(csv_path,
-                   x_inds,
-                   spect_id_vector,
-                   spect_inds_vector,
+                   None,
+                   None,
+                   None,
                    spect_paths,
                    annots,
                    labelmap,
@@ -787,5 +1343,14 @@ class WindowDataset(VisionDataset):
                    spect_key,
                    timebins_key,
                    transform,
-                   target_transform
+                   target_transform,
+                   spect_cache,
+                   window_store_path,
+                   window_store_offsets,
+                   window_index,
+                   n_freqbins,
+                   window_stride,
+                   random_window_offset,
+                   n_timebins,
+                   timebin_bounds,
                    )
@@ -0,0 +1,296 @@
+"""compact index of the windows in a WindowDataset"""
+from pathlib import Path
+
+import numpy as np
+
+from .. import validators
+
+
+class WindowIndex:
+    """Compact representation of all the windows in a WindowDataset.
+
+    Replaces the three vectors ``spect_id_vector``, ``spect_inds_vector``
+    and ``x_inds`` (see the ``WindowDataset`` docstring), which each have one
+    element per time bin, with arrays that have one element per
+    contiguous "segment" of time bins, and per "run" of valid window starts.
+    Without any cropping, there is one segment and one run per spectrogram,
+    so the size of the index scales with the number of files
+    instead of the total number of time bins.
+
+    The imaginary "big matrix" of concatenated spectrograms is
+    represented as a sequence of segments, where each segment is
+    a contiguous range of time bins from one spectrogram.
+    Valid start indices of windows in the big matrix (the values in ``x_inds``)
+    are represented as runs of consecutive values
+    (or of values ``stride`` apart, see ``WindowIndex.strided``).
+    Given an index into the dataset, the window it refers to is found
+    with ``numpy.searchsorted``, first to find the run, and then
+    the segment.
+
+    Attributes
+    ----------
+    segment_spect_ids : numpy.ndarray
+        id of the spectrogram that each segment comes from,
+        i.e., the index into spect_paths that will let us load it.
+    segment_start_inds : numpy.ndarray
+        index of first time bin of each segment, within its spectrogram.
+    segment_offsets : numpy.ndarray
+        index of first time bin of each segment, within the big matrix.
+    n_timebins : int
+        total number of time bins in big matrix, i.e. the
+        length of ``spect_id_vector``.
+    run_starts : numpy.ndarray
+        first valid window start index, within the big matrix, in each run.
+    run_offsets : numpy.ndarray
+        index into the dataset of the first window in each run.
+    n_windows : int
+        total number of windows, i.e. the length of ``x_inds``.
+    stride : int
+        distance between consecutive window start indices within a run.
+        Default is 1, i.e. every time bin in a run is the start of a window.
+        See ``WindowIndex.strided``.
+    """
+    def __init__(self,
+                 segment_spect_ids,
+                 segment_start_inds,
+                 segment_offsets,
+                 n_timebins,
+                 run_starts,
+                 run_offsets,
+                 n_windows,
+                 stride=1):
+        self.segment_spect_ids = np.asarray(segment_spect_ids, dtype=np.int64)
+        self.segment_start_inds = np.asarray(segment_start_inds, dtype=np.int64)
+        self.segment_offsets = np.asarray(segment_offsets, dtype=np.int64)
+        self.n_timebins = int(n_timebins)
+        self.run_starts = np.asarray(run_starts, dtype=np.int64)
+        self.run_offsets = np.asarray(run_offsets, dtype=np.int64)
+        self.n_windows = int(n_windows)
+        self.stride = int(stride)
+
+        if self.stride < 1:
+            raise ValueError(
+                f'stride must be a positive integer but was: {self.stride}'
+            )
+        if not (self.segment_spect_ids.shape == self.segment_start_inds.shape == self.segment_offsets.shape):
+            raise ValueError(
+                'segment_spect_ids, segment_start_inds, and segment_offsets should all have the same shape'
+            )
+        if self.run_starts.shape != self.run_offsets.shape:
+            raise ValueError(
+                'run_starts and run_offsets should have the same shape'
+            )
+
+    @classmethod
+    def from_spect_lens(cls, n_timebins_per_spect, window_size):
+        """create a WindowIndex for all windows in a set of spectrograms,
+        given the number of time bins in each spectrogram
+
+        Parameters
+        ----------
+        n_timebins_per_spect : numpy.ndarray
+            number of time bins in each spectrogram
+        window_size : int
+            number of time bins in windows that will be taken from spectrograms
+
+        Returns
+        -------
+        window_index : WindowIndex
+        """
+        n_timebins_per_spect = np.asarray(n_timebins_per_spect, dtype=np.int64)
+        segment_offsets = np.cumsum(n_timebins_per_spect) - n_timebins_per_spect
+        n_windows_per_spect = np.maximum(n_timebins_per_spect - window_size + 1, 0)
+        has_windows = n_windows_per_spect > 0
+        run_lens = n_windows_per_spect[has_windows]
+        return cls(segment_spect_ids=np.arange(n_timebins_per_spect.shape[-1]),
+                   segment_start_inds=np.zeros_like(n_timebins_per_spect),
+                   segment_offsets=segment_offsets,
+                   n_timebins=n_timebins_per_spect.sum(),
+                   run_starts=segment_offsets[has_windows],
+                   run_offsets=np.cumsum(run_lens) - run_lens,
+                   n_windows=run_lens.sum())
+
+    @classmethod
+    def from_vectors(cls, spect_id_vector, spect_inds_vector, x_inds):
+        """create a WindowIndex from the vectors used by WindowDataset
+        in previous versions of vak, e.g. vectors saved by ``vak learncurve``.
+        See WindowDataset docstring for detailed explanation of these vectors.
+
+        Parameters
+        ----------
+        spect_id_vector : numpy.ndarray
+            represents the 'id' of any spectrogram,
+            i.e., the index into spect_paths that will let us load it
+        spect_inds_vector : numpy.ndarray
+            same length as spect_id_vector but values represent
+            indices within each spectrogram.
+        x_inds : numpy.ndarray
+            indices of each window in the dataset.
+
+        Returns
+        -------
+        window_index : WindowIndex
+        """
+        spect_id_vector = validators.column_or_1d(spect_id_vector)
+        spect_inds_vector = validators.column_or_1d(spect_inds_vector)
+        x_inds = validators.column_or_1d(x_inds)
+        if spect_id_vector.shape[-1] != spect_inds_vector.shape[-1]:
+            raise ValueError(
+                'spect_id_vector and spect_inds_vector should be same length, but '
+                f'spect_id_vector.shape[-1] is {spect_id_vector.shape[-1]} and '
+                f'spect_inds_vector.shape[-1] is {spect_inds_vector.shape[-1]}.'
+            )
+
+        # a new segment starts wherever the spectrogram changes, or indices within it are not consecutive
+        segment_starts = np.flatnonzero(
+            np.concatenate(([True],
+                            (spect_id_vector[1:] != spect_id_vector[:-1]) |
+                            (spect_inds_vector[1:] != spect_inds_vector[:-1] + 1)))
+        )
+        # a new run starts wherever window start indices are not consecutive
+        run_offsets = np.flatnonzero(
+            np.concatenate(([True], x_inds[1:] != x_inds[:-1] + 1))
+        ) if x_inds.shape[-1] > 0 else np.array([], dtype=np.int64)
+        return cls(segment_spect_ids=spect_id_vector[segment_starts],
+                   segment_start_inds=spect_inds_vector[segment_starts],
+                   segment_offsets=segment_starts,
+                   n_timebins=spect_id_vector.shape[-1],
+                   run_starts=x_inds[run_offsets],
+                   run_offsets=run_offsets,
+                   n_windows=x_inds.shape[-1])
+
+    def strided(self, stride, random_offset=False):
+        """get a new WindowIndex that keeps only every ``stride``-th window start
+        in each run of this index.
+
+        Parameters
+        ----------
+        stride : int
+            keep one window start out of every ``stride``.
+        random_offset : bool
+            if True, the first window start kept in each run is chosen at random
+            from the first ``stride`` starts, using ``numpy.random``,
+            so that different window starts are kept each time this is called.
+            So that the number of windows is the same every time, each run then keeps
+            ``run length // stride`` window starts (or one, if the run is shorter than ``stride``),
+            which can be one fewer than when ``random_offset`` is False.
+            Default is False, in which case the first start of each run is kept.
+
+        Returns
+        -------
+        window_index : WindowIndex
+        """
+        stride = int(stride)
+        if stride < 1:
+            raise ValueError(
+                f'stride must be a positive integer but was: {stride}'
+            )
+        if stride == 1:
+            return self
+
+        run_lens = np.diff(np.append(self.run_offsets, self.n_windows))
+        if random_offset:
+            run_start_offsets = np.minimum(np.random.randint(0, stride, size=run_lens.shape[-1]),
+                                           run_lens - 1)
+            # same number of windows in each run for any offset
+            strided_run_lens = np.maximum(run_lens // stride, 1)
+        else:
+            run_start_offsets = np.zeros_like(run_lens)
+            # number of windows in each run after keeping every ``stride``-th, starting from the first
+            strided_run_lens = (run_lens - 1) // stride + 1
+        return WindowIndex(segment_spect_ids=self.segment_spect_ids,
+                           segment_start_inds=self.segment_start_inds,
+                           segment_offsets=self.segment_offsets,
+                           n_timebins=self.n_timebins,
+                           run_starts=self.run_starts + run_start_offsets * self.stride,
+                           run_offsets=np.cumsum(strided_run_lens) - strided_run_lens,
+                           n_windows=strided_run_lens.sum(),
+                           stride=self.stride * stride)
+
+    def to_vectors(self):
+        """convert to the three vectors used by WindowDataset in previous versions of vak.
+        See WindowDataset docstring for detailed explanation of these vectors.
+
+        Returns
+        -------
+        spect_id_vector : numpy.ndarray
+        spect_inds_vector : numpy.ndarray
+        x_inds : numpy.ndarray
+        """
+        segment_lens = np.diff(np.append(self.segment_offsets, self.n_timebins))
+        spect_id_vector = np.repeat(self.segment_spect_ids, segment_lens)
+        spect_inds_vector = (np.arange(self.n_timebins)
+                             - np.repeat(self.segment_offsets, segment_lens)
+                             + np.repeat(self.segment_start_inds, segment_lens))
+        run_lens = np.diff(np.append(self.run_offsets, self.n_windows))
+        x_inds = ((np.arange(self.n_windows) - np.repeat(self.run_offsets, run_lens)) * self.stride
+                  + np.repeat(self.run_starts, run_lens))
+        return spect_id_vector, spect_inds_vector, x_inds
+
+    def x_ind(self, idx):
+        """get start indices of windows within the big matrix,
+        given indices into the dataset.
+
+        Negative indices count from the end of the dataset, like indices into a sequence.
+        Raises an IndexError if any index is out of range."""
+        idx = np.asarray(idx)
+        if np.any(idx >= self.n_windows) or np.any(idx < -self.n_windows):
+            raise IndexError(
+                f'index out of range for WindowIndex with {self.n_windows} windows: {idx}'
+            )
+        idx = np.where(idx < 0, idx + self.n_windows, idx)
+        if idx.ndim == 0:
+            idx = idx.item()
+        run = np.searchsorted(self.run_offsets, idx, side='right') - 1
+        return self.run_starts[run] + (idx - self.run_offsets[run]) * self.stride
+
+    def __getitem__(self, idx):
+        """get spectrogram id and start index of window within that spectrogram,
+        given an index, or an array of indices, into the dataset.
+        Raises an IndexError if any index is out of range.
+
+        Returns
+        -------
+        spect_id : int, numpy.ndarray
+            id of spectrogram that window comes from
+        window_start_ind : int, numpy.ndarray
+            index of first time bin of window within spectrogram
+        """
+        x_ind = self.x_ind(idx)
+        segment = np.searchsorted(self.segment_offsets, x_ind, side='right') - 1
+        spect_id = self.segment_spect_ids[segment]
+        window_start_ind = self.segment_start_inds[segment] + (x_ind - self.segment_offsets[segment])
+        return spect_id, window_start_ind
+
+    def __len__(self):
+        return self.n_windows
+
+    def __eq__(self, other):
+        if not isinstance(other, WindowIndex):
+            return NotImplemented
+        return all([np.array_equal(getattr(self, attr), getattr(other, attr))
+                    for attr in ('segment_spect_ids', 'segment_start_inds', 'segment_offsets',
+                                 'n_timebins', 'run_starts', 'run_offsets', 'n_windows', 'stride')])
+
+    def save(self, path):
+        """save WindowIndex in a .npz file"""
+        np.savez(path,
+                 segment_spect_ids=self.segment_spect_ids,
+                 segment_start_inds=self.segment_start_inds,
+                 segment_offsets=self.segment_offsets,
+                 n_timebins=self.n_timebins,
+                 run_starts=self.run_starts,
+                 run_offsets=self.run_offsets,
+                 n_windows=self.n_windows,
+                 stride=self.stride)
+
+    @classmethod
+    def load(cls, path):
+        """load WindowIndex from a .npz file created by ``WindowIndex.save``"""
+        with np.load(Path(path)) as index_arrays:
+            return cls(**{key: index_arrays[key] for key in index_arrays.files})
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(n_segments={self.segment_offsets.shape[-1]}, '
+                f'n_timebins={self.n_timebins}, n_runs={self.run_offsets.shape[-1]}, '
+                f'n_windows={self.n_windows}, stride={self.stride})')
@@ -1,10 +1,13 @@
 from collections import defaultdict
+from pathlib import Path
 
+import numpy as np
 import torch
 import torch.nn.modules.loss
 import torch.optim
 from tqdm import tqdm
 
+from ..datasets.collate import unpack_windows
 from ..device import get_default as get_default_device
 from ..labeled_timebins import lbl_tb2labels
 from ..logging import log_or_print
@@ -32,12 +35,17 @@ class Model:
     ----------
     device : str
         device on which to place tensors. One of {"cuda", "cpu}.
+    max_windows_per_batch : int
+        maximum number of windows from one spectrogram fed through the network at once
+        during evaluation and prediction. Set by ``fit``, ``evaluate`` and ``predict``.
 
     Methods
     -------
     fit : fit a model by training it with supplied data for a specified number of epochs
     evaluate : evaluate a model by computing specified metrics on supplied data
     predict : return predictions of model, i.e. output when fed with supplied data
+    predict_batches : yield predictions of model one batch at a time, along with each batch
+    probs_filename : name of file where probabilities for one spectrogram are saved
     compile : returns instance of model with attributes set to specified arguments
 
     Private Methods
@@ -53,6 +61,15 @@ class Model:
         Uses the model to make predictions, by iterating through pred_data
         and returning the outputs of each batch fed into it.
         Override this method if you need to implement your own predict method.
+    _predict_batch : helper method, called by ``_forward_items``.
+        Returns the output of the network for one batch.
+    _forward_items : helper method, called by ``_eval``, ``_predict`` and ``predict_batches``.
+        Feeds a batch through the network and yields outputs for each spectrogram in it.
+    _eval_item : helper method, called by ``_eval``. Computes metrics for one spectrogram.
+    _forward_windows : helper method, called by ``_forward_items`` and ``_predict_batch``.
+        Feeds windows through the network, in chunks if ``max_windows_per_batch`` is set.
+    _reduce_pred : helper method, called by ``_predict`` and ``predict_batches``.
+        Reduces the output of the network for one batch to labels or probabilities.
     """
 
     REQUIRED_SUBCLASS_ATTRIBUTES = [
@@ -86,6 +103,8 @@ class Model:
         self.max_val_acc_ckpt_path = None
         self.patience = None
         self.patience_counter = 0
+        # set by fit, evaluate, and predict methods, used by _forward_windows
+        self.max_windows_per_batch = None
 
     def _train(self,
                train_data,
@@ -100,14 +119,44 @@ class Model:
 
         Parameters
         ----------
-        train_data : torch.util.Dataloader
-            instance that will be iterated over.
+        train_data : torch.util.Dataloader, vak.datasets.WindowTensorLoader
+            instance that will be iterated over. Any iterable that yields
+            batches of (input, target) pairs and has a length can be used,
+            e.g. a ``WindowTensorLoader`` that takes windows from tensors in memory.
+            Batches can also be dictionaries with keys 'source' and 'annot',
+            and optionally 'padding_mask', e.g. batches of whole spectrograms
+            padded to the same width by ``vak.datasets.collate.pad_collate``.
+            Time bins where the padding mask is False are not used to compute the loss,
+            which requires that the loss has an ``ignore_index`` attribute,
+            like ``torch.nn.CrossEntropyLoss``.
+            If train_data, or its dataset, has a ``set_epoch`` method, it is called
+            with the epoch before iterating, e.g. so that a ``WindowDataset``
+            with ``random_window_offset`` uses different windows every epoch.
         """
         self.network.train()
 
+        if hasattr(train_data, 'set_epoch'):
+            train_data.set_epoch(epoch)
+        elif hasattr(getattr(train_data, 'dataset', None), 'set_epoch'):
+            # for a DataLoader, call before iterating, so worker processes get a copy of the updated dataset
+            train_data.dataset.set_epoch(epoch)
+
         progress_bar = tqdm(train_data)
         for ind, batch in enumerate(progress_bar):
-            x, y = batch[0].to(self.device), batch[1].to(self.device)
+            if isinstance(batch, dict):
+                x, y = batch['source'].to(self.device), batch['annot'].to(self.device)
+                if 'padding_mask' in batch:
+                    ignore_index = getattr(self.loss, 'ignore_index', None)
+                    if ignore_index is None:
+                        raise ValueError(
+                            'batch has a padding mask, but loss does not have an ignore_index attribute '
+                            'that can be used to exclude padding from the loss'
+                        )
+                    # don't compute loss on time bins that were added as padding
+                    padding_mask = batch['padding_mask'].to(self.device)
+                    y = y.masked_fill(~padding_mask, ignore_index)
+            else:
+                x, y = batch[0].to(self.device), batch[1].to(self.device)
             y_pred = self.network.forward(x)
             self.optimizer.zero_grad()
             loss = self.loss(y_pred, y)
@@ -176,6 +225,133 @@ class Model:
                              logger=self.logger, level='info')
                 self.save(self.ckpt_path, epoch=epoch, global_step=self.global_step)
 
+    def _forward_windows(self, x):
+        """helper method, called by ``_forward_items`` and ``_predict_batch``.
+        Feeds a stack of windows from one spectrogram through the network.
+
+        If ``max_windows_per_batch`` is set and the stack has more windows than that,
+        it is split into chunks of at most ``max_windows_per_batch`` windows.
+        Chunks are moved to ``device`` and fed through the network one after another,
+        and their outputs are concatenated, so that the peak memory used by
+        a forward pass does not depend on the duration of the spectrogram.
+
+        Parameters
+        ----------
+        x : torch.Tensor
+            windows, with shape (windows, channels, frequency bins, time bins).
+
+        Returns
+        -------
+        out : torch.Tensor
+            output of network, with windows as the first dimension.
+        """
+        if self.max_windows_per_batch is None or x.shape[0] <= self.max_windows_per_batch:
+            return self.network.forward(x.to(self.device))
+        return torch.cat(
+            [self.network.forward(x_chunk.to(self.device))
+             for x_chunk in torch.split(x, self.max_windows_per_batch)]
+        )
+
+    def _forward_items(self, batch):
+        """helper method, called by ``_eval``, ``_predict`` and ``predict_batches``.
+        Feeds a batch through the network, and yields the output for each spectrogram in it.
+
+        If the batch was made by ``vak.datasets.collate.pack_windows``, i.e., it contains
+        windows from several spectrograms, all windows are fed through the network at once,
+        and outputs are split back into outputs for each spectrogram with
+        ``vak.datasets.collate.unpack_windows``. Otherwise the batch contains windows
+        from one spectrogram, and is fed through the network by ``_predict_batch``.
+
+        Parameters
+        ----------
+        batch : dict
+            batch from ``eval_data`` or ``pred_data``.
+
+        Yields
+        ------
+        item_batch : dict
+            batch for one spectrogram, in the same format as a batch from a
+            ``torch.utils.data.DataLoader`` with a batch size of 1.
+        out : torch.Tensor
+            output of network for windows from that spectrogram.
+        """
+        if 'window_offsets' in batch:
+            yield from unpack_windows(batch, self._forward_windows(batch['source']))
+        else:
+            yield batch, self._predict_batch(batch)
+
+    def _eval_item(self, item_batch, out, labelmap, metric_vals):
+        """helper method, called by ``_eval``.
+        Computes metrics on the output of the network for one spectrogram,
+        and appends them to ``metric_vals``.
+
+        Parameters
+        ----------
+        item_batch : dict
+            batch for one spectrogram, with key 'annot', and optionally 'padding_mask'.
+        out : torch.Tensor
+            output of network for windows from that spectrogram.
+        labelmap : dict
+            that maps labels to consecutive integers.
+        metric_vals : collections.defaultdict
+            that maps metric names to lists of values.
+        """
+        # keep "batch" dimension of y because loss expects the first dimension to be batch
+        y = item_batch['annot'].to(self.device)
+        # permute and flatten out
+        # so that it has shape (1, number classes, number of time bins)
+        # ** NOTICE ** just calling out.reshape(1, out.shape(1), -1) does not work, it will change the data
+        out = out.permute(1, 0, 2)
+        out = torch.flatten(out, start_dim=1)
+        out = torch.unsqueeze(out, dim=0)
+        # reduce to predictions, assuming class dimension is 1
+        y_pred = torch.argmax(out, dim=1)  # y_pred has dims (batch size 1, predicted label per time bin)
+
+        if 'padding_mask' in item_batch:
+            padding_mask = item_batch['padding_mask']  # boolean: 1 where valid, 0 where padding
+            # remove "batch" dimension added by collate_fn
+            # because this extra dimension just makes it confusing to use the mask as indices
+            if padding_mask.ndim == 2:
+                if padding_mask.shape[0] == 1:
+                    padding_mask = torch.squeeze(padding_mask, dim=0)
+            else:
+                raise ValueError(
+                    f'invalid shape for padding mask: {padding_mask.shape}'
+                )
+
+            out = out[:, :, padding_mask]
+            y_pred = y_pred[:, padding_mask]
+
+        if (any(['levenshtein' in metric_name for metric_name in self.metrics.keys()]) or
+                any(['segment_error_rate' in metric_name for metric_name in self.metrics.keys()])):
+            y_labels = lbl_tb2labels(y.cpu().numpy(), labelmap)
+            y_pred_labels = lbl_tb2labels(y_pred.cpu().numpy(), labelmap)
+        else:
+            y_labels = None
+            y_pred_labels = None
+
+        for metric_name, metric_callable in self.metrics.items():
+            if metric_name == 'loss':
+                metric_vals[metric_name].append(
+                    metric_callable(out, y)
+                )
+            elif metric_name == 'acc':
+                metric_vals[metric_name].append(
+                    metric_callable(y_pred, y)
+                )
+            elif metric_name == 'levenshtein':
+                metric_vals[metric_name].append(
+                    metric_callable(y_pred_labels, y_labels)
+                )
+            elif metric_name == 'segment_error_rate':
+                metric_vals[metric_name].append(
+                    metric_callable(y_pred_labels, y_labels)
+                )
+            else:
+                raise NotImplementedError(
+                    f'calculation of metric not yet implemented for {metric_name}'
+                )
+
     def _eval(self, eval_data):
         """helper method, called by the evaluate method, and called by the fit
         method for validation after each epoch. Evaluates the model by iterating
@@ -196,73 +372,16 @@ class Model:
         progress_bar = tqdm(eval_data)
         with torch.no_grad():
             for ind, batch in enumerate(progress_bar):
-                x, y = batch['source'].to(self.device), batch['annot'].to(self.device)
-                # remove "batch" dimension added by collate_fn to x
-                # we keep for y because loss still expects the first dimension to be batch
-                if x.ndim == 5:
-                    if x.shape[0] == 1:
-                        x = torch.squeeze(x, dim=0)
-                else:
+                if 'window_offsets' not in batch and batch['source'].ndim != 5:
                     raise ValueError(
-                        f'invalid shape for x: {x.shape}'
+                        f'invalid shape for x: {batch["source"].shape}'
                     )
+                # a batch of windows packed from several spectrograms counts as one batch per spectrogram,
+                # so that averages are the same as with a batch size of 1
+                for item_batch, out in self._forward_items(batch):
+                    self._eval_item(item_batch, out, eval_data.dataset.labelmap, metric_vals)
+                    n_batches += 1
 
-                out = self.network.forward(x)
-                # permute and flatten out
-                # so that it has shape (1, number classes, number of time bins)
-                # ** NOTICE ** just calling out.reshape(1, out.shape(1), -1) does not work, it will change the data
-                out = out.permute(1, 0, 2)
-                out = torch.flatten(out, start_dim=1)
-                out = torch.unsqueeze(out, dim=0)
-                # reduce to predictions, assuming class dimension is 1
-                y_pred = torch.argmax(out, dim=1)  # y_pred has dims (batch size 1, predicted label per time bin)
-
-                if 'padding_mask' in batch:
-                    padding_mask = batch['padding_mask']  # boolean: 1 where valid, 0 where padding
-                    # remove "batch" dimension added by collate_fn
-                    # because this extra dimension just makes it confusing to use the mask as indices
-                    if padding_mask.ndim == 2:
-                        if padding_mask.shape[0] == 1:
-                            padding_mask = torch.squeeze(padding_mask, dim=0)
-                    else:
-                        raise ValueError(
-                            f'invalid shape for padding mask: {padding_mask.shape}'
-                        )
-
-                    out = out[:, :, padding_mask]
-                    y_pred = y_pred[:, padding_mask]
-
-                if (any(['levenshtein' in metric_name for metric_name in self.metrics.keys()]) or
-                        any(['segment_error_rate' in metric_name for metric_name in self.metrics.keys()])):
-                    y_labels = lbl_tb2labels(y.cpu().numpy(), eval_data.dataset.labelmap)
-                    y_pred_labels = lbl_tb2labels(y_pred.cpu().numpy(), eval_data.dataset.labelmap)
-                else:
-                    y_labels = None
-                    y_pred_labels = None
-
-                for metric_name, metric_callable in self.metrics.items():
-                    if metric_name == 'loss':
-                        metric_vals[metric_name].append(
-                            metric_callable(out, y)
-                        )
-                    elif metric_name == 'acc':
-                        metric_vals[metric_name].append(
-                            metric_callable(y_pred, y)
-                        )
-                    elif metric_name == 'levenshtein':
-                        metric_vals[metric_name].append(
-                            metric_callable(y_pred_labels, y_labels)
-                        )
-                    elif metric_name == 'segment_error_rate':
-                        metric_vals[metric_name].append(
-                            metric_callable(y_pred_labels, y_labels)
-                        )
-                    else:
-                        raise NotImplementedError(
-                            f'calculation of metric not yet implemented for {metric_name}'
-                        )
-
-                n_batches += 1
                 progress_bar.set_description(
                     f'batch {ind} / {len(eval_data)}'
                 )
@@ -282,7 +401,113 @@ class Model:
 
         return metric_vals
 
-    def _predict(self, pred_data):
+    def _predict_batch(self, batch):
+        """helper method, called by ``_forward_items``.
+        Returns the output of the network for one batch from ``pred_data``.
+        Override this method if you need to change how a batch is fed to the network.
+
+        Parameters
+        ----------
+        batch : dict
+            with key 'source', as returned by ``vak.transforms.defaults.PredictItemTransform``.
+
+        Returns
+        -------
+        y_pred : torch.Tensor
+            output of network.
+        """
+        x = batch['source']
+        if x.ndim == 5:
+            if x.shape[0] == 1:
+                x = torch.squeeze(x, dim=0)
+        return self._forward_windows(x)
+
+    @staticmethod
+    def probs_filename(spect_ind, spect_path):
+        """name of the file where probabilities are saved
+        for one spectrogram, when ``output`` is 'probs'.
+
+        The name starts with the index of the spectrogram
+        in the order predictions were made, which is its row
+        in the dataset when ``pred_data`` does not shuffle,
+        so that spectrogram files with the same name in different directories
+        are saved in different files.
+
+        Parameters
+        ----------
+        spect_ind : int
+            index of spectrogram, in the order predictions were made.
+        spect_path : str, Path
+            path to spectrogram file.
+
+        Returns
+        -------
+        probs_filename : str
+        """
+        return f'{spect_ind}-{Path(spect_path).name}.probs.npy'
+
+    def _reduce_pred(self, y_pred, batch, output='logits', probs_dir=None, spect_ind=0):
+        """helper method, called by ``_predict`` and ``predict_batches``.
+        Reduces the output of the network for one batch,
+        so that less memory is used to keep predictions for the whole dataset.
+
+        Parameters
+        ----------
+        y_pred : torch.Tensor
+            output of network, with shape (windows, classes, time bins).
+        batch : dict
+            batch from ``pred_data``. If it has a 'padding_mask',
+            that is used to remove predictions on padding
+            when ``output`` is 'labels' or 'probs'.
+        output : str
+            one of {'logits', 'labels', 'probs'}. See ``Model.predict``.
+        probs_dir : str, Path
+            directory where probabilities are saved, when ``output`` is 'probs'.
+        spect_ind : int
+            index of spectrogram in the order predictions were made,
+            used to name the file where probabilities are saved.
+            See ``Model.probs_filename``. Default is 0.
+
+        Returns
+        -------
+        pred : torch.Tensor, numpy.ndarray
+        """
+        if output == 'logits':
+            return y_pred
+
+        n_classes = y_pred.shape[1]
+        padding_mask = batch.get('padding_mask')
+        if padding_mask is not None:
+            padding_mask = np.squeeze(np.asarray(padding_mask))
+
+        if output == 'labels':
+            labels = torch.flatten(torch.argmax(y_pred, dim=1)).cpu().numpy()
+            if padding_mask is not None:
+                labels = labels[padding_mask]
+            return labels.astype(np.min_scalar_type(n_classes - 1))
+
+        elif output == 'probs':
+            # (windows, classes, time bins) -> (classes, time bins)
+            probs = torch.softmax(y_pred, dim=1).transpose(0, 1).reshape(n_classes, -1)
+            probs = probs.to(torch.float16).cpu().numpy()
+            if padding_mask is not None:
+                probs = probs[:, padding_mask]
+            spect_path = batch['spect_path']
+            if isinstance(spect_path, (list, tuple)):
+                spect_path = spect_path[0]
+            probs_path = Path(probs_dir).joinpath(self.probs_filename(spect_ind, spect_path))
+            probs_memmap = np.lib.format.open_memmap(probs_path, mode='w+', dtype=np.float16, shape=probs.shape)
+            probs_memmap[:] = probs
+            probs_memmap.flush()
+            del probs_memmap
+            return np.load(probs_path, mmap_mode='r')
+
+        else:
+            raise ValueError(
+                f"output must be one of {{'logits', 'labels', 'probs'}}, but was: {output}"
+            )
+
+    def _predict(self, pred_data, output='logits', probs_dir=None):
         """helper method, called by the predict method on each epoch.
         Uses the model to make predictions, by iterating through pred_data
         and returning the outputs of each batch fed into it.
@@ -292,6 +517,10 @@ class Model:
         ----------
         pred_data : torch.util.Dataloader
             instance that will be iterated over.
+        output : str
+            one of {'logits', 'labels', 'probs'}. See ``Model.predict``.
+        probs_dir : str, Path
+            directory where probabilities are saved, when ``output`` is 'probs'.
         """
         preds = {}
         self.network.eval()
@@ -300,14 +529,12 @@ class Model:
 
         with torch.no_grad():
             for ind, batch in enumerate(progress_bar):
-                x, spect_path = batch['source'].to(self.device), batch['spect_path']
-                if isinstance(spect_path, list) and len(spect_path) == 1:
-                    spect_path = spect_path[0]
-                if x.ndim == 5:
-                    if x.shape[0] == 1:
-                        x = torch.squeeze(x, dim=0)
-                y_pred = self.network.forward(x)
-                preds[spect_path] = y_pred
+                for item_batch, y_pred in self._forward_items(batch):
+                    spect_path = item_batch['spect_path']
+                    if isinstance(spect_path, list) and len(spect_path) == 1:
+                        spect_path = spect_path[0]
+                    preds[spect_path] = self._reduce_pred(y_pred, item_batch, output, probs_dir,
+                                                          spect_ind=len(preds))
                 progress_bar.set_description(
                     f'batch {ind} / {len(pred_data)}'
                 )
@@ -365,7 +592,8 @@ class Model:
             val_step=None,
             ckpt_step=None,
             patience=None,
-            device=None
+            device=None,
+            max_windows_per_batch=None,
             ):
         # ---- pre-conditions ----------
         if val_data is None:
@@ -382,6 +610,7 @@ class Model:
         if device is None:
             device = get_default_device()
         self.device = device
+        self.max_windows_per_batch = max_windows_per_batch
 
         # note there can be up to two checkpoint paths.
         # this first one is the "backup" checkpoint, saved intermittently (with frequency determined by ckpt_step)
@@ -418,21 +647,135 @@ class Model:
 
     def evaluate(self,
                  eval_data,
-                 device=None):
+                 device=None,
+                 max_windows_per_batch=None):
         if device is None:
             device = get_default_device()
         self.device = device
+        self.max_windows_per_batch = max_windows_per_batch
         self.network.to(self.device)
         return self._eval(eval_data)
 
     def predict(self,
                 pred_data,
-                device=None):
+                device=None,
+                output='logits',
+                probs_dir=None,
+                max_windows_per_batch=None):
+        """make predictions with model on a dataset.
+
+        Parameters
+        ----------
+        pred_data : torch.util.Dataloader
+            instance that will be iterated over.
+        device : str
+            Device on which to work with model + data.
+            Defaults to 'cuda' if torch.cuda.is_available is True.
+        output : str
+            what is kept for each file in the dataset. One of {'logits', 'labels', 'probs'}.
+            'logits' keeps the output of the network, as a tensor on ``device``.
+            'labels' keeps only the predicted label for each time bin,
+            as a vector of integers on the CPU, with the smallest integer type
+            that can hold all the classes. 'probs' converts outputs to probabilities
+            with a softmax, and saves them in ``probs_dir`` as float16 arrays
+            with shape (classes, time bins), one .npy file per spectrogram file,
+            named by ``Model.probs_filename``;
+            what is kept is the array memory-mapped in read-only mode.
+            For 'labels' and 'probs', outputs are reduced as soon as they are computed,
+            and any predictions on padding are removed using the 'padding_mask'
+            from ``pred_data``, so memory used scales with the size of one file
+            instead of the whole dataset. Default is 'logits'.
+        probs_dir : str, Path
+            directory where probabilities are saved, required when ``output`` is 'probs'.
+        max_windows_per_batch : int
+            maximum number of windows fed through the network at once.
+            Windows from a spectrogram with more windows than this are fed
+            through the network in chunks. Default is None, in which case
+            all windows from a spectrogram are fed through at once.
+
+        Returns
+        -------
+        preds : dict
+            that maps path to each spectrogram file to predictions for that file.
+        """
+        self._validate_output(output, probs_dir)
         if device is None:
             device = get_default_device()
         self.device = device
+        self.max_windows_per_batch = max_windows_per_batch
         self.network.to(self.device)
-        return self._predict(pred_data)
+        return self._predict(pred_data, output, probs_dir)
+
+    @staticmethod
+    def _validate_output(output, probs_dir):
+        """validate ``output`` and ``probs_dir`` arguments to ``predict`` and ``predict_batches``"""
+        if output not in {'logits', 'labels', 'probs'}:
+            raise ValueError(
+                f"output must be one of {{'logits', 'labels', 'probs'}}, but was: {output}"
+            )
+        if output == 'probs':
+            if probs_dir is None:
+                raise ValueError(
+                    "must specify probs_dir when output is 'probs'"
+                )
+            if not Path(probs_dir).is_dir():
+                raise NotADirectoryError(
+                    f'probs_dir not recognized as a directory: {probs_dir}'
+                )
+
+    def predict_batches(self,
+                        pred_data,
+                        device=None,
+                        max_windows_per_batch=None,
+                        output='logits',
+                        probs_dir=None):
+        """make predictions one batch at a time.
+
+        Unlike ``predict``, outputs are not collected in a dictionary;
+        instead the batch for each spectrogram is yielded along with the output of the network,
+        so that the caller can process and discard the output for one batch
+        before the next is computed, in a single pass through ``pred_data``.
+
+        Parameters
+        ----------
+        pred_data : torch.util.Dataloader
+            instance that will be iterated over.
+        device : str
+            Device on which to work with model + data.
+            Defaults to 'cuda' if torch.cuda.is_available is True.
+        max_windows_per_batch : int
+            maximum number of windows fed through the network at once.
+            See ``Model.predict``. Default is None.
+        output : str
+            one of {'logits', 'labels', 'probs'}. See ``Model.predict``.
+            Default is 'logits'.
+        probs_dir : str, Path
+            directory where probabilities are saved, required when ``output`` is 'probs'.
+
+        Yields
+        ------
+        batch : dict
+            batch for one spectrogram from ``pred_data``. If ``pred_data`` packs windows
+            from several spectrograms into one batch (see ``vak.datasets.collate.pack_windows``),
+            this is the batch for one of those spectrograms, in the same format
+            as a batch from a ``torch.utils.data.DataLoader`` with a batch size of 1.
+        y_pred : torch.Tensor, numpy.ndarray
+            output of network for batch, reduced as specified by ``output``.
+        """
+        self._validate_output(output, probs_dir)
+        if device is None:
+            device = get_default_device()
+        self.device = device
+        self.max_windows_per_batch = max_windows_per_batch
+        self.network.to(self.device)
+        self.network.eval()
+
+        spect_ind = 0
+        with torch.no_grad():
+            for batch in pred_data:
+                for item_batch, y_pred in self._forward_items(batch):
+                    yield item_batch, self._reduce_pred(y_pred, item_batch, output, probs_dir, spect_ind)
+                    spect_ind += 1
 
     @classmethod
     def from_config(cls, config, logger=None):
@@ -1,4 +1,5 @@
 from pathlib import Path
+import zipfile
 
 import numpy as np
 from dask import bag as db
@@ -60,6 +61,83 @@ def find_audio_fname(spect_path, audio_ext=None):
         )
 
 
+# name of array in files with quantized spectrograms, that lists the keys of quantized arrays
+QUANTIZED_KEYS_KEY = 'quantized_keys'
+# suffixes added to key of quantized array, for arrays used to convert uint8 back to float
+QUANT_SCALE_SUFFIX = '_scale'
+QUANT_OFFSET_SUFFIX = '_offset'
+# data type that quantized arrays are converted back to
+DEQUANTIZED_DTYPE = np.float32
+
+
+def quantize(spect_dict, spect_key, dtype):
+    """quantize spectrogram in a dictionary of arrays that will be saved in a file,
+    to reduce the size of the file.
+
+    Parameters
+    ----------
+    spect_dict : dict
+        of arrays, e.g. as created by ``vak.io.audio.to_spect``.
+    spect_key : str
+        key for accessing spectrogram in spect_dict.
+    dtype : str
+        one of {'float16', 'uint8'}. For 'uint8', values are scaled linearly
+        from the minimum and maximum of the spectrogram to the range [0, 255],
+        and the scale and offset are added to spect_dict so values can be converted back.
+
+    Returns
+    -------
+    spect_dict : dict
+        with quantized spectrogram, and additional arrays
+        used by ``vak.files.spect.load`` to dequantize it.
+    """
+    spect_dict = dict(spect_dict)
+    spect = np.asarray(spect_dict[spect_key])
+    if dtype == 'float16':
+        spect_dict[spect_key] = spect.astype(np.float16)
+    elif dtype == 'uint8':
+        offset = spect.min()
+        scale = (spect.max() - offset) / np.iinfo(np.uint8).max
+        if scale == 0:
+            scale = 1.
+        spect_dict[spect_key] = np.round((spect - offset) / scale).astype(np.uint8)
+        spect_dict[spect_key + QUANT_SCALE_SUFFIX] = np.array(scale, dtype=DEQUANTIZED_DTYPE)
+        spect_dict[spect_key + QUANT_OFFSET_SUFFIX] = np.array(offset, dtype=DEQUANTIZED_DTYPE)
+    else:
+        raise ValueError(
+            f"invalid dtype for quantizing spectrogram: {dtype}. Must be one of {{'float16', 'uint8'}}"
+        )
+    spect_dict[QUANTIZED_KEYS_KEY] = np.array([spect_key])
+    return spect_dict
+
+
+def dequantize(spect_dict):
+    """convert quantized spectrograms in a dictionary-like object loaded from a file
+    back to floating point, as ``vak.files.spect.DEQUANTIZED_DTYPE``.
+
+    Parameters
+    ----------
+    spect_dict : dict-like
+        loaded from a file that was saved with a spectrogram quantized by
+        ``vak.files.spect.quantize``.
+
+    Returns
+    -------
+    spect_dict : dict
+        with dequantized spectrograms.
+    """
+    quantized_keys = [str(key) for key in np.atleast_1d(spect_dict[QUANTIZED_KEYS_KEY])]
+    dequantized = {key: spect_dict[key] for key in spect_dict.keys()
+                   if key != QUANTIZED_KEYS_KEY}
+    for key in quantized_keys:
+        spect = dequantized[key].astype(DEQUANTIZED_DTYPE)
+        if key + QUANT_SCALE_SUFFIX in dequantized:
+            spect *= dequantized.pop(key + QUANT_SCALE_SUFFIX)
+            spect += dequantized.pop(key + QUANT_OFFSET_SUFFIX)
+        dequantized[key] = spect
+    return dequantized
+
+
 def load(spect_path, spect_format=None):
     """load spectrogram and related arrays from a file,
     return as an object that provides Python dictionary-like
@@ -80,15 +158,79 @@ def load(spect_path, spect_format=None):
         from the file via keys, e.g. spect_dict['s'] for the spectrogram.
         See docstring for vak.audio.to_spect for default keys for spectrogram
         array files that function creates.
+        Spectrograms saved quantized (see ``vak.files.spect.quantize``)
+        are converted back to float32.
     """
     spect_path = Path(spect_path)
     if spect_format is None:
         # "replace('.', '')", because suffix returns file extension with period included
         spect_format = spect_path.suffix.replace('.', '')
     spect_dict = constants.SPECT_FORMAT_LOAD_FUNCTION_MAP[spect_format](spect_path)
+    if QUANTIZED_KEYS_KEY in spect_dict:
+        spect_dict = dequantize(spect_dict)
     return spect_dict
 
 
+def shape(spect_path, spect_key='s', spect_format=None):
+    """get shape of a spectrogram in a file, without loading the spectrogram.
+
+    For .npz files, only the header of the array is read.
+    Files in other formats do not provide a way to do this,
+    so the spectrogram is loaded to get its shape.
+
+    Parameters
+    ----------
+    spect_path : str, Path
+        to an array file.
+    spect_key : str
+        key for accessing spectrogram in files. Default is 's'.
+    spect_format : str
+        Valid formats are defined in vak.io.spect.SPECT_FORMAT_LOAD_FUNCTION_MAP.
+        Default is None, in which case the extension of the file is used.
+
+    Returns
+    -------
+    shape : tuple
+        shape of the spectrogram, (frequency bins, time bins).
+    """
+    spect_path = Path(spect_path)
+    if spect_format is None:
+        spect_format = spect_path.suffix.replace('.', '')
+
+    if spect_format == 'npz':
+        # .npz files are zip archives of .npy files, each of which starts with a header
+        # that specifies the shape of the array. Read just that instead of the whole array
+        with zipfile.ZipFile(spect_path) as npz:
+            with npz.open(f'{spect_key}.npy') as fp:
+                version = np.lib.format.read_magic(fp)
+                if version == (1, 0):
+                    return np.lib.format.read_array_header_1_0(fp)[0]
+                elif version == (2, 0):
+                    return np.lib.format.read_array_header_2_0(fp)[0]
+
+    return load(spect_path, spect_format)[spect_key].shape
+
+
+def read_ahead(spect_path, chunk_size=2 ** 20):
+    """read a spectrogram file without loading any arrays from it,
+    so that its contents are in the operating system's file cache
+    when the file is loaded later.
+
+    Used to prefetch files, e.g. on a network file system where
+    each read has high latency, see ``vak.datasets.samplers.PrefetchSampler``.
+
+    Parameters
+    ----------
+    spect_path : str, Path
+        to an array file.
+    chunk_size : int
+        number of bytes to read at a time. Default is 1 MB.
+    """
+    with open(spect_path, 'rb') as fp:
+        while fp.read(chunk_size):
+            pass
+
+
 def timebin_dur(spect_path, spect_format, timebins_key, n_decimals_trunc=5):
     """get duration of time bins from a spectrogram file
 
@@ -2,4 +2,4 @@
 - audio files
 - spectrograms made from audio files of vocalizations
 - .csv files that represent a dataset of vocalizations that combines all those files together"""
-from . import audio, dataframe, spect
+from . import audio, dataframe, spect, window_store
@@ -4,6 +4,7 @@ from pathlib import Path
 import numpy as np
 import dask.bag as db
 from dask.diagnostics import ProgressBar
+from tqdm import tqdm
 
 from .. import constants
 from .. import files
@@ -11,7 +12,12 @@ from ..annotation import source_annot_map
 from ..converters import labelset_to_set
 from ..config.spect_params import SpectParamsConfig
 from ..logging import log_or_print
-from ..spect import spectrogram
+from ..spect import spectrogram, spectrograms_torch
+
+
+# number of audio files loaded at once when computing spectrograms with the 'torch' backend.
+# Files in a batch with the same number of samples are stacked and transformed with one call to torch.stft
+TORCH_FILES_PER_BATCH = 32
 
 
 def files_from_dir(audio_dir, audio_format):
@@ -101,6 +107,10 @@ def to_spect(audio_format,
         audio_path : numpy.ndarray
             path to source audio file used to create spectrogram
 
+    If ``spect_params.storage_dtype`` is specified, the spectrogram is quantized
+    with ``vak.files.spect.quantize``, and the file will contain
+    additional arrays used to convert it back when it is loaded.
+
     The names of the arrays are defaults, and will change if different values are specified
     in spect_params for 'spect_key', 'freqbins_key', 'timebins_key', or 'audio_path_key'.
     """
@@ -191,7 +201,21 @@ def to_spect(audio_format,
                                  logger=logger, level='info')
         audio_files = sorted(list(audio_annot_map.keys()))
 
-    # this is defined here so all other arguments to 'to_spect' are in scope
+    # these are defined here so all other arguments to 'to_spect' are in scope
+    def _save_spect_file(audio_file, s, f, t):
+        """helper function that saves .npz file with spectrogram made from audio file"""
+        spect_dict = {spect_params.spect_key: s,
+                      spect_params.freqbins_key: f,
+                      spect_params.timebins_key: t,
+                      spect_params.audio_path_key: audio_file}
+        if spect_params.storage_dtype is not None:
+            spect_dict = files.spect.quantize(spect_dict, spect_params.spect_key, spect_params.storage_dtype)
+        basename = os.path.basename(audio_file)
+        npz_fname = os.path.join(os.path.normpath(output_dir),
+                                 basename + '.spect.npz')
+        np.savez(npz_fname, **spect_dict)
+        return npz_fname
+
     def _spect_file(audio_file):
         """helper function that enables parallelized creation of array
         files containing spectrograms.
@@ -202,20 +226,44 @@ def to_spect(audio_format,
                               spect_params.step_size,
                               spect_params.thresh,
                               spect_params.transform_type,
-                              spect_params.freq_cutoffs)
-        spect_dict = {spect_params.spect_key: s,
-                      spect_params.freqbins_key: f,
-                      spect_params.timebins_key: t,
-                      spect_params.audio_path_key: audio_file}
-        basename = os.path.basename(audio_file)
-        npz_fname = os.path.join(os.path.normpath(output_dir),
-                                 basename + '.spect.npz')
-        np.savez(npz_fname, **spect_dict)
-        return npz_fname
+                              spect_params.freq_cutoffs,
+                              spect_params.dtype)
+        return _save_spect_file(audio_file, s, f, t)
+
+    def _spect_files_torch(batch_audio_files):
+        """helper function that makes spectrograms for a batch of audio files
+        with the 'torch' backend, and saves them in .npz files"""
+        audio = [constants.AUDIO_FORMAT_FUNC_MAP[audio_format](audio_file) for audio_file in batch_audio_files]
+        batch_spect_files = []
+        # spectrograms are computed together for files with the same sampling frequency
+        for fs in sorted(set([fs for _, fs in audio])):
+            fs_audio_files = [audio_file for audio_file, (_, file_fs) in zip(batch_audio_files, audio)
+                              if file_fs == fs]
+            spects = spectrograms_torch([dat for dat, file_fs in audio if file_fs == fs],
+                                        fs,
+                                        spect_params.fft_size,
+                                        spect_params.step_size,
+                                        spect_params.thresh,
+                                        spect_params.transform_type,
+                                        spect_params.freq_cutoffs,
+                                        spect_params.dtype)
+            batch_spect_files.extend(
+                [_save_spect_file(audio_file, s, f, t) for audio_file, (s, f, t) in zip(fs_audio_files, spects)]
+            )
+        return batch_spect_files
 
-    bag = db.from_sequence(audio_files)
-    with ProgressBar():
-        spect_files = list(bag.map(_spect_file))
+    if spect_params.backend == 'torch':
+        # torch uses its own thread pool to compute spectrograms for each batch,
+        # so batches are processed one after another in this process instead of with dask
+        spect_files = []
+        for batch_start in tqdm(range(0, len(audio_files), TORCH_FILES_PER_BATCH)):
+            spect_files.extend(
+                _spect_files_torch(audio_files[batch_start:batch_start + TORCH_FILES_PER_BATCH])
+            )
+    else:
+        bag = db.from_sequence(audio_files)
+        with ProgressBar():
+            spect_files = list(bag.map(_spect_file))
     # sort because ordering from Dask not guaranteed
     spect_files = sorted(spect_files)
     return spect_files
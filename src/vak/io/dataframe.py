@@ -5,6 +5,7 @@ import numpy as np
 
 from . import audio, spect
 from .. import annotation
+from ..config.spect_params import SpectParamsConfig
 from ..converters import expanded_user_path, labelset_to_set
 from ..logging import log_or_print
 
@@ -60,6 +61,8 @@ def from_files(data_dir,
     spect_params : dict, vak.config.spect.SpectParamsConfig.
         Parameters for creating spectrograms.
         Default is None (implying that spectrograms are already made).
+        If specified, the keys in spect_params are also used
+        to access arrays in spectrogram files.
     spect_output_dir : str
         path to location where spectrogram files should be saved.
         Default is None, in which case it defaults to ``data_dir``.
@@ -80,6 +83,9 @@ def from_files(data_dir,
     if labelset is not None:
         labelset = labelset_to_set(labelset)
 
+    if type(spect_params) is dict:
+        spect_params = SpectParamsConfig(**spect_params)
+
     if audio_format is None and spect_format is None:
         raise ValueError("Must specify either audio_format or spect_format")
 
@@ -144,6 +150,10 @@ def from_files(data_dir,
         'annot_list': annot_list,
         'annot_format': annot_format,
     }
+    if spect_params is not None:
+        # so arrays are found in spectrogram files saved with keys other than the defaults
+        for key in ('freqbins_key', 'timebins_key', 'spect_key', 'audio_path_key'):
+            to_dataframe_kwargs[key] = getattr(spect_params, key)
 
     if spect_files:  # because we just made them, and put them in spect_output_dir
         to_dataframe_kwargs['spect_files'] = spect_files
@@ -217,6 +227,66 @@ def validate_and_get_timebin_dur(df, expected_timebin_dur=None):
     return timebin_dur
 
 
+def n_freqbins_from_df(df):
+    """get number of frequency bins in spectrograms
+    for a dataset represented by a pandas DataFrame
+
+    Uses the 'n_freqbins' column added by ``vak prep``.
+    Checks that there is a single, unique value for all
+    spectrograms in the dataset, and if so, returns it.
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+        created by dataframe.from_files or spect.to_dataframe
+
+    Returns
+    -------
+    n_freqbins : int, None
+        number of frequency bins in all spectrograms in the dataset.
+        None if the DataFrame does not have an 'n_freqbins' column,
+        e.g. because it was prepared with a previous version of vak.
+    """
+    if 'n_freqbins' not in df.columns or df['n_freqbins'].isnull().any():
+        return None
+
+    n_freqbins = df['n_freqbins'].unique()
+    if len(n_freqbins) > 1:
+        raise ValueError(
+            f'found more than one number of frequency bins in dataset: {n_freqbins}'
+        )
+    return int(n_freqbins.item())
+
+
+def timebin_bounds_from_df(df):
+    """get times of first and last time bin of each spectrogram
+    for a dataset represented by a pandas DataFrame
+
+    Uses the 'first_timebin' and 'last_timebin' columns added by ``vak prep``.
+
+    Parameters
+    ----------
+    df : pandas.Dataframe
+        created by dataframe.from_files or spect.to_dataframe
+
+    Returns
+    -------
+    timebin_bounds : numpy.ndarray, None
+        with shape (number of spectrograms, 2), where the columns are the
+        times in seconds of the first and last time bin of each spectrogram.
+        Rows are NaN for spectrograms where ``vak prep`` left these columns empty,
+        because labeled timebins made from them would not be the same
+        as those made from the vector of time bins
+        (see ``vak.labeled_timebins.timebin_bounds_match``).
+        None if the DataFrame does not have these columns,
+        e.g. because it was prepared with a previous version of vak.
+    """
+    columns = ['first_timebin', 'last_timebin']
+    if not all([column in df.columns for column in columns]):
+        return None
+    return df[columns].values.astype(np.float64)
+
+
 def split_dur(df, split):
     """get duration of a split in the dataset"""
     return df[df['split'] == split]['duration'].sum()
@@ -14,6 +14,7 @@ import pandas as pd
 
 from .. import constants
 from .. import files
+from .. import labeled_timebins
 from ..annotation import source_annot_map
 from ..converters import labelset_to_set
 from ..logging import log_or_print
@@ -27,6 +28,10 @@ DF_COLUMNS = [
     'annot_format',
     'duration',
     'timebin_dur',
+    'n_timebins',
+    'n_freqbins',
+    'first_timebin',
+    'last_timebin',
 ]
 
 
@@ -210,7 +215,18 @@ def to_dataframe(spect_format,
         spect_path, annot = spect_annot_tuple
         spect_dict = files.spect.load(spect_path, spect_format)
 
-        spect_dur = spect_dict[spect_key].shape[-1] * timebin_dur
+        n_freqbins, n_timebins = spect_dict[spect_key].shape
+        spect_dur = n_timebins * timebin_dur
+        # record first and last time bin so labeled timebins can be made without loading the file again,
+        # unless that would give different labeled timebins than the vector of time bins does;
+        # then leave them empty, so the file is loaded
+        timebins = np.asarray(spect_dict[timebins_key]).ravel()
+        if annot is None or labeled_timebins.timebin_bounds_match(timebins,
+                                                                  annot.seq.onsets_s,
+                                                                  annot.seq.offsets_s):
+            first_timebin, last_timebin = float(timebins[0]), float(timebins[-1])
+        else:
+            first_timebin, last_timebin = np.nan, np.nan
         if audio_path_key in spect_dict:
             audio_path = spect_dict[audio_path_key]
             if type(audio_path) == np.ndarray:
@@ -240,6 +256,10 @@ def to_dataframe(spect_format,
             annot_format if annot_format else constants.NO_ANNOTATION_FORMAT,
             spect_dur,
             timebin_dur,
+            n_timebins,
+            n_freqbins,
+            first_timebin,
+            last_timebin,
         ])
         return record
 
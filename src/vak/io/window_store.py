@@ -0,0 +1,146 @@
+"""functions for a "window store": a single array file that contains
+all the spectrograms from one split of a dataset, concatenated along the time axis.
+
+The window store is saved as a .npy file so that it can be opened
+as a memory-mapped array with ``numpy.load(path, mmap_mode='r')``.
+This lets datasets like ``vak.datasets.WindowDataset`` take windows
+from spectrograms by slicing the memory-mapped array, instead of
+opening and decompressing one spectrogram file per window.
+Spectrograms are stored one column (time bin) after another,
+i.e. the array has shape (total number of time bins, number of frequency bins),
+so that every window is one contiguous block of the file.
+
+The location of each spectrogram in the store is saved in the
+.csv file representing the dataset, in two columns:
+``window_store_path`` and ``window_store_offset``, where the offset is
+the index of the first time bin of the spectrogram in the store.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from .. import files
+from ..logging import log_or_print
+
+
+# constants, used for names of columns added to DataFrame
+WINDOW_STORE_PATH_COL = 'window_store_path'
+WINDOW_STORE_OFFSET_COL = 'window_store_offset'
+
+WINDOW_STORE_DTYPE = np.float32
+WINDOW_STORE_EXT = '.window_store.npy'
+
+
+def to_window_store(vak_df,
+                    store_path,
+                    split='train',
+                    spect_key='s',
+                    logger=None):
+    """write all spectrograms from one split of a dataset into a window store,
+    and add columns to the DataFrame with the location of each spectrogram in the store.
+
+    Parameters
+    ----------
+    vak_df : pandas.DataFrame
+        that represents a dataset of vocalizations.
+    store_path : str, pathlib.Path
+        path where .npy file containing window store should be saved.
+    split : str
+        name of split from dataset to save in window store. Default is 'train'.
+    spect_key : str
+        key to access spectograms in array files. Default is 's'.
+
+    Other Parameters
+    ----------------
+    logger : logging.Logger
+        instance created by vak.logging.get_logger. Default is None.
+
+    Returns
+    -------
+    vak_df : pandas.DataFrame
+        with ``window_store_path`` and ``window_store_offset`` columns added.
+        Rows that are not in ``split`` have empty values in these columns.
+    """
+    store_path = Path(store_path)
+    split_df = vak_df[vak_df['split'] == split]
+    if len(split_df) == 0:
+        raise ValueError(
+            f"split '{split}' not found in dataset, cannot save window store"
+        )
+
+    # first pass: get shape of each spectrogram so we can allocate the store
+    spect_shapes = [files.spect.shape(spect_path, spect_key)
+                    for spect_path in split_df['spect_path'].values]
+    n_freqbins = set([spect_shape[0] for spect_shape in spect_shapes])
+    if len(n_freqbins) != 1:
+        raise ValueError(
+            'cannot save window store, found more than one number of frequency bins in '
+            f"spectrograms from split '{split}': {n_freqbins}"
+        )
+    n_freqbins = n_freqbins.pop()
+    n_timebins = np.array([spect_shape[-1] for spect_shape in spect_shapes])
+    offsets = np.concatenate(([0], np.cumsum(n_timebins)[:-1]))
+
+    log_or_print(
+        f"saving {len(split_df)} spectrograms from split '{split}' in window store: {store_path}",
+        logger=logger, level='info'
+    )
+    store = np.lib.format.open_memmap(store_path,
+                                      mode='w+',
+                                      dtype=WINDOW_STORE_DTYPE,
+                                      shape=(n_timebins.sum(), n_freqbins))
+    for spect_path, offset, n_tb in zip(split_df['spect_path'].values, offsets, n_timebins):
+        spect = files.spect.load(spect_path)[spect_key]
+        store[offset:offset + n_tb, :] = spect.T
+    store.flush()
+    del store
+
+    vak_df = vak_df.copy()
+    vak_df[WINDOW_STORE_PATH_COL] = None
+    vak_df.loc[split_df.index, WINDOW_STORE_PATH_COL] = str(store_path)
+    vak_df[WINDOW_STORE_OFFSET_COL] = np.nan
+    vak_df.loc[split_df.index, WINDOW_STORE_OFFSET_COL] = offsets
+    vak_df[WINDOW_STORE_OFFSET_COL] = vak_df[WINDOW_STORE_OFFSET_COL].astype('Int64')
+    return vak_df
+
+
+def has_window_store(df):
+    """returns True if all rows in a DataFrame have a location in a window store"""
+    return (WINDOW_STORE_PATH_COL in df.columns
+            and WINDOW_STORE_OFFSET_COL in df.columns
+            and df[WINDOW_STORE_PATH_COL].notna().all()
+            and df[WINDOW_STORE_OFFSET_COL].notna().all())
+
+
+def from_df(df):
+    """get path to window store and offsets of spectrograms in it, from a DataFrame
+    where every row has a location in the same window store
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        that represents a dataset of vocalizations, or one split from it.
+
+    Returns
+    -------
+    store_path : str
+        path to .npy file containing window store.
+    offsets : numpy.ndarray
+        index of first time bin of each spectrogram (row in df) in the window store.
+    """
+    if not has_window_store(df):
+        raise ValueError(
+            'not every row in DataFrame has a location in a window store'
+        )
+    store_paths = df[WINDOW_STORE_PATH_COL].unique()
+    if len(store_paths) != 1:
+        raise ValueError(
+            f'found more than one window store path in DataFrame: {store_paths}'
+        )
+    return store_paths[0], df[WINDOW_STORE_OFFSET_COL].values.astype(np.int64)
+
+
+def load(store_path):
+    """open a window store as a read-only memory-mapped array,
+    with shape (total number of time bins, number of frequency bins)"""
+    return np.load(store_path, mmap_mode='r')
@@ -95,6 +95,114 @@ def label_timebins(labels_int,
     return label_vec
 
 
+def _nearest_timebin_inds(times_s, first_timebin, timebin_dur, n_timebins):
+    """index of the time bin nearest to each time, for time bins evenly spaced ``timebin_dur`` apart.
+
+    Same as ``np.argmin(np.abs(time_bins - time))`` for each time, as in ``label_timebins``:
+    a time halfway between two time bins is assigned to the earlier one,
+    and times outside the time bins are assigned to the first or last.
+    """
+    positions = (np.asarray(times_s, dtype=np.float64) - first_timebin) / timebin_dur
+    # round half down
+    inds = np.ceil(positions - 0.5)
+    return np.clip(inds, 0, n_timebins - 1).astype(np.int64)
+
+
+def label_timebins_from_bounds(labels_int,
+                               onsets_s,
+                               offsets_s,
+                               n_timebins,
+                               first_timebin,
+                               last_timebin,
+                               unlabeled_label=0):
+    """makes a vector of labels for each time bin from a spectrogram,
+    given labels, onsets, and offsets of vocalizations,
+    and the number of time bins and times of the first and last time bin,
+    instead of the vector of time bins.
+
+    Assumes time bins are evenly spaced. The index of the time bin nearest to each onset
+    and offset is computed directly, with the same rule as ``label_timebins``
+    for times halfway between two time bins. Because of floating point error in
+    the vector of time bins, a time halfway between two time bins can still be assigned
+    to a different bin than ``label_timebins`` would assign it to; use ``timebin_bounds_match``
+    to check that the result is the same as calling ``label_timebins`` with the vector of time bins.
+
+    Parameters
+    ----------
+    labels_int : list, numpy.ndarray
+        a list or array of labels from the annotation for a vocalization,
+        mapped to integers
+    onsets_s : numpy.ndarray
+        1d vector of floats, segment onsets in seconds
+    offsets_s : numpy.ndarray
+        1-d vector of floats, segment offsets in seconds
+    n_timebins : int
+        number of time bins in spectrogram
+    first_timebin : float
+        time in seconds for center of first time bin
+    last_timebin : float
+        time in seconds for center of last time bin
+    unlabeled_label : int
+        label assigned to time bins that do not have labels associated with them.
+        Default is 0
+
+    Returns
+    -------
+    lbl_tb : numpy.ndarray
+        of length n_timebins, with each element a label for each time bin
+    """
+    if (type(labels_int) == list and not all([type(lbl) == int for lbl in labels_int]) or
+            (type(labels_int) == np.ndarray and labels_int.dtype not in [np.int8, np.int16, np.int32, np.int64])):
+        raise TypeError('labels_int must be a list or numpy.ndarray of integers')
+
+    n_timebins = int(n_timebins)
+    # with a single time bin, every onset and offset is in it
+    timebin_dur = (last_timebin - first_timebin) / (n_timebins - 1) if n_timebins > 1 else 1.
+    label_vec = np.ones((n_timebins,), dtype='int8') * unlabeled_label
+    onset_inds = _nearest_timebin_inds(onsets_s, first_timebin, timebin_dur, n_timebins)
+    offset_inds = _nearest_timebin_inds(offsets_s, first_timebin, timebin_dur, n_timebins)
+    for label, onset, offset in zip(labels_int, onset_inds, offset_inds):
+        # offset_inds[ind]+1 because offset time bin is still "part of" syllable
+        label_vec[onset:offset+1] = label
+
+    return label_vec
+
+
+def timebin_bounds_match(time_bins, onsets_s, offsets_s):
+    """determine whether ``label_timebins_from_bounds`` gives the same labeled timebins
+    as ``label_timebins``, for a vector of time bins and the onsets and offsets
+    of segments in an annotation.
+
+    True if the time bins nearest to every onset and offset, found from only
+    the number of time bins and the first and last time bin, are the same as
+    the time bins found from the vector of time bins.
+    Used by ``vak prep`` to decide whether to record the first and last time bin.
+
+    Parameters
+    ----------
+    time_bins : numpy.ndarray
+        1-d vector of floats, time in seconds for center of each time bin of a spectrogram
+    onsets_s : numpy.ndarray
+        1d vector of floats, segment onsets in seconds
+    offsets_s : numpy.ndarray
+        1-d vector of floats, segment offsets in seconds
+
+    Returns
+    -------
+    match : bool
+    """
+    if onsets_s is None or offsets_s is None:
+        return False
+    time_bins = np.asarray(time_bins).ravel()
+    n_timebins = time_bins.shape[-1]
+    times_s = np.concatenate((np.asarray(onsets_s, dtype=np.float64).ravel(),
+                              np.asarray(offsets_s, dtype=np.float64).ravel()))
+    timebin_dur = (time_bins[-1] - time_bins[0]) / (n_timebins - 1) if n_timebins > 1 else 1.
+    inds = _nearest_timebin_inds(times_s, time_bins[0], timebin_dur, n_timebins)
+    expected_inds = [np.argmin(np.abs(time_bins - time_s)) for time_s in times_s]
+    return np.array_equal(inds, expected_inds)
+
+
 def lbl_tb2labels(labeled_timebins,
                   labels_mapping,
                   spect_ID_vector=None):
@@ -198,6 +306,28 @@ def _segment_lbl_tb(lbl_tb):
     return labels, onset_inds, offset_inds
 
 
+def _unsegment_lbl_tb(labels, onset_inds, offset_inds):
+    """helper function that is the inverse of ``_segment_lbl_tb``:
+    returns the vector of labeled timebins, given the labels
+    and the onset and offset indices of its segments.
+
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        vector where each element is a label for a segment.
+    onset_inds : numpy.ndarray
+        vector where each element is the onset index for a segment.
+    offset_inds : numpy.ndarray
+        vector where each element is the offset index for a segment.
+
+    Returns
+    -------
+    lbl_tb : numpy.ndarray
+        vector where each element represents a label for a timebin
+    """
+    return np.repeat(labels, offset_inds - onset_inds + 1)
+
+
 def lbl_tb_segment_inds_list(lbl_tb, unlabeled_label=0):
     """given a vector of labeled timebins,
     returns a list of indexing vectors,
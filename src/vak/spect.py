@@ -5,10 +5,21 @@ https://scipy-cookbook.readthedocs.io/items/ButterworthBandpass.html
 spectrogram adapted from code by Kyle Kastner and Tim Sainburg
 https://github.com/timsainb/python_spectrograms_and_inversion
 """
-import numpy as np
+import functools
 
+import numpy as np
+import scipy.fft
 from scipy.signal import butter, lfilter
-from matplotlib.mlab import specgram
+
+# torch is imported by the functions for the 'torch' backend when they are called,
+# so that computing spectrograms with the 'numpy' backend does not import it
+
+
+# number of segments of audio that are windowed and transformed at once by ``stft_psd``,
+# so the memory used for windowed segments does not scale with the duration of audio
+FRAMES_PER_BLOCK = 4096
+
+VALID_BACKENDS = {'numpy', 'torch'}
 
 
 def butter_bandpass(lowcut, highcut, fs, order=5):
@@ -25,8 +36,273 @@ def butter_bandpass_filter(data, lowcut, highcut, fs, order=5):
     return y
 
 
+@functools.lru_cache(maxsize=16)
+def butter_bandpass_impulse_response(lowcut, highcut, fs, order=5, rtol=1e-12):
+    """impulse response of the filter applied by ``butter_bandpass_filter``,
+    truncated once it has decayed to less than ``rtol`` times its peak.
+
+    Used by ``butter_bandpass_filter_torch`` to apply the same filter
+    as a convolution. Cached since the same filter is used for every file.
+    """
+    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
+    # responses of stable filters decay exponentially;
+    # double length until the last block is below tolerance, up to 10 seconds
+    n_samples = 1024
+    while True:
+        impulse = np.zeros(n_samples)
+        impulse[0] = 1.
+        response = lfilter(b, a, impulse)
+        peak = np.abs(response).max()
+        above_tol = np.flatnonzero(np.abs(response) >= rtol * peak)
+        if above_tol[-1] < n_samples // 2 or n_samples >= 10 * fs:
+            response = response[:above_tol[-1] + 1]
+            response.setflags(write=False)
+            return response
+        n_samples *= 2
+
+
+def butter_bandpass_filter_torch(data, lowcut, highcut, fs, order=5):
+    """apply the filter from ``butter_bandpass_filter`` to a batch of audio signals with torch.
+
+    Instead of filtering recursively with ``scipy.signal.lfilter``,
+    the signals are convolved with the (truncated) impulse response of the filter,
+    using a real FFT, so that all signals in the batch are filtered with a few tensor operations.
+    Gives the same result as ``butter_bandpass_filter``,
+    to within the tolerance used to truncate the impulse response.
+
+    Parameters
+    ----------
+    data : torch.Tensor
+        audio signals, with shape (batch, samples).
+    lowcut, highcut : float
+        lower and higher cutoff frequencies.
+    fs : int
+        sampling frequency in Hz.
+    order : int
+        order of filter. Default is 5.
+
+    Returns
+    -------
+    filtered : torch.Tensor
+        with the same shape as ``data``.
+    """
+    import torch
+    import torch.fft
+
+    response = torch.as_tensor(butter_bandpass_impulse_response(lowcut, highcut, fs, order),
+                               dtype=data.dtype, device=data.device)
+    n_samples = data.shape[-1]
+    n_fft = scipy.fft.next_fast_len(n_samples + response.shape[-1] - 1, real=True)
+    filtered = torch.fft.irfft(torch.fft.rfft(data, n=n_fft) * torch.fft.rfft(response, n=n_fft), n=n_fft)
+    return filtered[..., :n_samples]
+
+
+@functools.lru_cache(maxsize=16)
+def _hanning(fft_size, dtype):
+    """Hann window used by ``stft_psd``, the same as the default window of
+    ``matplotlib.mlab.specgram``. Cached since the same window is used for every file;
+    made read-only so the cached array can't be changed in place."""
+    window = np.hanning(fft_size).astype(dtype)
+    window.setflags(write=False)
+    return window
+
+
+def stft_psd(dat, samp_freq, fft_size=512, step_size=64, dtype=np.float64):
+    """compute power spectral density of audio with a short-time Fourier transform.
+
+    Gives the same result as ``matplotlib.mlab.specgram`` with its default
+    window, detrending, and scaling: audio is split into overlapping segments
+    of ``fft_size`` samples, ``step_size`` samples apart, that are multiplied by a Hann window,
+    and the power of their one-sided real FFT is scaled to a density by the
+    sampling frequency and the power of the window.
+    Segments are views into the audio made with stride tricks, and are
+    windowed and transformed in blocks of ``FRAMES_PER_BLOCK`` segments
+    with ``scipy.fft.rfft``, so memory used is mostly the output spectrogram.
+
+    Parameters
+    ----------
+    dat : numpy.ndarray
+        audio signal
+    samp_freq : int
+        sampling frequency in Hz
+    fft_size : int
+        size of window for Fast Fourier transform, number of time bins.
+    step_size : int
+        step size for Fast Fourier transform
+    dtype : str, numpy.dtype
+        floating point data type that spectrogram is computed in.
+        Default is numpy.float64, the same as ``matplotlib.mlab.specgram``.
+        numpy.float32 is faster and uses half the memory.
+
+    Return
+    ------
+    spect : numpy.ndarray
+        spectrogram, with shape (frequency bins, time bins)
+    freqbins : numpy.ndarray
+        vector of centers of frequency bins from spectrogram
+    timebins : numpy.ndarray
+        vector of centers of time bins from spectrogram
+    """
+    dtype = np.dtype(dtype)
+    dat = np.ascontiguousarray(dat, dtype=dtype)
+    if dat.shape[-1] < fft_size:
+        # zero pad audio shorter than one window, like matplotlib.mlab.specgram
+        dat = np.concatenate((dat, np.zeros(fft_size - dat.shape[-1], dtype=dtype)))
+    n_samples = dat.shape[-1]
+
+    n_frames = (n_samples - fft_size) // step_size + 1
+    frames = np.lib.stride_tricks.as_strided(dat,
+                                             shape=(n_frames, fft_size),
+                                             strides=(dat.strides[0] * step_size, dat.strides[0]),
+                                             writeable=False)
+    window = _hanning(fft_size, dtype.str)
+
+    n_freqbins = fft_size // 2 + 1
+    spect = np.empty((n_freqbins, n_frames), dtype=dtype)
+    for block_start in range(0, n_frames, FRAMES_PER_BLOCK):
+        block = frames[block_start:block_start + FRAMES_PER_BLOCK] * window
+        block = scipy.fft.rfft(block, axis=-1, overwrite_x=True)
+        power = np.square(block.real)
+        power += np.square(block.imag)
+        spect[:, block_start:block_start + FRAMES_PER_BLOCK] = power.T
+
+    # one-sided density: double every frequency except DC, and Nyquist if fft_size is even
+    if fft_size % 2:
+        spect[1:] *= 2.
+    else:
+        spect[1:-1] *= 2.
+    spect /= samp_freq
+    spect /= np.square(window).sum()
+
+    freqbins = scipy.fft.rfftfreq(fft_size, 1 / samp_freq)
+    timebins = np.arange(fft_size / 2, n_samples - fft_size / 2 + 1, step_size) / samp_freq
+    return spect, freqbins, timebins
+
+
+def stft_psd_torch(dat, samp_freq, fft_size=512, step_size=64):
+    """compute power spectral density of a batch of audio signals
+    with ``torch.stft``, on the CPU, using torch's intra-op thread pool.
+
+    Gives the same result as ``vak.spect.stft_psd`` for each signal in the batch.
+
+    Parameters
+    ----------
+    dat : torch.Tensor
+        audio signals, with shape (batch, samples) and a floating point data type.
+    samp_freq : int
+        sampling frequency in Hz
+    fft_size : int
+        size of window for Fast Fourier transform, number of time bins.
+    step_size : int
+        step size for Fast Fourier transform
+
+    Return
+    ------
+    spect : torch.Tensor
+        spectrograms, with shape (batch, frequency bins, time bins)
+    freqbins : numpy.ndarray
+        vector of centers of frequency bins from spectrograms
+    timebins : numpy.ndarray
+        vector of centers of time bins from spectrograms
+    """
+    import torch
+
+    if dat.shape[-1] < fft_size:
+        # zero pad audio shorter than one window, like matplotlib.mlab.specgram
+        dat = torch.nn.functional.pad(dat, (0, fft_size - dat.shape[-1]))
+    n_samples = dat.shape[-1]
+
+    window = torch.as_tensor(_hanning(fft_size, np.dtype(np.float64).str), dtype=dat.dtype)
+    spect = torch.stft(dat, n_fft=fft_size, hop_length=step_size, win_length=fft_size, window=window,
+                       center=False, onesided=True, return_complex=True)
+    spect = spect.real.square().add_(spect.imag.square())
+
+    # one-sided density: double every frequency except DC, and Nyquist if fft_size is even
+    if fft_size % 2:
+        spect[:, 1:] *= 2.
+    else:
+        spect[:, 1:-1] *= 2.
+    spect /= samp_freq
+    spect /= window.square().sum()
+
+    freqbins = scipy.fft.rfftfreq(fft_size, 1 / samp_freq)
+    timebins = np.arange(fft_size / 2, n_samples - fft_size / 2 + 1, step_size) / samp_freq
+    return spect, freqbins, timebins
+
+
+def spectrograms_torch(dats, samp_freq, fft_size=512, step_size=64, thresh=None, transform_type=None,
+                       freq_cutoffs=None, dtype=np.float64):
+    """create spectrograms from several audio signals, with torch.
+
+    Signals with the same number of samples are stacked into one tensor,
+    and spectrograms are computed for the whole batch with ``torch.stft``, using
+    torch's intra-op thread pool. Bandpass filtering with ``butter_bandpass_filter_torch``
+    and transforms are also done as tensor operations on the batch.
+    Gives the same result as calling ``vak.spect.spectrogram`` on each signal.
+
+    Parameters
+    ----------
+    dats : list
+        of numpy.ndarray, audio signals, all with the same sampling frequency.
+    samp_freq : int
+        sampling frequency in Hz
+    fft_size, step_size, thresh, transform_type, freq_cutoffs, dtype
+        see ``vak.spect.spectrogram``.
+
+    Returns
+    -------
+    spects : list
+        of tuples ``(spect, freqbins, timebins)``, one for each signal in ``dats``,
+        in the same order, where ``spect`` is a numpy.ndarray.
+    """
+    import torch
+
+    torch_dtype = torch.float32 if np.dtype(dtype) == np.float32 else torch.float64
+
+    lens = np.array([dat.shape[-1] for dat in dats])
+    spects = [None] * len(dats)
+    for n_samples in np.unique(lens):
+        inds = np.flatnonzero(lens == n_samples)
+        batch = torch.stack([torch.as_tensor(np.asarray(dats[ind], dtype=np.float64)) for ind in inds])
+        if freq_cutoffs:
+            batch = butter_bandpass_filter_torch(batch, freq_cutoffs[0], freq_cutoffs[1], samp_freq)
+        batch = batch.to(torch_dtype)
+
+        spect, freqbins, timebins = stft_psd_torch(batch, samp_freq, fft_size, step_size)
+
+        if transform_type == 'log_spect':
+            # normalize by max of each whole spectrogram, before removing frequencies outside cutoffs
+            spect_max = torch.amax(spect, dim=(1, 2), keepdim=True)
+
+        if freq_cutoffs:
+            f_inds = np.nonzero((freqbins >= freq_cutoffs[0]) &
+                                (freqbins < freq_cutoffs[1]))[0]
+            spect = spect[:, torch.from_numpy(f_inds)]
+            freqbins = freqbins[f_inds]
+
+        if transform_type:
+            if transform_type == 'log_spect':
+                spect /= spect_max
+                spect.log10_()
+                if thresh:
+                    spect.clamp_(min=-thresh)
+            elif transform_type == 'log_spect_plus_one':
+                spect += 1
+                spect.log10_()
+                if thresh:
+                    spect.clamp_(min=thresh)
+        else:
+            if thresh:
+                spect.clamp_(min=thresh)
+
+        spect = spect.numpy()
+        for batch_ind, ind in enumerate(inds):
+            spects[ind] = (spect[batch_ind], freqbins, timebins)
+    return spects
+
+
 def spectrogram(dat, samp_freq, fft_size=512, step_size=64, thresh=None, transform_type=None,
-                freq_cutoffs=None):
+                freq_cutoffs=None, dtype=np.float64, backend='numpy'):
     """creates a spectrogram
 
     Parameters
@@ -48,6 +324,13 @@ def spectrogram(dat, samp_freq, fft_size=512, step_size=64, thresh=None, transfo
         threshold minimum power for log spectrogram
     freq_cutoffs : tuple
         of two elements, lower and higher frequencies.
+    dtype : str, numpy.dtype
+        floating point data type that spectrogram is computed in.
+        Default is numpy.float64. See ``vak.spect.stft_psd``.
+    backend : str
+        one of {'numpy', 'torch'}. 'numpy' computes the spectrogram with
+        ``vak.spect.stft_psd``, and 'torch' with ``vak.spect.spectrograms_torch``.
+        Default is 'numpy'.
 
     Return
     ------
@@ -58,7 +341,13 @@ def spectrogram(dat, samp_freq, fft_size=512, step_size=64, thresh=None, transfo
     timebins : numpy.ndarray
         vector of centers of time bins from spectrogram
     """
-    noverlap = fft_size - step_size
+    if backend not in VALID_BACKENDS:
+        raise ValueError(
+            f'backend must be one of {VALID_BACKENDS}, but was: {backend}'
+        )
+    if backend == 'torch':
+        return spectrograms_torch([dat], samp_freq, fft_size, step_size, thresh, transform_type,
+                                  freq_cutoffs, dtype)[0]
 
     if freq_cutoffs:
         dat = butter_bandpass_filter(dat,
@@ -66,28 +355,34 @@ def spectrogram(dat, samp_freq, fft_size=512, step_size=64, thresh=None, transfo
                                      freq_cutoffs[1],
                                      samp_freq)
 
-    # below only take [:3] from return of specgram because we don't need the image
-    spect, freqbins, timebins = specgram(dat, fft_size, samp_freq, noverlap=noverlap)[:3]
+    spect, freqbins, timebins = stft_psd(dat, samp_freq, fft_size, step_size, dtype)
 
+    if transform_type == 'log_spect':
+        # normalize by max of whole spectrogram, before removing frequencies outside cutoffs
+        spect_max = spect.max()
+
+    # remove frequencies outside cutoffs first, so transforms below are applied to fewer elements
+    if freq_cutoffs:
+        f_inds = np.nonzero((freqbins >= freq_cutoffs[0]) &
+                            (freqbins < freq_cutoffs[1]))[0]  # returns tuple
+        spect = spect[f_inds, :]
+        freqbins = freqbins[f_inds]
+
+    # transforms are done in place, to avoid making copies of spectrogram
     if transform_type:
         if transform_type == 'log_spect':
-            spect /= spect.max()  # volume normalize to max 1
-            spect = np.log10(spect)  # take log
+            spect /= spect_max  # volume normalize to max 1
+            np.log10(spect, out=spect)  # take log
             if thresh:
                 # I know this is weird, maintaining 'legacy' behavior
-                spect[spect < -thresh] = -thresh
+                np.maximum(spect, -thresh, out=spect)
         elif transform_type == 'log_spect_plus_one':
-            spect = np.log10(spect + 1)
+            spect += 1
+            np.log10(spect, out=spect)
             if thresh:
-                spect[spect < thresh] = thresh
+                np.maximum(spect, thresh, out=spect)
     else:
         if thresh:
-            spect[spect < thresh] = thresh  # set anything less than the threshold as the threshold
-
-    if freq_cutoffs:
-        f_inds = np.nonzero((freqbins >= freq_cutoffs[0]) &
-                            (freqbins < freq_cutoffs[1]))[0]  # returns tuple
-        spect = spect[f_inds, :]
-        freqbins = freqbins[f_inds]
+            np.maximum(spect, thresh, out=spect)  # set anything less than the threshold as the threshold
 
     return spect, freqbins, timebins
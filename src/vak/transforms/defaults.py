@@ -10,6 +10,7 @@ output includes a mask to crop off padding that was added.
 """
 import torchvision.transforms
 
+from . import functional as vak_functional
 from . import transforms as vak_transforms
 
 
@@ -51,6 +52,64 @@ class TrainItemTransform:
         return item
 
 
+class WholeFileTrainItemTransform:
+    """transform used when training models on whole spectrograms,
+    instead of on windows from a WindowDataset.
+
+    Returned item includes "source" spectrogram with a channel dimension added,
+    and padding added at the end so its width is a multiple of ``window_size``,
+    the labeled timebins "annot" padded to the same width, and a "padding_mask"
+    that is True where time bins are from the spectrogram and False where they are padding.
+    Items of different widths are padded further to the same width when they are
+    combined into a batch, by ``vak.datasets.collate.pad_collate``,
+    and the padding mask is used to exclude padding from the loss.
+    """
+    def __init__(self,
+                 window_size,
+                 spect_standardizer=None,
+                 padval=0.):
+        if spect_standardizer is not None:
+            if not isinstance(spect_standardizer, vak_transforms.StandardizeSpect):
+                raise TypeError(
+                    f'invalid type for spect_standardizer: {type(spect_standardizer)}. '
+                    'Should be an instance of vak.transforms.StandardizeSpect'
+                )
+        self.spect_standardizer = spect_standardizer
+
+        self.pad_to_window = vak_transforms.PadToWindow(window_size,
+                                                        padval,
+                                                        return_padding_mask=True)
+
+        self.source_transform_after_pad = torchvision.transforms.Compose([
+            vak_transforms.ToFloatTensor(),
+            vak_transforms.AddChannel(channel_dim=0),
+        ])
+
+        self.annot_transform = vak_transforms.ToLongTensor()
+
+    def __call__(self, source, annot, spect_path=None):
+        if self.spect_standardizer:
+            source = self.spect_standardizer(source)
+
+        source, padding_mask = self.pad_to_window(source)
+        source = self.source_transform_after_pad(source)
+
+        # padded labels are never used, because padding is masked out of the loss
+        annot = vak_functional.pad_to_window(annot, self.pad_to_window.window_size, return_padding_mask=False)
+        annot = self.annot_transform(annot)
+
+        item = {
+            'source': source,
+            'annot': annot,
+            'padding_mask': padding_mask,
+        }
+
+        if spect_path is not None:
+            item['spect_path'] = spect_path
+
+        return item
+
+
 class EvalItemTransform:
     """default transform used when evaluating models
 
@@ -183,7 +242,7 @@ def get_defaults(mode,
     Parameters
     ----------
     mode : str
-        one of {'train', 'eval', 'predict'}. Determines set of transforms.
+        one of {'train', 'train_whole_file', 'eval', 'predict'}. Determines set of transforms.
     spect_standardizer : vak.transforms.StandardizeSpect
         instance that has already been fit to dataset, using fit_df method.
         Default is None, in which case no standardization transform is applied.
@@ -224,13 +283,23 @@ def get_defaults(mode,
 
         transform.extend([
             vak_transforms.ToFloatTensor(),
-            vak_transforms.AddChannel(),
+            # add channel before (frequency bins, time bins), so transform
+            # works on single windows and on batches from WindowDataset
+            vak_transforms.AddChannel(channel_dim=-3),
         ])
         transform = torchvision.transforms.Compose(transform)
 
         target_transform = vak_transforms.ToLongTensor()
         return transform, target_transform
 
+    elif mode == 'train_whole_file':
+        item_transform = WholeFileTrainItemTransform(
+            spect_standardizer=spect_standardizer,
+            window_size=window_size,
+            padval=padval,
+        )
+        return item_transform
+
     elif mode == 'predict':
         item_transform = PredictItemTransform(
             spect_standardizer=spect_standardizer,
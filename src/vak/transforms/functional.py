@@ -16,7 +16,8 @@ def standardize_spect(spect, mean_freqs, std_freqs, non_zero_std):
     Parameters
     ----------
     spect : numpy.ndarray
-        with shape (frequencies, time bins)
+        with shape (frequencies, time bins),
+        or a batch of spectrograms with shape (batch, frequencies, time bins)
     mean_freqs : numpy.ndarray
         vector of mean values for each frequency bin across the fit set of spectrograms
     std_freqs : numpy.ndarray
@@ -32,7 +33,7 @@ def standardize_spect(spect, mean_freqs, std_freqs, non_zero_std):
     """
     tfm = spect - mean_freqs[:, np.newaxis]  # need axis for broadcasting
     # keep any stds that are zero from causing NaNs
-    tfm[non_zero_std, :] = tfm[non_zero_std, :] / std_freqs[non_zero_std, np.newaxis]
+    tfm[..., non_zero_std, :] = tfm[..., non_zero_std, :] / std_freqs[non_zero_std, np.newaxis]
     return tfm
 
 
@@ -197,5 +198,6 @@ def add_channel(input, channel_dim=0):
     input : torch.Tensor
     channel_dim : int
         dimension where "channel" is added. Default is 0.
+        Negative values count from the end, as with ``torch.unsqueeze``.
     """
     return torch.unsqueeze(input, dim=channel_dim)
@@ -124,7 +124,8 @@ class StandardizeSpect:
         Parameters
         ----------
         spect : numpy.ndarray
-            2-d array with dimensions (frequency bins, time bins).
+            2-d array with dimensions (frequency bins, time bins),
+            or 3-d array with dimensions (batch, frequency bins, time bins).
 
         Returns
         -------
@@ -144,8 +145,8 @@ class StandardizeSpect:
                 f'type of spect must be numpy.ndarray but was: {type(spect)}'
             )
 
-        if spect.shape[0] != self.mean_freqs.shape[0]:
-            raise ValueError(f'number of rows in spects, {spect.shape[0]}, '
+        if spect.shape[-2] != self.mean_freqs.shape[0]:
+            raise ValueError(f'number of rows in spects, {spect.shape[-2]}, '
                              f'does not match number of elements in self.mean_freqs, {self.mean_freqs.shape[0]},'
                              'i.e. the number of frequency bins from the spectrogram'
                              'to which the scaler was fit originally')
@@ -321,6 +322,8 @@ class AddChannel:
     channel_dim : int
         dimension where "channel" is added.
         Default is 0, which returns a tensor with dimensions (channel, height, width).
+        Negative values count from the end, as with ``torch.unsqueeze``, e.g.
+        -3 adds a channel before (height, width) whether or not there is a batch dimension.
     """
     def __init__(self, channel_dim=0):
         if not (type(channel_dim) == int) or (type(channel_dim) == float and channel_dim.is_integer() is False):
@@ -331,12 +334,6 @@ class AddChannel:
 
         channel_dim = int(channel_dim)
 
-        if channel_dim < 0 and channel_dim != -1:
-            raise ValueError(
-                'value of channel_dim should be a non-negative integer, or -1 (for last dimension). '
-                f'Value was: {channel_dim}'
-            )
-
         self.channel_dim = channel_dim
 
     def __call__(self, input):
@@ -49,3 +49,11 @@ def test_nonexistent_root_results_dir_raises(
     config_toml['TRAIN']['root_results_dir'] = 'obviously/non/existent/dir'
     with pytest.raises(NotADirectoryError):
         vak.config.train.parse_train_config(config_toml, toml_path)
+
+
+def test_pin_memory(all_generated_train_configs_toml_path_pairs):
+    config_toml, toml_path = next(all_generated_train_configs_toml_path_pairs)
+    config_toml['TRAIN'].pop('pin_memory', None)
+    assert vak.config.train.parse_train_config(config_toml, toml_path).pin_memory is False
+    config_toml['TRAIN']['pin_memory'] = True
+    assert vak.config.train.parse_train_config(config_toml, toml_path).pin_memory is True
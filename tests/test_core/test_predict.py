@@ -1,14 +1,29 @@
 """tests for vak.core.predict module"""
+import json
+
+import crowsetta
+import joblib
+import numpy as np
+import pandas as pd
 import pytest
+import torch
 
 import vak.config
 import vak.core.predict
+import vak.datasets
+import vak.files.spect
+import vak.labeled_timebins
+import vak.models
+import vak.transforms
 
 
 # written as separate function so we can re-use in tests/unit/test_cli/test_predict.py
 def predict_output_matches_expected(output_dir, annot_csv_filename):
     annot_csv = output_dir.joinpath(annot_csv_filename)
     assert annot_csv.exists()
+    # annotations are written one file at a time; should still be readable by crowsetta
+    annots = crowsetta.csv.csv2annot(annot_csv)
+    assert all([isinstance(annot, crowsetta.Annotation) for annot in annots])
 
     return True
 
@@ -64,3 +79,171 @@ def test_predict(audio_format,
                      )
 
     assert predict_output_matches_expected(output_dir, cfg.predict.annot_csv_filename)
+
+
+def test_predict_output_probs(specific_config,
+                              tmp_path,
+                              device):
+    output_dir = tmp_path.joinpath('test_predict_output_probs')
+    output_dir.mkdir()
+
+    options_to_change = [
+        {'section': 'PREDICT',
+         'option': 'output_dir',
+         'value': str(output_dir)},
+        {'section': 'PREDICT',
+         'option': 'device',
+         'value': device},
+        {'section': 'PREDICT',
+         'option': 'output',
+         'value': 'probs'},
+    ]
+
+    toml_path = specific_config(config_type='predict',
+                                audio_format='cbin',
+                                annot_format='notmat',
+                                options_to_change=options_to_change)
+    cfg = vak.config.parse.from_toml_path(toml_path)
+    assert cfg.predict.output == 'probs'
+
+    model_config_map = vak.config.models.map_from_path(toml_path, cfg.predict.models)
+
+    vak.core.predict(csv_path=cfg.predict.csv_path,
+                     checkpoint_path=cfg.predict.checkpoint_path,
+                     labelmap_path=cfg.predict.labelmap_path,
+                     model_config_map=model_config_map,
+                     window_size=cfg.dataloader.window_size,
+                     num_workers=cfg.predict.num_workers,
+                     spect_key=cfg.spect_params.spect_key,
+                     timebins_key=cfg.spect_params.timebins_key,
+                     spect_scaler_path=cfg.predict.spect_scaler_path,
+                     device=cfg.predict.device,
+                     annot_csv_filename=cfg.predict.annot_csv_filename,
+                     output_dir=cfg.predict.output_dir,
+                     min_segment_dur=cfg.predict.min_segment_dur,
+                     majority_vote=cfg.predict.majority_vote,
+                     output=cfg.predict.output,
+                     logger=None
+                     )
+
+    assert predict_output_matches_expected(output_dir, cfg.predict.annot_csv_filename)
+    dataset_df = pd.read_csv(cfg.predict.csv_path)
+    dataset_df = dataset_df[dataset_df['split'] == 'predict']
+    probs_dir = output_dir.joinpath(cfg.predict.csv_path.stem + '.probs')
+    probs_paths = sorted(probs_dir.glob('*.probs.npy'))
+    assert len(probs_paths) == len(dataset_df)
+    for probs_path in probs_paths:
+        probs = np.load(probs_path, mmap_mode='r')
+        assert probs.dtype == np.float16
+        assert probs.ndim == 2
+
+
+@pytest.mark.parametrize(
+    'pack_windows',
+    [
+        None,
+        # small enough that windows from one file can be split across batches with other files
+        16,
+    ]
+)
+def test_predict_streamed_matches_predict(pack_windows,
+                                          specific_config,
+                                          tmp_path,
+                                          device):
+    """test that annotations written one file at a time by ``vak.core.predict``
+    match annotations made from all predictions returned by ``Model.predict``,
+    for the same model and data"""
+    output_dir = tmp_path.joinpath(f'test_predict_streamed_matches_predict_{pack_windows}')
+    output_dir.mkdir()
+
+    options_to_change = [
+        {'section': 'PREDICT',
+         'option': 'output_dir',
+         'value': str(output_dir)},
+        {'section': 'PREDICT',
+         'option': 'device',
+         'value': device},
+    ]
+    toml_path = specific_config(config_type='predict',
+                                audio_format='cbin',
+                                annot_format='notmat',
+                                options_to_change=options_to_change)
+    cfg = vak.config.parse.from_toml_path(toml_path)
+    model_config_map = vak.config.models.map_from_path(toml_path, cfg.predict.models)
+
+    vak.core.predict(csv_path=cfg.predict.csv_path,
+                     checkpoint_path=cfg.predict.checkpoint_path,
+                     labelmap_path=cfg.predict.labelmap_path,
+                     model_config_map=model_config_map,
+                     window_size=cfg.dataloader.window_size,
+                     num_workers=cfg.predict.num_workers,
+                     spect_key=cfg.spect_params.spect_key,
+                     timebins_key=cfg.spect_params.timebins_key,
+                     spect_scaler_path=cfg.predict.spect_scaler_path,
+                     device=cfg.predict.device,
+                     annot_csv_filename=cfg.predict.annot_csv_filename,
+                     output_dir=cfg.predict.output_dir,
+                     min_segment_dur=cfg.predict.min_segment_dur,
+                     majority_vote=cfg.predict.majority_vote,
+                     pack_windows=pack_windows,
+                     logger=None
+                     )
+    streamed_annots = crowsetta.csv.csv2annot(output_dir.joinpath(cfg.predict.annot_csv_filename))
+
+    # ---- make annotations without streaming, from the dict returned by Model.predict
+    with cfg.predict.labelmap_path.open('r') as fp:
+        labelmap = json.load(fp)
+    if cfg.predict.spect_scaler_path:
+        spect_standardizer = joblib.load(cfg.predict.spect_scaler_path)
+    else:
+        spect_standardizer = None
+    item_transform = vak.transforms.get_defaults('predict',
+                                                 spect_standardizer,
+                                                 window_size=cfg.dataloader.window_size,
+                                                 return_padding_mask=True)
+    pred_dataset = vak.datasets.VocalDataset.from_csv(csv_path=cfg.predict.csv_path,
+                                                      split='predict',
+                                                      labelmap=labelmap,
+                                                      spect_key=cfg.spect_params.spect_key,
+                                                      timebins_key=cfg.spect_params.timebins_key,
+                                                      item_transform=item_transform)
+    pred_data = torch.utils.data.DataLoader(dataset=pred_dataset, shuffle=False, batch_size=1)
+    input_shape = pred_dataset.shape
+    if len(input_shape) == 4:
+        input_shape = input_shape[1:]
+    models_map = vak.models.from_model_config_map(model_config_map,
+                                                  num_classes=len(labelmap),
+                                                  input_shape=input_shape)
+    model = list(models_map.values())[-1]
+    model.load(cfg.predict.checkpoint_path)
+    preds = model.predict(pred_data=pred_data, device=device)
+
+    expected_annots = []
+    for idx, spect_path in enumerate(pred_dataset.spect_paths):
+        y_pred = torch.flatten(torch.argmax(preds[spect_path], dim=1)).cpu().numpy()
+        padding_mask = np.squeeze(np.asarray(pred_dataset[idx]['padding_mask']))
+        y_pred = y_pred[padding_mask]
+        t = vak.files.spect.load(spect_path)[cfg.spect_params.timebins_key]
+        labels, onsets_s, offsets_s = vak.labeled_timebins.lbl_tb2segments(
+            y_pred, labelmap=labelmap, t=t,
+            min_segment_dur=cfg.predict.min_segment_dur,
+            majority_vote=cfg.predict.majority_vote
+        )
+        seq = crowsetta.Sequence.from_keyword(labels=labels, onsets_s=onsets_s, offsets_s=offsets_s)
+        annot = crowsetta.Annotation(seq=seq,
+                                     audio_path=vak.files.spect.find_audio_fname(spect_path),
+                                     annot_path=cfg.predict.annot_csv_filename)
+        expected_annots.append(annot)
+    # write all annotations at once, as vak did before streaming, and read back with crowsetta
+    expected_csv_path = tmp_path.joinpath('expected.annot.csv')
+    crowsetta.csv.annot2csv(annot=expected_annots, csv_filename=expected_csv_path)
+    expected_annots = crowsetta.csv.csv2annot(expected_csv_path)
+
+    # same files, in the same order, with the same segments for each file
+    assert len(streamed_annots) == len(expected_annots)
+    for streamed_annot, expected_annot in zip(streamed_annots, expected_annots):
+        assert streamed_annot.audio_path == expected_annot.audio_path
+        assert streamed_annot.annot_path == expected_annot.annot_path
+        assert np.array_equal(streamed_annot.seq.labels, expected_annot.seq.labels)
+        assert np.allclose(streamed_annot.seq.onsets_s, expected_annot.seq.onsets_s)
+        assert np.allclose(streamed_annot.seq.offsets_s, expected_annot.seq.offsets_s)
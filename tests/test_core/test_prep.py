@@ -1,6 +1,7 @@
 """tests for vak.core.prep module"""
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from pandas.testing import assert_series_equal
 import pytest
@@ -8,8 +9,10 @@ import pytest
 import vak.config
 import vak.constants
 import vak.core.train
+import vak.files.spect
 import vak.paths
 import vak.io.spect
+import vak.io.window_store
 
 
 # written as separate function so we can re-use in tests/unit/test_cli/test_prep.py
@@ -80,3 +83,54 @@ def test_prep(config_type,
 
     assert prep_output_matches_expected(csv_path,
                                         vak_df)
+
+
+def test_prep_window_store_spect_key(specific_config,
+                                     tmp_path):
+    """test that a window store is made from spectrograms saved with a key other than the default"""
+    output_dir = tmp_path.joinpath('test_prep_window_store_spect_key')
+    output_dir.mkdir()
+
+    options_to_change = [
+        {'section': 'PREP',
+         'option': 'output_dir',
+         'value': str(output_dir)},
+        {'section': 'PREP',
+         'option': 'window_store',
+         'value': True},
+        {'section': 'SPECT_PARAMS',
+         'option': 'spect_key',
+         'value': 'spect'},
+    ]
+    toml_path = specific_config(config_type='train',
+                                audio_format='cbin',
+                                annot_format='notmat',
+                                options_to_change=options_to_change)
+    cfg = vak.config.parse.from_toml_path(toml_path)
+    assert cfg.spect_params.spect_key == 'spect'
+
+    vak_df, csv_path = vak.core.prep(data_dir=cfg.prep.data_dir,
+                                     purpose='train',
+                                     audio_format=cfg.prep.audio_format,
+                                     spect_format=cfg.prep.spect_format,
+                                     spect_output_dir=cfg.prep.spect_output_dir,
+                                     spect_params=cfg.spect_params,
+                                     annot_format=cfg.prep.annot_format,
+                                     annot_file=cfg.prep.annot_file,
+                                     labelset=cfg.prep.labelset,
+                                     output_dir=cfg.prep.output_dir,
+                                     train_dur=cfg.prep.train_dur,
+                                     val_dur=cfg.prep.val_dur,
+                                     test_dur=cfg.prep.test_dur,
+                                     window_store=cfg.prep.window_store,
+                                     logger=None,
+                                     )
+
+    train_df = vak_df[vak_df['split'] == 'train']
+    assert vak.io.window_store.has_window_store(train_df)
+    store_path, offsets = vak.io.window_store.from_df(train_df)
+    store = vak.io.window_store.load(store_path)
+    for spect_path, offset in zip(train_df['spect_path'].values, offsets):
+        spect = vak.files.spect.load(spect_path)['spect']
+        assert np.allclose(store[offset:offset + spect.shape[-1]],
+                           spect.T.astype(vak.io.window_store.WINDOW_STORE_DTYPE))
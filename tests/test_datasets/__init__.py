@@ -0,0 +1,4 @@
+from . import test_cache
+from . import test_samplers
+from . import test_window_dataset
+from . import test_window_index
@@ -0,0 +1,156 @@
+"""tests for ``vak.datasets.cache`` module"""
+import multiprocessing
+from multiprocessing import shared_memory
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+import vak.datasets.cache
+
+
+def test_spect_cache_hits_and_misses():
+    cache = vak.datasets.cache.SpectCache(max_bytes=1000)
+    spect = np.zeros((10, 10))  # 800 bytes
+    assert cache.get(0) is None
+    cache.put(0, spect)
+    assert cache.get(0) is spect
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_spect_cache_evicts_least_recently_used():
+    cache = vak.datasets.cache.SpectCache(max_bytes=1000)
+    spect_and_timebins = (np.zeros((5, 10)), np.zeros(10))  # 400 + 80 bytes
+    cache.put(0, spect_and_timebins)
+    cache.put(1, spect_and_timebins)
+    cache.get(0)  # so 1 is now least recently used
+    cache.put(2, spect_and_timebins)
+    assert 0 in cache
+    assert 1 not in cache
+    assert 2 in cache
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_spect_cache_does_not_cache_values_larger_than_max_bytes():
+    cache = vak.datasets.cache.SpectCache(max_bytes=100)
+    cache.put(0, np.zeros((10, 10)))
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_spect_cache_is_empty_after_pickling():
+    cache = vak.datasets.cache.SpectCache.from_mb(1)
+    cache.put(0, np.zeros((10, 10)))
+    cache.get(0)
+    unpickled = pickle.loads(pickle.dumps(cache))
+    assert unpickled.max_bytes == cache.max_bytes
+    assert len(unpickled) == 0
+    assert unpickled.info()['hits'] == 0
+
+
+def test_spect_cache_negative_max_bytes_raises():
+    with pytest.raises(ValueError):
+        vak.datasets.cache.SpectCache(max_bytes=-1)
+
+
+def _put_in_other_process(cache, key, value):
+    cache.put(key, value)
+
+
+@pytest.fixture
+def shared_spect_cache():
+    cache = vak.datasets.cache.SharedSpectCache(max_bytes=1000, n_keys=4)
+    yield cache
+    cache.close()
+
+
+def test_shared_spect_cache_hits_and_misses(shared_spect_cache):
+    spect = np.random.rand(10, 10)  # 800 bytes
+    assert shared_spect_cache.get(0) is None
+    shared_spect_cache.put(0, spect)
+    np.testing.assert_array_equal(shared_spect_cache.get(0), spect)
+    assert shared_spect_cache.hits == 1
+    assert shared_spect_cache.misses == 1
+
+
+def test_shared_spect_cache_tuple_values(shared_spect_cache):
+    spect_and_lbl_tb = (np.random.rand(5, 10).astype(np.float32), np.arange(10))
+    shared_spect_cache.put(0, spect_and_lbl_tb)
+    spect, lbl_tb = shared_spect_cache.get(0)
+    for cached, value in zip((spect, lbl_tb), spect_and_lbl_tb):
+        assert cached.dtype == value.dtype
+        np.testing.assert_array_equal(cached, value)
+
+
+def test_shared_spect_cache_evicts_least_recently_used(shared_spect_cache):
+    spect = np.zeros((5, 10))  # 400 bytes
+    shared_spect_cache.put(0, spect)
+    shared_spect_cache.put(1, spect)
+    shared_spect_cache.get(0)  # so 1 is now least recently used
+    shared_spect_cache.put(2, spect)
+    assert 0 in shared_spect_cache
+    assert 1 not in shared_spect_cache
+    assert 2 in shared_spect_cache
+    assert shared_spect_cache.nbytes <= shared_spect_cache.max_bytes
+    # evicted value can be loaded again
+    assert shared_spect_cache.get(1) is None
+
+
+def test_shared_spect_cache_does_not_cache_values_larger_than_max_bytes(shared_spect_cache):
+    assert shared_spect_cache.get(0) is None
+    shared_spect_cache.put(0, np.zeros((20, 10)))
+    assert len(shared_spect_cache) == 0
+    assert shared_spect_cache.nbytes == 0
+    # key was not left in 'loading' state
+    assert shared_spect_cache.get(0) is None
+
+
+def test_shared_spect_cache_shared_between_processes(shared_spect_cache):
+    spect = np.random.rand(10, 10)
+    process = multiprocessing.Process(target=_put_in_other_process, args=(shared_spect_cache, 3, spect))
+    process.start()
+    process.join()
+    assert 3 in shared_spect_cache
+    np.testing.assert_array_equal(shared_spect_cache.get(3), spect)
+
+
+def test_shared_spect_cache_attach(shared_spect_cache):
+    # what happens when a cache is unpickled in a DataLoader worker
+    attached = vak.datasets.cache.SharedSpectCache.__new__(vak.datasets.cache.SharedSpectCache)
+    attached.__setstate__(shared_spect_cache.__getstate__())
+    spect = np.random.rand(10, 10)
+    attached.put(1, spect)
+    np.testing.assert_array_equal(shared_spect_cache.get(1), spect)
+    assert attached.info() == shared_spect_cache.info()
+    attached.close()
+    # closing an attached cache does not free values
+    assert 1 in shared_spect_cache
+
+
+def test_shared_spect_cache_cancel():
+    cache = vak.datasets.cache.SharedSpectCache(max_bytes=1000, n_keys=4, wait_timeout=5.)
+    try:
+        assert cache.get(0) is None  # this process is now loading the value
+        assert cache._index['state'][0] == cache.LOADING
+        # e.g. because loading the file raised an error
+        cache.cancel(0)
+        assert cache._index['state'][0] == cache.EMPTY
+        # next process to get the key does not wait for the value
+        start = time.monotonic()
+        assert cache.get(0) is None
+        assert time.monotonic() - start < cache.wait_timeout
+    finally:
+        cache.close()
+
+
+def test_shared_spect_cache_context_manager():
+    with pytest.raises(RuntimeError):
+        with vak.datasets.cache.SharedSpectCache(max_bytes=1000, n_keys=4) as cache:
+            cache.put(0, np.random.rand(10, 10))
+            prefix = cache._prefix
+            raise RuntimeError('error during training')
+    # shared memory was freed even though there was an error
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=prefix)
@@ -0,0 +1,62 @@
+"""tests for ``vak.datasets.cached_loader`` module"""
+import torch
+
+from vak.datasets.cached_loader import CachedLoader
+
+
+class _CountingLoader:
+    """stands in for a DataLoader, and counts how many times it is iterated over"""
+    def __init__(self, n_batches, batch_size=4):
+        self.batches = [
+            {'source': torch.rand(batch_size, 1, 8, 10),
+             'annot': torch.randint(0, 3, (1, batch_size * 10)),
+             'spect_path': [f'{batch_ind}.spect.npz']}
+            for batch_ind in range(n_batches)
+        ]
+        self.dataset = 'dataset'
+        self.n_iters = 0
+
+    def __iter__(self):
+        self.n_iters += 1
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+
+def test_cached_loader_replays_batches():
+    loader = _CountingLoader(n_batches=5)
+    cached_loader = CachedLoader(loader, max_mb=1)
+    assert len(cached_loader) == 5
+    assert cached_loader.dataset == 'dataset'
+
+    for _ in range(3):
+        batches = list(cached_loader)
+        assert len(batches) == 5
+        for batch, expected in zip(batches, loader.batches):
+            assert torch.equal(batch['source'], expected['source'])
+            assert torch.equal(batch['annot'], expected['annot'])
+            assert batch['spect_path'] == expected['spect_path']
+    assert cached_loader.cached
+    assert loader.n_iters == 1
+
+
+def test_cached_loader_larger_than_max_mb():
+    loader = _CountingLoader(n_batches=5)
+    # each batch is 4 * 8 * 10 * 4 bytes of source plus 40 * 8 bytes of annot
+    cached_loader = CachedLoader(loader, max_mb=1000 / 2 ** 20)
+    for _ in range(3):
+        assert len(list(cached_loader)) == 5
+    assert not cached_loader.cached
+    assert loader.n_iters == 3
+
+
+def test_cached_loader_not_cached_after_partial_iteration():
+    loader = _CountingLoader(n_batches=5)
+    cached_loader = CachedLoader(loader, max_mb=1)
+    for batch_ind, _ in enumerate(cached_loader):
+        if batch_ind == 2:
+            break
+    assert not cached_loader.cached
+    assert len(list(cached_loader)) == 5
+    assert cached_loader.cached
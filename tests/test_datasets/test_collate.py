@@ -0,0 +1,63 @@
+"""tests for ``vak.datasets.collate`` module"""
+import numpy as np
+import torch
+
+import vak.datasets.collate
+import vak.transforms.defaults
+
+
+N_FREQBINS = 8
+WINDOW_SIZE = 10
+
+
+def test_pad_collate():
+    item_transform = vak.transforms.defaults.WholeFileTrainItemTransform(window_size=WINDOW_SIZE)
+    widths = [23, 40, 7]
+    items = [
+        item_transform(np.random.rand(N_FREQBINS, width), np.random.randint(1, 4, size=width), f'spect{width}.npz')
+        for width in widths
+    ]
+    for item, width in zip(items, widths):
+        # each item is padded to a multiple of the window size
+        assert item['source'].shape == (1, N_FREQBINS, int(np.ceil(width / WINDOW_SIZE)) * WINDOW_SIZE)
+
+    batch = vak.datasets.collate.pad_collate(items)
+
+    max_width = 40
+    assert batch['source'].shape == (len(widths), 1, N_FREQBINS, max_width)
+    assert batch['annot'].shape == batch['padding_mask'].shape == (len(widths), max_width)
+    assert batch['padding_mask'].dtype == torch.bool
+    assert batch['spect_path'] == [f'spect{width}.npz' for width in widths]
+    for item_ind, width in enumerate(widths):
+        assert torch.count_nonzero(batch['padding_mask'][item_ind]) == width
+        assert torch.all(batch['padding_mask'][item_ind, :width])
+        assert torch.all(batch['source'][item_ind, ..., width:] == 0.)
+        # labels are never 0 in this test, so any 0 is padding
+        assert torch.equal(batch['annot'][item_ind] != 0, batch['padding_mask'][item_ind])
+
+
+def test_pack_unpack_windows():
+    item_transform = vak.transforms.defaults.EvalItemTransform(window_size=WINDOW_SIZE)
+    widths = [23, 40, 7]
+    items = [
+        item_transform(np.random.rand(N_FREQBINS, width), np.random.randint(1, 4, size=width), f'spect{width}.npz')
+        for width in widths
+    ]
+    n_windows = [int(np.ceil(width / WINDOW_SIZE)) for width in widths]
+
+    batch = vak.datasets.collate.pack_windows(items)
+
+    assert batch['source'].shape == (sum(n_windows), 1, N_FREQBINS, WINDOW_SIZE)
+    assert batch['window_offsets'].tolist() == np.cumsum([0] + n_windows).tolist()
+    assert batch['padding_mask'].shape == (sum(n_windows) * WINDOW_SIZE,)
+    assert batch['spect_path'] == [f'spect{width}.npz' for width in widths]
+
+    # use source as a stand-in for output of a network, to check it is split back correctly
+    unpacked = list(vak.datasets.collate.unpack_windows(batch, batch['source']))
+    assert len(unpacked) == len(items)
+    for (item_batch, item_out), item, width in zip(unpacked, items, widths):
+        assert torch.equal(item_out, item['source'])
+        assert torch.equal(item_batch['padding_mask'][0], torch.as_tensor(item['padding_mask']))
+        assert torch.count_nonzero(item_batch['padding_mask']) == width
+        assert torch.equal(item_batch['annot'][0], item['annot'])
+        assert item_batch['spect_path'] == [item['spect_path']]
@@ -0,0 +1,177 @@
+"""tests for ``vak.datasets.samplers`` module"""
+import time
+
+import numpy as np
+import pytest
+import torch
+
+import vak.datasets.samplers
+
+
+@pytest.mark.parametrize(
+    'windows_per_file',
+    [1, 4, 10, 1000]
+)
+def test_file_locality_sampler(windows_per_file):
+    spect_ids = np.repeat(np.arange(7), [50, 3, 120, 1, 64, 80, 9])
+    sampler = vak.datasets.samplers.FileLocalitySampler(spect_ids, windows_per_file)
+
+    torch.manual_seed(0)
+    inds = list(sampler)
+    assert len(inds) == len(sampler) == spect_ids.shape[-1]
+    assert sorted(inds) == list(range(spect_ids.shape[-1]))
+
+    # every chunk of ``windows_per_file`` windows comes from one file
+    ids = spect_ids[inds]
+    n_file_changes = np.count_nonzero(ids[1:] != ids[:-1])
+    n_chunks = sum([int(np.ceil(count / windows_per_file)) for count in np.bincount(spect_ids)])
+    assert n_file_changes <= n_chunks - 1
+
+    # order is reproducible with torch.manual_seed, and different across epochs
+    torch.manual_seed(0)
+    assert list(sampler) == inds
+    if windows_per_file < 1000:
+        assert list(sampler) != inds
+
+
+def test_file_locality_sampler_invalid_windows_per_file_raises():
+    with pytest.raises(ValueError):
+        vak.datasets.samplers.FileLocalitySampler(np.zeros(10, dtype=int), 0)
+
+
+class _PrefetchRecorder:
+    """stands in for a dataset, to record which files are prefetched"""
+    def __init__(self, spect_ids):
+        self._spect_ids = np.asarray(spect_ids)
+        self.prefetched = []
+
+    def spect_ids(self, indices):
+        return self._spect_ids[indices]
+
+    def prefetch(self, spect_id):
+        self.prefetched.append(spect_id)
+
+
+@pytest.mark.parametrize(
+    'files_ahead',
+    [1, 3, 100]
+)
+def test_prefetch_sampler(files_ahead):
+    spect_ids = np.repeat(np.arange(7), [50, 3, 120, 1, 64, 80, 9])
+    dataset = _PrefetchRecorder(spect_ids)
+    file_sampler = vak.datasets.samplers.FileLocalitySampler(spect_ids, windows_per_file=8)
+    sampler = vak.datasets.samplers.PrefetchSampler(file_sampler, dataset, files_ahead=files_ahead)
+
+    torch.manual_seed(0)
+    inds = list(sampler)
+    torch.manual_seed(0)
+    # does not change order of wrapped sampler
+    assert inds == list(file_sampler)
+    assert len(sampler) == len(file_sampler)
+
+    # after the first index, the next ``files_ahead`` files are prefetched
+    run_starts, run_spect_ids = sampler.plan(np.asarray(inds))
+    expected = run_spect_ids[1:1 + files_ahead].tolist()
+    dataset.prefetched = []
+    torch.manual_seed(0)
+    sampler_iter = iter(sampler)
+    next(sampler_iter)
+    for _ in range(100):
+        if len(dataset.prefetched) == len(expected):
+            break
+        time.sleep(0.01)
+    assert sorted(dataset.prefetched) == sorted(expected)
+    sampler_iter.close()
+
+
+def test_prefetch_sampler_files_ahead_raises():
+    with pytest.raises(ValueError):
+        vak.datasets.samplers.PrefetchSampler(range(10), _PrefetchRecorder(np.zeros(10)), files_ahead=0)
+
+
+@pytest.mark.parametrize(
+    'batch_size, batches_per_bucket, shuffle, drop_last',
+    [
+        (4, 1, True, False),
+        (4, 5, True, False),
+        (4, 5, True, True),
+        (7, 100, False, False),
+    ]
+)
+def test_length_bucket_batch_sampler(batch_size, batches_per_bucket, shuffle, drop_last):
+    lengths = np.random.randint(10, 1000, size=103)
+    sampler = vak.datasets.samplers.LengthBucketBatchSampler(lengths, batch_size, batches_per_bucket,
+                                                             shuffle=shuffle, drop_last=drop_last)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert all([len(batch) <= batch_size for batch in batches])
+    inds = [ind for batch in batches for ind in batch]
+    if drop_last:
+        assert all([len(batch) == batch_size for batch in batches])
+        assert len(set(inds)) == len(inds)
+    else:
+        assert sorted(inds) == list(range(lengths.shape[-1]))
+
+    # items are sorted by length within buckets, so batches need less padding than random batches
+    padding = sum([lengths[batch].max() * len(batch) - lengths[batch].sum() for batch in batches])
+    random_inds = np.random.permutation(lengths.shape[-1])
+    random_batches = [random_inds[start:start + batch_size] for start in range(0, len(inds), batch_size)]
+    random_padding = sum([lengths[batch].max() * len(batch) - lengths[batch].sum() for batch in random_batches])
+    if batches_per_bucket > 1:
+        assert padding < random_padding
+
+
+@pytest.mark.parametrize(
+    'n_windows, num_samples, replacement',
+    [
+        (1000, 100, False),
+        (1000, 100, True),
+        (100, 250, False),
+        (100, 250, True),
+    ]
+)
+def test_random_window_sampler(n_windows, num_samples, replacement):
+    sampler = vak.datasets.samplers.RandomWindowSampler(n_windows, num_samples, replacement)
+    inds = list(sampler)
+    assert len(inds) == len(sampler) == num_samples
+    assert all([0 <= ind < n_windows for ind in inds])
+    if not replacement:
+        # every window is drawn once before any window is drawn again
+        counts = np.bincount(inds, minlength=n_windows)
+        assert counts.max() - counts.min() <= 1
+
+
+@pytest.mark.parametrize(
+    'num_samples',
+    [10, 327, 1000]
+)
+def test_file_locality_sampler_num_samples(num_samples):
+    spect_ids = np.repeat(np.arange(7), [50, 3, 120, 1, 64, 80, 9])
+    sampler = vak.datasets.samplers.FileLocalitySampler(spect_ids, windows_per_file=8, num_samples=num_samples)
+    inds = list(sampler)
+    assert len(inds) == len(sampler) == num_samples
+    counts = np.bincount(inds, minlength=spect_ids.shape[-1])
+    assert counts.max() - counts.min() <= 1
+
+
+@pytest.mark.parametrize(
+    'max_windows',
+    [
+        1,
+        16,
+        64,
+    ]
+)
+def test_window_packing_batch_sampler(max_windows):
+    n_windows = np.random.randint(1, 20, size=57)
+    sampler = vak.datasets.samplers.WindowPackingBatchSampler(n_windows, max_windows)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    # items stay in order
+    assert [ind for batch in batches for ind in batch] == list(range(n_windows.shape[-1]))
+    for batch in batches:
+        # only an item with more windows than max_windows is in a batch with more windows
+        assert n_windows[batch].sum() <= max_windows or len(batch) == 1
+    # each batch is as full as it can be without going over max_windows
+    for batch, next_batch in zip(batches[:-1], batches[1:]):
+        assert n_windows[batch].sum() + n_windows[next_batch[0]] > max_windows
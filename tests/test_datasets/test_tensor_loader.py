@@ -0,0 +1,63 @@
+"""tests for ``vak.datasets.tensor_loader`` module"""
+import numpy as np
+import pytest
+import torch
+
+import vak.datasets.samplers
+from vak.datasets.tensor_loader import WindowTensorLoader
+
+
+N_TIMEBINS = 300
+N_FREQBINS = 8
+WINDOW_SIZE = 20
+
+
+@pytest.mark.parametrize(
+    'batch_size, shuffle, drop_last',
+    [
+        (16, False, False),
+        (16, True, False),
+        (16, True, True),
+        (1000, True, False),
+    ]
+)
+def test_window_tensor_loader(batch_size, shuffle, drop_last):
+    spects = torch.rand(N_TIMEBINS, N_FREQBINS)
+    lbl_tb = torch.randint(0, 4, (N_TIMEBINS,))
+    window_starts = torch.arange(0, N_TIMEBINS - WINDOW_SIZE + 1, 3)
+    loader = WindowTensorLoader(spects, lbl_tb, window_starts, WINDOW_SIZE, batch_size,
+                                shuffle=shuffle, drop_last=drop_last)
+
+    batches = list(loader)
+    assert len(batches) == len(loader)
+    n_windows = sum([windows.shape[0] for windows, _ in batches])
+    if drop_last:
+        assert n_windows == (window_starts.shape[-1] // batch_size) * batch_size
+    else:
+        assert n_windows == window_starts.shape[-1]
+
+    for windows, labelvecs in batches:
+        assert windows.shape[1:] == (1, N_FREQBINS, WINDOW_SIZE)
+        assert labelvecs.shape[1:] == (WINDOW_SIZE,)
+        for window, labelvec in zip(windows, labelvecs):
+            # find start of window from its labels and values, and check it against source tensors
+            matches = [start for start in window_starts.tolist()
+                       if torch.equal(spects[start:start + WINDOW_SIZE].T, window[0])]
+            assert len(matches) == 1
+            assert torch.equal(lbl_tb[matches[0]:matches[0] + WINDOW_SIZE], labelvec)
+
+    if not shuffle:
+        assert torch.equal(batches[0][0][0, 0], spects[:WINDOW_SIZE].T)
+
+
+def test_window_tensor_loader_sampler():
+    spects = torch.rand(N_TIMEBINS, N_FREQBINS)
+    lbl_tb = torch.arange(N_TIMEBINS)
+    window_starts = torch.arange(N_TIMEBINS - WINDOW_SIZE + 1)
+    sampler = vak.datasets.samplers.FileLocalitySampler(np.zeros(window_starts.shape[-1]), windows_per_file=4)
+    loader = WindowTensorLoader(spects, lbl_tb, window_starts, WINDOW_SIZE, batch_size=10, sampler=sampler)
+
+    torch.manual_seed(0)
+    starts = torch.cat([labelvecs[:, 0] for _, labelvecs in loader])
+    torch.manual_seed(0)
+    assert torch.equal(starts, torch.as_tensor(list(sampler)))
@@ -0,0 +1,420 @@
+"""tests for ``vak.datasets.window_dataset`` module"""
+import os
+import pickle
+
+import crowsetta
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+import vak.datasets.annot_arrays
+import vak.datasets.cache
+import vak.datasets.tensor_loader
+import vak.files.spect
+import vak.io.dataframe
+import vak.io.window_store
+import vak.labeled_timebins
+import vak.labels
+import vak.transforms
+from vak.datasets.window_dataset import WindowDataset
+
+
+TIMEBIN_DUR = 0.002
+N_FREQBINS = 8
+
+
+@pytest.fixture
+def windowdataset_args(tmp_path):
+    """makes a small dataset of spectrogram files and annotations,
+    and returns the arguments needed to initialize a WindowDataset from it"""
+    rng = np.random.default_rng(42)
+    spect_paths = []
+    annots = []
+    for file_num, n_timebins in enumerate((150, 97, 212)):
+        t = np.arange(n_timebins) * TIMEBIN_DUR + TIMEBIN_DUR / 2
+        s = rng.random((N_FREQBINS, n_timebins))
+        spect_path = tmp_path / f'{file_num}.spect.npz'
+        np.savez(spect_path, s=s, t=t)
+        spect_paths.append(str(spect_path))
+
+        onsets_s = np.array([0.02, 0.1, 0.16])[:n_timebins // 60 + 1]
+        offsets_s = onsets_s + 0.03
+        labels = np.array(['a', 'b', 'c'])[:onsets_s.shape[-1]]
+        seq = crowsetta.Sequence.from_keyword(labels=labels, onsets_s=onsets_s, offsets_s=offsets_s)
+        annots.append(crowsetta.Annotation(annot_path='annot.csv', audio_path=spect_path, seq=seq))
+
+    labelmap = vak.labels.to_map(set('abc'), map_unlabeled=True)
+    return spect_paths, annots, labelmap
+
+
+def _window_dataset(spect_paths, annots, labelmap, window_size, **kwargs):
+    spect_id_vector, spect_inds_vector, x_inds = [], [], []
+    total_tb = 0
+    for ind, spect_path in enumerate(spect_paths):
+        n_tb_spect = WindowDataset.n_time_bins_spect(spect_path)
+        spect_id_vector.append(np.ones((n_tb_spect,), dtype=np.int64) * ind)
+        spect_inds_vector.append(np.arange(n_tb_spect))
+        x_inds.append(np.arange(total_tb, total_tb + n_tb_spect - window_size + 1))
+        total_tb += n_tb_spect
+    return WindowDataset('dummy.csv',
+                         np.concatenate(x_inds),
+                         np.concatenate(spect_id_vector),
+                         np.concatenate(spect_inds_vector),
+                         np.array(spect_paths),
+                         annots,
+                         labelmap,
+                         TIMEBIN_DUR,
+                         window_size,
+                         **kwargs)
+
+
+def test_window_labelvec_matches_label_timebins(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size)
+
+    for idx in range(len(dataset)):
+        window, labelvec = dataset[idx]
+        spect_id, start = dataset.window_index[idx]
+        annot = annots[spect_id]
+        spect_dict = vak.files.spect.load(spect_paths[spect_id])
+        expected_lbl_tb = vak.labeled_timebins.label_timebins([labelmap[lbl] for lbl in annot.seq.labels],
+                                                              annot.seq.onsets_s,
+                                                              annot.seq.offsets_s,
+                                                              spect_dict['t'],
+                                                              unlabeled_label=labelmap['unlabeled'])
+        assert np.array_equal(window, spect_dict['s'][:, start:start + window_size])
+        assert np.array_equal(labelvec, expected_lbl_tb[start:start + window_size])
+
+
+def test_to_vectors(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size)
+    spect_id_vector, spect_inds_vector, x_inds = dataset.to_vectors()
+    assert x_inds.shape[-1] == len(dataset)
+    spect_ids, window_start_inds = dataset.window_index[np.arange(len(dataset))]
+    assert np.array_equal(spect_id_vector[x_inds], spect_ids)
+    assert np.array_equal(spect_inds_vector[x_inds], window_start_inds)
+
+
+def test_lbl_tb_from_annots(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    lbl_tb, spect_offsets = WindowDataset.lbl_tb_from_annots(spect_paths, annots, labelmap)
+
+    n_timebins = [WindowDataset.n_time_bins_spect(spect_path) for spect_path in spect_paths]
+    assert lbl_tb.shape == (sum(n_timebins),)
+    assert np.array_equal(spect_offsets, [0, n_timebins[0], n_timebins[0] + n_timebins[1]])
+
+
+def test_lbl_tb_from_annots_timebin_bounds(windowdataset_args, monkeypatch):
+    spect_paths, annots, labelmap = windowdataset_args
+    # onsets and offsets in annotations are halfway between time bins
+    expected_lbl_tb, expected_spect_offsets = WindowDataset.lbl_tb_from_annots(spect_paths, annots, labelmap)
+
+    timebins = [vak.files.spect.load(spect_path)['t'] for spect_path in spect_paths]
+    df = pd.DataFrame({'spect_path': spect_paths,
+                       'n_timebins': [t.shape[-1] for t in timebins],
+                       'first_timebin': [t[0] for t in timebins],
+                       'last_timebin': [t[-1] for t in timebins]})
+    n_timebins = WindowDataset.n_time_bins_from_df(df)
+    timebin_bounds = vak.io.dataframe.timebin_bounds_from_df(df)
+
+    def _load(*args, **kwargs):
+        raise AssertionError('spectrogram file was opened')
+
+    monkeypatch.setattr(vak.files.spect, 'load', _load)
+    lbl_tb, spect_offsets = WindowDataset.lbl_tb_from_annots(spect_paths, annots, labelmap,
+                                                             n_timebins=n_timebins,
+                                                             timebin_bounds=timebin_bounds)
+    assert np.array_equal(lbl_tb, expected_lbl_tb)
+    assert np.array_equal(spect_offsets, expected_spect_offsets)
+
+    dataset = WindowDataset('dummy.csv', None, None, None, np.array(spect_paths), annots, labelmap,
+                            TIMEBIN_DUR, 44,
+                            window_index=WindowDataset.window_index_from_df(df, 44),
+                            n_timebins=n_timebins, timebin_bounds=timebin_bounds)
+    assert np.array_equal(dataset.lbl_tb, expected_lbl_tb)
+
+    # only spectrograms without first and last time bin are loaded
+    monkeypatch.undo()
+    loaded = []
+
+    def _load_and_record(spect_path, *args, **kwargs):
+        loaded.append(spect_path)
+        return np.load(spect_path)
+
+    monkeypatch.setattr(vak.files.spect, 'load', _load_and_record)
+    timebin_bounds[1] = np.nan
+    lbl_tb, _ = WindowDataset.lbl_tb_from_annots(spect_paths, annots, labelmap,
+                                                 n_timebins=n_timebins,
+                                                 timebin_bounds=timebin_bounds)
+    assert loaded == [spect_paths[1]]
+    assert np.array_equal(lbl_tb, expected_lbl_tb)
+
+
+def test_n_time_bins_from_df(windowdataset_args):
+    spect_paths, _, _ = windowdataset_args
+    df = pd.DataFrame({'spect_path': spect_paths})
+    expected = [150, 97, 212]
+    # without 'n_timebins' column, gets number of time bins from files
+    assert np.array_equal(WindowDataset.n_time_bins_from_df(df), expected)
+    # with 'n_timebins' column, uses that instead of opening files
+    df['n_timebins'] = [1, 2, 3]
+    assert np.array_equal(WindowDataset.n_time_bins_from_df(df), [1, 2, 3])
+
+
+def test_crop_spect_vectors_keep_classes_silence():
+    """test cropping by removing silent gaps, the branch that
+    builds a mask from unlabeled segments"""
+    labelmap = {'unlabeled': 0, 'a': 1, 'b': 2}
+    # 'a' only at start and 'b' only at end, so we can't crop from either end
+    lbl_tb = np.concatenate([np.full(5, 1), np.zeros(50), np.full(5, 1), np.zeros(50), np.full(5, 2)]).astype(int)
+    window_size = 10
+    n_timebins = lbl_tb.shape[-1]
+    spect_id_vector = np.zeros(n_timebins, dtype=np.int64)
+    spect_inds_vector = np.arange(n_timebins)
+    x_inds = np.arange(n_timebins)
+    x_inds[-window_size:] = WindowDataset.INVALID_WINDOW_VAL
+    crop_dur = (n_timebins - 40) * TIMEBIN_DUR
+
+    (_, _, x_inds_cropped) = WindowDataset.crop_spect_vectors_keep_classes(lbl_tb,
+                                                                           spect_id_vector,
+                                                                           spect_inds_vector,
+                                                                           x_inds.copy(),
+                                                                           crop_dur,
+                                                                           TIMEBIN_DUR,
+                                                                           labelmap,
+                                                                           window_size)
+    newly_ignored = ((x_inds_cropped == WindowDataset.INVALID_WINDOW_VAL)
+                     & (x_inds != WindowDataset.INVALID_WINDOW_VAL))
+    assert np.any(newly_ignored)
+    # only unlabeled bins get ignored
+    assert np.all(lbl_tb[newly_ignored] == labelmap['unlabeled'])
+
+
+@pytest.mark.parametrize(
+    'lbl_tb',
+    [
+        np.array([0, 1, 1, 2, 3]),
+        np.array([0, 1, 1, 3]),
+        np.array([1, 1, 2, 3, 0, 4]),
+        np.array([], dtype=np.int64),
+    ]
+)
+def test_has_all_classes(lbl_tb):
+    classes = np.arange(4)
+    expected = np.array_equal(np.unique(lbl_tb), classes)
+    assert WindowDataset._has_all_classes(lbl_tb, classes) == expected
+
+
+def test_mask_from_segments():
+    mask = WindowDataset._mask_from_segments([0, 5, 8, 3], [2, 7, 6, 3], 10)
+    expected = np.zeros(10, dtype=bool)
+    expected[0:2] = True
+    expected[5:7] = True
+    assert np.array_equal(mask, expected)
+
+
+def test_shape(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    transform = vak.transforms.get_defaults('train')[0]
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size, transform=transform)
+    # shape is not determined until it is accessed
+    assert dataset._shape is None
+    window, _ = dataset[0]
+    assert dataset.shape == tuple(window.shape)
+
+    # with n_freqbins, shape is determined without loading a window
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size,
+                              transform=transform, n_freqbins=N_FREQBINS)
+    assert dataset.shape == tuple(window.shape)
+
+
+def test_window_stride(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size)
+    strided = _window_dataset(spect_paths, annots, labelmap, window_size, window_stride=10)
+    assert len(strided) < len(dataset)
+    assert np.array_equal(strided.to_vectors()[2], dataset.window_index.strided(10).to_vectors()[2])
+    window, labelvec = strided[1]
+    expected_window, expected_labelvec = dataset[10]
+    assert np.array_equal(window, expected_window)
+    assert np.array_equal(labelvec, expected_labelvec)
+
+
+def test_random_window_offset_set_epoch(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    np.random.seed(0)
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size,
+                              window_stride=10, random_window_offset=True)
+    epoch_starts = [dataset.window_index.x_ind(np.arange(len(dataset)))]
+    for epoch in range(1, 4):
+        dataset.set_epoch(epoch)
+        epoch_starts.append(dataset.window_index.x_ind(np.arange(len(dataset))))
+
+    # same number of windows every epoch, all valid starts, but different starts
+    assert all([starts.shape == epoch_starts[0].shape for starts in epoch_starts])
+    valid_starts = dataset._unstrided_window_index.x_ind(np.arange(len(dataset._unstrided_window_index)))
+    assert all([np.all(np.isin(starts, valid_starts)) for starts in epoch_starts])
+    assert len({tuple(starts.tolist()) for starts in epoch_starts}) > 1
+
+    # windows for an epoch are the ones that start at that epoch's starts
+    window, labelvec = dataset[1]
+    expected_labelvec = dataset.lbl_tb[epoch_starts[-1][1]:epoch_starts[-1][1] + window_size]
+    assert np.array_equal(labelvec, expected_labelvec)
+
+    # loader made from preloaded dataset gets new windows every epoch too
+    dataset.preload()
+    loader = vak.datasets.tensor_loader.WindowTensorLoader.from_dataset(dataset, batch_size=8, shuffle=False)
+    loader_starts = []
+    for epoch in range(1, 4):
+        loader.set_epoch(epoch)
+        assert loader.window_starts.shape[-1] == len(dataset)
+        loader_starts.append(tuple(loader.window_starts.tolist()))
+    assert len(set(loader_starts)) > 1
+
+
+def test_set_epoch_without_random_offset(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    dataset = _window_dataset(spect_paths, annots, labelmap, 44, window_stride=10)
+    window_index = dataset.window_index
+    dataset.set_epoch(2)
+    assert dataset.window_index is window_index
+
+
+@pytest.mark.parametrize(
+    'use_window_store',
+    [False, True]
+)
+def test_preload(windowdataset_args, tmp_path, use_window_store):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size)
+
+    if use_window_store:
+        df = pd.DataFrame({'spect_path': spect_paths, 'split': 'train'})
+        df = vak.io.window_store.to_window_store(df, tmp_path / 'store.npy')
+        window_store_path, window_store_offsets = vak.io.window_store.from_df(df)
+        preloaded = _window_dataset(spect_paths, annots, labelmap, window_size,
+                                    window_store_path=window_store_path,
+                                    window_store_offsets=window_store_offsets)
+    else:
+        preloaded = _window_dataset(spect_paths, annots, labelmap, window_size)
+    # too big for memory budget
+    assert preloaded.preload(max_mb=0) is False
+    assert preloaded.preloaded is False
+
+    assert preloaded.preload() is True
+    assert preloaded.window_store.shape == (sum([150, 97, 212]), N_FREQBINS)
+    inds = np.arange(len(dataset))
+    windows, labelvecs = preloaded[inds]
+    expected_windows, expected_labelvecs = dataset[inds]
+    assert np.allclose(windows, expected_windows)
+    assert np.array_equal(labelvecs, expected_labelvecs)
+
+    # preloaded array is pickled, e.g. to DataLoader workers
+    unpickled = pickle.loads(pickle.dumps(preloaded))
+    assert np.array_equal(unpickled.window_store, preloaded.window_store)
+
+
+def test_window_dataset_window_store(windowdataset_args, tmp_path):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    df = pd.DataFrame({'spect_path': spect_paths, 'split': 'train'})
+    df = vak.io.window_store.to_window_store(df, tmp_path / 'store.npy')
+    window_store_path, window_store_offsets = vak.io.window_store.from_df(df)
+
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size)
+    store_dataset = _window_dataset(spect_paths, annots, labelmap, window_size,
+                                    window_store_path=window_store_path,
+                                    window_store_offsets=window_store_offsets)
+    for idx in range(len(dataset)):
+        window, labelvec = dataset[idx]
+        store_window, store_labelvec = store_dataset[idx]
+        assert np.allclose(store_window, window.astype(np.float32))
+        assert np.array_equal(store_labelvec, labelvec)
+
+    unpickled = pickle.loads(pickle.dumps(store_dataset))
+    assert unpickled._window_store is None
+    assert np.array_equal(unpickled[0][0], store_dataset[0][0])
+
+
+@pytest.mark.parametrize(
+    'use_window_store',
+    [False, True]
+)
+def test_window_dataset_batch(windowdataset_args, tmp_path, use_window_store):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    kwargs = {}
+    if use_window_store:
+        df = pd.DataFrame({'spect_path': spect_paths, 'split': 'train'})
+        df = vak.io.window_store.to_window_store(df, tmp_path / 'store.npy')
+        kwargs['window_store_path'], kwargs['window_store_offsets'] = vak.io.window_store.from_df(df)
+    spect_standardizer = vak.transforms.StandardizeSpect.fit_df(pd.DataFrame({'spect_path': spect_paths}))
+    transform, target_transform = vak.transforms.get_defaults('train', spect_standardizer)
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size,
+                              transform=transform, target_transform=target_transform, **kwargs)
+
+    idx = [5, 300, 0, 120, 7, 301, len(dataset) - 1]
+    windows, labelvecs = dataset[idx]
+    assert windows.shape == (len(idx), 1, N_FREQBINS, window_size)
+    assert labelvecs.shape == (len(idx), window_size)
+    for batch_ind, dataset_ind in enumerate(idx):
+        window, labelvec = dataset[dataset_ind]
+        assert torch.allclose(windows[batch_ind], window)
+        assert torch.equal(labelvecs[batch_ind], labelvec)
+
+    items = dataset.__getitems__(idx)
+    assert len(items) == len(idx)
+    assert torch.allclose(items[1][0], windows[1])
+
+    data = torch.utils.data.DataLoader(dataset,
+                                       sampler=torch.utils.data.BatchSampler(
+                                           torch.utils.data.SequentialSampler(dataset), batch_size=8, drop_last=False
+                                       ),
+                                       batch_size=None)
+    n_windows = 0
+    for windows, labelvecs in data:
+        assert windows.shape[1:] == (1, N_FREQBINS, window_size)
+        n_windows += windows.shape[0]
+    assert n_windows == len(dataset)
+
+
+def test_load_spect_error_cancels_shared_cache(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    with vak.datasets.cache.SharedSpectCache(max_bytes=2 ** 20, n_keys=len(spect_paths)) as spect_cache:
+        dataset = _window_dataset(spect_paths, annots, labelmap, 44, spect_cache=spect_cache)
+        os.remove(spect_paths[0])
+        with pytest.raises(FileNotFoundError):
+            dataset._load_spect(0)
+        # key is not left 'loading', where other processes would wait for it
+        assert spect_cache._index['state'][0] == spect_cache.EMPTY
+
+
+def test_pickle_is_compact(windowdataset_args):
+    spect_paths, annots, labelmap = windowdataset_args
+    window_size = 44
+    dataset = _window_dataset(spect_paths, annots, labelmap, window_size)
+    assert isinstance(dataset.annots, vak.datasets.annot_arrays.AnnotArrays)
+    for annot, annot_view in zip(annots, dataset.annots):
+        assert np.array_equal(annot.seq.labels, annot_view.seq.labels)
+        assert np.array_equal(annot.seq.onsets_s, annot_view.seq.onsets_s)
+
+    state = dataset.__getstate__()
+    # labeled timebins are pickled as segments, not one label per time bin
+    assert state['_lbl_tb'] is None
+    assert state['_lbl_tb_segments'][0].shape[-1] < dataset.lbl_tb.shape[-1]
+
+    unpickled = pickle.loads(pickle.dumps(dataset))
+    assert np.array_equal(unpickled.lbl_tb, dataset.lbl_tb)
+    inds = np.arange(len(dataset))
+    windows, labelvecs = unpickled[inds]
+    expected_windows, expected_labelvecs = dataset[inds]
+    assert np.array_equal(windows, expected_windows)
+    assert np.array_equal(labelvecs, expected_labelvecs)
@@ -0,0 +1,135 @@
+"""tests for ``vak.datasets.window_index`` module"""
+import numpy as np
+import pytest
+
+from vak.datasets.window_index import WindowIndex
+
+
+def spect_vectors(n_timebins_per_spect, window_size):
+    """make spect_id_vector, spect_inds_vector, and x_inds
+    the same way WindowDataset.spect_vectors_from_df does"""
+    spect_id_vector, spect_inds_vector, x_inds = [], [], []
+    total_tb = 0
+    for ind, n_tb_spect in enumerate(n_timebins_per_spect):
+        spect_id_vector.append(np.ones((n_tb_spect,), dtype=np.int64) * ind)
+        spect_inds_vector.append(np.arange(n_tb_spect))
+        valid_x_inds = np.arange(total_tb, total_tb + n_tb_spect)
+        valid_x_inds[valid_x_inds > total_tb + n_tb_spect - window_size] = -1
+        x_inds.append(valid_x_inds)
+        total_tb += n_tb_spect
+    x_inds = np.concatenate(x_inds)
+    return np.concatenate(spect_id_vector), np.concatenate(spect_inds_vector), x_inds[x_inds != -1]
+
+
+N_TIMEBINS_PER_SPECT = [50, 3, 120, 10, 64]
+WINDOW_SIZE = 10
+
+
+def cropped_spect_vectors():
+    """vectors cropped from the front and with silent gaps removed from x_inds,
+    like those made by WindowDataset.crop_spect_vectors_keep_classes"""
+    spect_id_vector, spect_inds_vector, x_inds = spect_vectors(N_TIMEBINS_PER_SPECT, WINDOW_SIZE)
+    spect_id_vector, spect_inds_vector = spect_id_vector[20:], spect_inds_vector[20:]
+    x_inds = x_inds[x_inds >= 20] - 20
+    x_inds = x_inds[(x_inds < 60) | (x_inds > 90)]
+    return spect_id_vector, spect_inds_vector, x_inds
+
+
+@pytest.mark.parametrize(
+    'vectors',
+    [
+        spect_vectors(N_TIMEBINS_PER_SPECT, WINDOW_SIZE),
+        cropped_spect_vectors(),
+    ]
+)
+def test_window_index_from_vectors(vectors):
+    spect_id_vector, spect_inds_vector, x_inds = vectors
+    window_index = WindowIndex.from_vectors(spect_id_vector, spect_inds_vector, x_inds)
+    assert len(window_index) == x_inds.shape[-1]
+    assert window_index.n_timebins == spect_id_vector.shape[-1]
+
+    for returned, expected in zip(window_index.to_vectors(), vectors):
+        assert np.array_equal(returned, expected)
+
+    spect_ids, window_start_inds = window_index[np.arange(len(window_index))]
+    assert np.array_equal(spect_ids, spect_id_vector[x_inds])
+    assert np.array_equal(window_start_inds, spect_inds_vector[x_inds])
+    spect_id, window_start_ind = window_index[7]
+    assert spect_id == spect_id_vector[x_inds[7]]
+    assert window_start_ind == spect_inds_vector[x_inds[7]]
+
+
+def test_window_index_from_spect_lens():
+    window_index = WindowIndex.from_spect_lens(N_TIMEBINS_PER_SPECT, WINDOW_SIZE)
+    assert window_index == WindowIndex.from_vectors(*spect_vectors(N_TIMEBINS_PER_SPECT, WINDOW_SIZE))
+    # one segment per spectrogram, and one run of windows per spectrogram long enough to have windows
+    assert window_index.segment_offsets.shape[-1] == len(N_TIMEBINS_PER_SPECT)
+    assert window_index.run_offsets.shape[-1] == len(N_TIMEBINS_PER_SPECT) - 1
+
+
+def test_window_index_save_load(tmp_path):
+    window_index = WindowIndex.from_vectors(*cropped_spect_vectors())
+    window_index_path = tmp_path / 'window_index.npz'
+    window_index.save(window_index_path)
+    assert WindowIndex.load(window_index_path) == window_index
+
+
+@pytest.mark.parametrize(
+    'vectors, stride',
+    [
+        (spect_vectors(N_TIMEBINS_PER_SPECT, WINDOW_SIZE), 1),
+        (spect_vectors(N_TIMEBINS_PER_SPECT, WINDOW_SIZE), 4),
+        (cropped_spect_vectors(), 3),
+        (cropped_spect_vectors(), 200),
+    ]
+)
+def test_window_index_strided(vectors, stride):
+    spect_id_vector, spect_inds_vector, x_inds = vectors
+    window_index = WindowIndex.from_vectors(spect_id_vector, spect_inds_vector, x_inds)
+    strided = window_index.strided(stride)
+
+    # expected: every ``stride``-th window start in each run of consecutive starts
+    run_id = np.cumsum(np.concatenate(([True], x_inds[1:] != x_inds[:-1] + 1))) - 1
+    run_first = np.concatenate(([0], np.flatnonzero(np.diff(run_id)) + 1))
+    ind_in_run = np.arange(x_inds.shape[-1]) - run_first[run_id]
+    expected_x_inds = x_inds[ind_in_run % stride == 0]
+
+    assert len(strided) == expected_x_inds.shape[-1]
+    assert np.array_equal(strided.to_vectors()[2], expected_x_inds)
+    spect_ids, window_start_inds = strided[np.arange(len(strided))]
+    assert np.array_equal(spect_ids, spect_id_vector[expected_x_inds])
+    assert np.array_equal(window_start_inds, spect_inds_vector[expected_x_inds])
+
+
+def test_window_index_strided_random_offset():
+    spect_id_vector, spect_inds_vector, x_inds = cropped_spect_vectors()
+    window_index = WindowIndex.from_vectors(spect_id_vector, spect_inds_vector, x_inds)
+    np.random.seed(42)
+    strided = window_index.strided(5, random_offset=True)
+    strided_x_inds = strided.to_vectors()[2]
+    # every window start is still a valid start, and they are 5 apart within each run
+    assert np.all(np.isin(strided_x_inds, x_inds))
+    run = np.searchsorted(strided.run_offsets, np.arange(len(strided)), side='right') - 1
+    same_run = run[1:] == run[:-1]
+    assert np.all(np.diff(strided_x_inds)[same_run] == 5)
+    assert len(strided) <= len(window_index.strided(5))
+    # same number of windows for any random offsets
+    assert all([len(window_index.strided(5, random_offset=True)) == len(strided) for _ in range(10)])
+
+
+def test_window_index_out_of_range():
+    window_index = WindowIndex.from_vectors(*cropped_spect_vectors())
+    n_windows = len(window_index)
+    # negative indices count from the end
+    assert window_index[-1] == window_index[n_windows - 1]
+    spect_ids, window_start_inds = window_index[np.array([-n_windows, -1])]
+    expected_spect_ids, expected_window_start_inds = window_index[np.array([0, n_windows - 1])]
+    assert np.array_equal(spect_ids, expected_spect_ids)
+    assert np.array_equal(window_start_inds, expected_window_start_inds)
+
+    for idx in (n_windows, n_windows + 5, -n_windows - 1,
+                np.array([0, n_windows]), np.array([-n_windows - 1, 3])):
+        with pytest.raises(IndexError):
+            window_index[idx]
+        with pytest.raises(IndexError):
+            window_index.x_ind(idx)
@@ -0,0 +1,211 @@
+"""tests for vak.engine.model module"""
+import numpy as np
+import pytest
+import torch
+
+from vak.engine.model import Model
+
+
+N_FREQBINS = 6
+N_CLASSES = 4
+WINDOW_SIZE = 10
+
+
+class TimebinNet(torch.nn.Module):
+    """tiny network that classifies each time bin from its frequency bins alone,
+    so outputs for one time bin do not depend on any other time bin"""
+    def __init__(self):
+        super().__init__()
+        self.conv = torch.nn.Conv2d(1, N_CLASSES, kernel_size=(N_FREQBINS, 1))
+
+    def forward(self, x):
+        # (batch, channel, freq, time) -> (batch, classes, time)
+        return torch.squeeze(self.conv(x), dim=2)
+
+
+def _model(lr=0.):
+    torch.manual_seed(42)
+    network = TimebinNet()
+    return Model(network=network,
+                 loss=torch.nn.CrossEntropyLoss(),
+                 optimizer=torch.optim.SGD(network.parameters(), lr=lr),
+                 metrics={})
+
+
+def _pred_batch(spect_path, n_windows, n_padded):
+    """batch in the format returned by a DataLoader with batch size 1
+    from a VocalDataset with PredictItemTransform"""
+    source = torch.rand(1, n_windows, 1, N_FREQBINS, WINDOW_SIZE)
+    padding_mask = torch.ones(1, n_windows * WINDOW_SIZE, dtype=torch.bool)
+    padding_mask[:, n_windows * WINDOW_SIZE - n_padded:] = False
+    return {'source': source, 'padding_mask': padding_mask, 'spect_path': [spect_path]}
+
+
+@pytest.fixture
+def pred_data(tmp_path):
+    torch.manual_seed(0)
+    # same file name in different directories
+    return [
+        _pred_batch(str(tmp_path / 'bird1' / 'song.spect.npz'), 3, 4),
+        _pred_batch(str(tmp_path / 'bird2' / 'song.spect.npz'), 5, 7),
+    ]
+
+
+def test_predict_output_labels(pred_data):
+    model = _model()
+    logits = model.predict(pred_data, device='cpu')
+    labels = model.predict(pred_data, device='cpu', output='labels')
+    assert list(labels.keys()) == list(logits.keys())
+    for batch in pred_data:
+        spect_path = batch['spect_path'][0]
+        padding_mask = batch['padding_mask'][0].numpy()
+        expected = torch.flatten(torch.argmax(logits[spect_path], dim=1)).numpy()[padding_mask]
+        assert isinstance(labels[spect_path], np.ndarray)
+        assert labels[spect_path].dtype == np.uint8
+        assert np.array_equal(labels[spect_path], expected)
+
+
+def test_predict_output_probs(pred_data, tmp_path):
+    model = _model()
+    logits = model.predict(pred_data, device='cpu')
+    probs_dir = tmp_path / 'probs'
+    probs_dir.mkdir()
+    probs = model.predict(pred_data, device='cpu', output='probs', probs_dir=probs_dir)
+
+    # one file per spectrogram, even though they have the same name
+    assert sorted([path.name for path in probs_dir.iterdir()]) == [
+        Model.probs_filename(spect_ind, batch['spect_path'][0]) for spect_ind, batch in enumerate(pred_data)
+    ]
+    for spect_ind, batch in enumerate(pred_data):
+        spect_path = batch['spect_path'][0]
+        padding_mask = batch['padding_mask'][0].numpy()
+        assert isinstance(probs[spect_path], np.memmap)
+        assert probs[spect_path].dtype == np.float16
+        assert probs[spect_path].shape == (N_CLASSES, padding_mask.sum())
+        expected = torch.softmax(logits[spect_path], dim=1).transpose(0, 1).reshape(N_CLASSES, -1).numpy()
+        assert np.allclose(probs[spect_path], expected[:, padding_mask], atol=1e-3)
+        saved = np.load(probs_dir / Model.probs_filename(spect_ind, spect_path), mmap_mode='r')
+        assert np.array_equal(saved, probs[spect_path])
+
+
+def test_predict_batches_output(pred_data, tmp_path):
+    model = _model()
+    labels = model.predict(pred_data, device='cpu', output='labels')
+    for batch, y_pred in model.predict_batches(pred_data, device='cpu', output='labels'):
+        assert np.array_equal(y_pred, labels[batch['spect_path'][0]])
+
+    with pytest.raises(ValueError):
+        next(model.predict_batches(pred_data, device='cpu', output='probs'))
+
+
+@pytest.mark.parametrize(
+    'n_windows, max_windows_per_batch',
+    [
+        (7, 3),  # last chunk has only one window
+        (10, 4),
+        (5, 5),
+        (2, 8),
+    ]
+)
+def test_forward_windows_chunked(n_windows, max_windows_per_batch):
+    model = _model()
+    model.device = 'cpu'
+    x = torch.rand(n_windows, 1, N_FREQBINS, WINDOW_SIZE)
+    with torch.no_grad():
+        expected = model.network(x)
+        model.max_windows_per_batch = max_windows_per_batch
+        out = model._forward_windows(x)
+    assert out.shape == expected.shape
+    assert torch.allclose(out, expected, atol=1e-6)
+
+
+def test_predict_max_windows_per_batch(pred_data):
+    model = _model()
+    expected = model.predict(pred_data, device='cpu')
+    # 3 and 5 windows in batches, so the last chunk of each is partial
+    chunked = model.predict(pred_data, device='cpu', max_windows_per_batch=2)
+    for spect_path, y_pred in expected.items():
+        assert torch.allclose(chunked[spect_path], y_pred, atol=1e-6)
+
+
+class RecordingLoss(torch.nn.CrossEntropyLoss):
+    """loss that keeps the last value it computed, so tests can inspect it"""
+    def forward(self, input, target):
+        loss = super().forward(input, target)
+        self.last = loss.detach().clone()
+        return loss
+
+
+def test_train_padded_batch_ignores_padding():
+    lengths = [12, 7]
+    max_len = max(lengths)
+    torch.manual_seed(1)
+    source = torch.rand(len(lengths), 1, N_FREQBINS, max_len)
+    annot = torch.randint(0, N_CLASSES, (len(lengths), max_len))
+    padding_mask = torch.zeros(len(lengths), max_len, dtype=torch.bool)
+    for ind, length in enumerate(lengths):
+        padding_mask[ind, :length] = True
+
+    # expected loss and gradients: computed on each item without any padding
+    model = _model()
+    model.loss = RecordingLoss()
+    out = torch.cat([model.network(source[ind:ind + 1, ..., :length]) for ind, length in enumerate(lengths)],
+                    dim=2)
+    y = torch.cat([annot[ind:ind + 1, :length] for ind, length in enumerate(lengths)], dim=1)
+    expected_loss = model.loss(out, y)
+    expected_loss.backward()
+    expected_grads = [param.grad.clone() for param in model.network.parameters()]
+
+    # padding with different values should not change loss or gradients
+    for pad_value in (0., 100.):
+        padded_source = source.clone()
+        padded_annot = annot.clone()
+        for ind, length in enumerate(lengths):
+            padded_source[ind, ..., length:] = pad_value
+        padded_annot[~padding_mask] = N_CLASSES - 1
+        batch = {'source': padded_source, 'annot': padded_annot, 'padding_mask': padding_mask}
+
+        model = _model()  # learning rate is 0, so parameters are not changed by optimizer step
+        model.loss = RecordingLoss()
+        model.device = 'cpu'
+        model._train([batch], epoch=1, ckpt_step=1000)
+        assert torch.allclose(model.loss.last, expected_loss.detach(), atol=1e-6)
+        for param, expected_grad in zip(model.network.parameters(), expected_grads):
+            assert torch.allclose(param.grad, expected_grad, atol=1e-6)
+
+    # annotations are not modified in place when padding is masked
+    assert torch.all(batch['annot'][~padding_mask] == N_CLASSES - 1)
+
+
+def test_train_padded_batch_requires_ignore_index():
+    model = _model()
+    model.loss = lambda y_pred, y: torch.nn.functional.cross_entropy(y_pred, y)
+    model.device = 'cpu'
+    batch = {'source': torch.rand(1, 1, N_FREQBINS, WINDOW_SIZE),
+             'annot': torch.zeros(1, WINDOW_SIZE, dtype=torch.int64),
+             'padding_mask': torch.ones(1, WINDOW_SIZE, dtype=torch.bool)}
+    with pytest.raises(ValueError):
+        model._train([batch], epoch=1, ckpt_step=1000)
+
+
+class EpochDataset(torch.utils.data.Dataset):
+    """dataset that records the epochs passed to its ``set_epoch`` method"""
+    def __init__(self):
+        self.epochs = []
+
+    def set_epoch(self, epoch):
+        self.epochs.append(epoch)
+
+    def __getitem__(self, idx):
+        return torch.rand(1, N_FREQBINS, WINDOW_SIZE), torch.zeros(WINDOW_SIZE, dtype=torch.int64)
+
+    def __len__(self):
+        return 4
+
+
+def test_train_calls_set_epoch(tmp_path):
+    dataset = EpochDataset()
+    train_data = torch.utils.data.DataLoader(dataset, batch_size=2)
+    model = _model()
+    model.fit(train_data, num_epochs=3, ckpt_root=tmp_path, ckpt_step=1000, device='cpu')
+    assert dataset.epochs == [1, 2, 3]
@@ -1,7 +1,9 @@
 """tests for vak.files.spect module"""
 from pathlib import Path
 
+import numpy as np
 import pytest
+from scipy.io import savemat
 
 import vak.files
 from vak.constants import VALID_AUDIO_FORMATS
@@ -25,3 +27,52 @@ def test_find_audio_fname_with_mat(spect_format,
         assert spect_path.name.startswith(audio_fname)
         # make sure it's some valid audio format
         assert Path(audio_fname).suffix.replace('.', '') in VALID_AUDIO_FORMATS
+
+
+@pytest.mark.parametrize(
+    'spect_format, compressed',
+    [
+        ('mat', False),
+        ('npz', False),
+        ('npz', True),
+    ]
+)
+def test_shape(spect_format, compressed, tmp_path):
+    spect = np.random.default_rng(0).random((33, 151))
+    spect_path = tmp_path / f'spect.{spect_format}'
+    if spect_format == 'mat':
+        savemat(spect_path, {'s': spect, 't': np.arange(151)})
+    elif compressed:
+        np.savez_compressed(spect_path, s=spect, t=np.arange(151))
+    else:
+        np.savez(spect_path, s=spect, t=np.arange(151))
+
+    assert vak.files.spect.shape(spect_path) == spect.shape
+    assert vak.files.spect.shape(spect_path, spect_key='t')[-1] == 151
+
+
+@pytest.mark.parametrize(
+    'dtype, atol',
+    [
+        ('float16', 1e-2),
+        ('uint8', 20. / 255),
+    ]
+)
+def test_quantize_load(dtype, atol, tmp_path):
+    spect = np.random.default_rng(0).uniform(-10., 10., size=(33, 151))
+    spect_dict = {'s': spect, 't': np.arange(151), 'audio_path': 'bird.wav'}
+    spect_path = tmp_path / 'bird.wav.spect.npz'
+    np.savez(spect_path, **vak.files.spect.quantize(spect_dict, 's', dtype))
+
+    loaded = vak.files.spect.load(spect_path)
+    assert loaded['s'].dtype == vak.files.spect.DEQUANTIZED_DTYPE
+    assert np.allclose(loaded['s'], spect, atol=atol)
+    assert np.array_equal(loaded['t'], spect_dict['t'])
+    assert set(loaded.keys()) == set(spect_dict.keys())
+    # shape can still be read from header without loading
+    assert vak.files.spect.shape(spect_path) == spect.shape
+
+
+def test_quantize_invalid_dtype_raises():
+    with pytest.raises(ValueError):
+        vak.files.spect.quantize({'s': np.zeros((3, 3))}, 's', 'int4')
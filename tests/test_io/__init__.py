@@ -1,3 +1,4 @@
 from . import test_audio
 from . import test_dataframe
 from . import test_dataframe
+from . import test_window_store
@@ -1,7 +1,9 @@
 """tests for vak.io.dataframe module"""
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pytest
 
 import vak.annotation
 import vak.constants
@@ -299,3 +301,33 @@ def test_add_split_col(audio_dir_cbin,
     assert 'split' in vak_df.columns
 
     assert vak_df['split'].unique().item() == 'train'
+
+
+def test_n_freqbins_from_df():
+    df = pd.DataFrame({'spect_path': ['a.npz', 'b.npz'], 'n_freqbins': [257, 257]})
+    assert vak.io.dataframe.n_freqbins_from_df(df) == 257
+
+    # returns None for a DataFrame prepared without 'n_freqbins'
+    assert vak.io.dataframe.n_freqbins_from_df(df.drop(columns='n_freqbins')) is None
+
+    df['n_freqbins'] = [257, 129]
+    with pytest.raises(ValueError):
+        vak.io.dataframe.n_freqbins_from_df(df)
+
+
+def test_timebin_bounds_from_df():
+    df = pd.DataFrame({'spect_path': ['a.npz', 'b.npz'],
+                       'first_timebin': [0.001, 0.001],
+                       'last_timebin': [0.299, 0.193]})
+    timebin_bounds = vak.io.dataframe.timebin_bounds_from_df(df)
+    assert timebin_bounds.shape == (2, 2)
+    assert np.array_equal(timebin_bounds, [[0.001, 0.299], [0.001, 0.193]])
+
+    # returns None for a DataFrame prepared without the columns
+    assert vak.io.dataframe.timebin_bounds_from_df(df.drop(columns='last_timebin')) is None
+
+    # rows left empty by prep are NaN, so only those files are loaded
+    df.loc[1, ['first_timebin', 'last_timebin']] = np.nan
+    timebin_bounds = vak.io.dataframe.timebin_bounds_from_df(df)
+    assert np.array_equal(timebin_bounds[0], [0.001, 0.299])
+    assert np.all(np.isnan(timebin_bounds[1]))
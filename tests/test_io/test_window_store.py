@@ -0,0 +1,50 @@
+"""tests for vak.io.window_store module"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import vak.io.window_store
+
+
+@pytest.fixture
+def split_df(tmp_path):
+    """makes a DataFrame representing a dataset with a training split
+    and a validation split, with spectrograms of different lengths"""
+    rng = np.random.default_rng(0)
+    records = []
+    for file_num, (n_timebins, split) in enumerate(((30, 'train'), (12, 'val'), (45, 'train'))):
+        spect_path = tmp_path / f'{file_num}.spect.npz'
+        np.savez(spect_path, s=rng.random((6, n_timebins)), t=np.arange(n_timebins) * 0.002)
+        records.append({'spect_path': str(spect_path), 'split': split})
+    return pd.DataFrame.from_records(records)
+
+
+def test_to_window_store(split_df, tmp_path):
+    store_path = tmp_path / f'dataset{vak.io.window_store.WINDOW_STORE_EXT}'
+    df = vak.io.window_store.to_window_store(split_df, store_path, split='train')
+
+    train_df = df[df['split'] == 'train']
+    assert vak.io.window_store.has_window_store(train_df)
+    assert not vak.io.window_store.has_window_store(df)
+
+    csv_path = tmp_path / 'dataset.csv'
+    df.to_csv(csv_path, index=False)
+    train_df = pd.read_csv(csv_path)
+    train_df = train_df[train_df['split'] == 'train']
+    returned_store_path, offsets = vak.io.window_store.from_df(train_df)
+    assert returned_store_path == str(store_path)
+    assert np.array_equal(offsets, [0, 30])
+
+    store = vak.io.window_store.load(returned_store_path)
+    assert isinstance(store, np.memmap)
+    assert store.dtype == vak.io.window_store.WINDOW_STORE_DTYPE
+    assert store.shape == (75, 6)
+    for spect_path, offset in zip(train_df['spect_path'], offsets):
+        spect = np.load(spect_path)['s']
+        assert np.allclose(store[offset:offset + spect.shape[-1]].T,
+                           spect.astype(vak.io.window_store.WINDOW_STORE_DTYPE))
+
+
+def test_to_window_store_no_split_raises(split_df, tmp_path):
+    with pytest.raises(ValueError):
+        vak.io.window_store.to_window_store(split_df, tmp_path / 'store.npy', split='test')
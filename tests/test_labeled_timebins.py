@@ -190,3 +190,53 @@ def test_lbl_tb2segments_majority_vote():
     assert np.all(
         np.char.equal(labels_out, np.array(['a', 'b']))
     )
+
+
+def test_unsegment_lbl_tb():
+    lbl_tb = np.array([0, 0, 1, 1, 1, 0, 2, 2, 0, 0, 0, 3])
+    labels, onset_inds, offset_inds = vak.labeled_timebins._segment_lbl_tb(lbl_tb)
+    assert np.array_equal(vak.labeled_timebins._unsegment_lbl_tb(labels, onset_inds, offset_inds), lbl_tb)
+
+
+@pytest.mark.parametrize(
+    'n_timebins',
+    [1, 2, 150]
+)
+def test_label_timebins_from_bounds(n_timebins):
+    timebin_dur = 0.002
+    time_bins = np.arange(n_timebins) * timebin_dur + timebin_dur / 2
+    rng = np.random.default_rng(0)
+    # halfway between time bins, exactly on time bins, at random times, and outside the time bins
+    times = np.concatenate((
+        np.arange(n_timebins + 1) * timebin_dur,
+        time_bins,
+        rng.uniform(0, n_timebins * timebin_dur, 50),
+        [-0.5, n_timebins * timebin_dur + 0.5],
+    ))
+    for onsets_s, offsets_s in ((times[:-1], times[1:]), (np.sort(times), np.sort(times))):
+        labels_int = np.arange(onsets_s.shape[-1]) % 4 + 1
+        assert vak.labeled_timebins.timebin_bounds_match(time_bins, onsets_s, offsets_s)
+        expected = vak.labeled_timebins.label_timebins(labels_int, onsets_s, offsets_s, time_bins)
+        lbl_tb = vak.labeled_timebins.label_timebins_from_bounds(labels_int, onsets_s, offsets_s,
+                                                                 n_timebins, time_bins[0], time_bins[-1])
+        assert np.array_equal(lbl_tb, expected)
+
+
+def test_timebin_bounds_match():
+    timebin_dur = 0.002
+    n_timebins = 1000
+    time_bins = np.arange(n_timebins) * timebin_dur + timebin_dur / 2
+    midpoints = np.arange(1, n_timebins) * timebin_dur
+    matches = np.array([vak.labeled_timebins.timebin_bounds_match(time_bins, [midpoint], [midpoint])
+                        for midpoint in midpoints])
+    # floating point error in time bins decides which bin some midpoints are nearest to
+    assert not np.all(matches)
+    for midpoint, match in zip(midpoints, matches):
+        lbl_tb = vak.labeled_timebins.label_timebins_from_bounds([1], [midpoint], [midpoint], n_timebins,
+                                                                 time_bins[0], time_bins[-1])
+        expected = vak.labeled_timebins.label_timebins([1], [midpoint], [midpoint], time_bins)
+        assert np.array_equal(lbl_tb, expected) == match
+
+    # times that are not near a midpoint always match; times do not have to be known
+    assert vak.labeled_timebins.timebin_bounds_match(time_bins, midpoints + 0.0003, midpoints + 0.0007)
+    assert not vak.labeled_timebins.timebin_bounds_match(time_bins, None, None)
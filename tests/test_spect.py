@@ -0,0 +1,142 @@
+"""tests for ``vak.spect`` module"""
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+import torch
+from matplotlib.mlab import specgram
+
+import vak.spect
+
+
+SAMP_FREQ = 32000
+
+
+def mlab_spectrogram(dat, samp_freq, fft_size=512, step_size=64, thresh=None, transform_type=None,
+                     freq_cutoffs=None):
+    """``vak.spect.spectrogram`` as it was implemented with ``matplotlib.mlab.specgram``,
+    to test that output is numerically equivalent"""
+    if freq_cutoffs:
+        dat = vak.spect.butter_bandpass_filter(dat, freq_cutoffs[0], freq_cutoffs[1], samp_freq)
+
+    spect, freqbins, timebins = specgram(dat, fft_size, samp_freq, noverlap=fft_size - step_size)[:3]
+
+    if transform_type:
+        if transform_type == 'log_spect':
+            spect /= spect.max()
+            spect = np.log10(spect)
+            if thresh:
+                spect[spect < -thresh] = -thresh
+        elif transform_type == 'log_spect_plus_one':
+            spect = np.log10(spect + 1)
+            if thresh:
+                spect[spect < thresh] = thresh
+    else:
+        if thresh:
+            spect[spect < thresh] = thresh
+
+    if freq_cutoffs:
+        f_inds = np.nonzero((freqbins >= freq_cutoffs[0]) &
+                            (freqbins < freq_cutoffs[1]))[0]
+        spect = spect[f_inds, :]
+        freqbins = freqbins[f_inds]
+
+    return spect, freqbins, timebins
+
+
+@pytest.mark.parametrize(
+    'n_samples, fft_size, step_size, thresh, transform_type, freq_cutoffs',
+    [
+        (SAMP_FREQ, 512, 64, None, None, None),
+        (SAMP_FREQ, 512, 64, 6.25, 'log_spect', [500, 10000]),
+        (SAMP_FREQ, 512, 64, 0.5, 'log_spect_plus_one', None),
+        (SAMP_FREQ, 511, 32, 1e-6, None, None),
+        (SAMP_FREQ * 5, 1024, 128, 6.25, 'log_spect', None),
+        (300, 512, 64, None, None, None),
+    ]
+)
+def test_spectrogram_matches_mlab(n_samples, fft_size, step_size, thresh, transform_type, freq_cutoffs):
+    rng = np.random.default_rng(0)
+    dat = (rng.standard_normal(n_samples) * 2 ** 12).astype(np.int16)
+
+    spect, freqbins, timebins = vak.spect.spectrogram(dat, SAMP_FREQ, fft_size, step_size, thresh,
+                                                      transform_type, freq_cutoffs)
+    expected_spect, expected_freqbins, expected_timebins = mlab_spectrogram(dat, SAMP_FREQ, fft_size, step_size,
+                                                                            thresh, transform_type, freq_cutoffs)
+
+    assert spect.shape == expected_spect.shape
+    assert spect.dtype == np.float64
+    assert spect.flags['C_CONTIGUOUS']
+    np.testing.assert_allclose(spect, expected_spect, rtol=1e-7, atol=1e-12)
+    np.testing.assert_array_equal(freqbins, expected_freqbins)
+    np.testing.assert_array_equal(timebins, expected_timebins)
+
+
+def test_spectrogram_float32():
+    rng = np.random.default_rng(0)
+    dat = (rng.standard_normal(SAMP_FREQ) * 2 ** 12).astype(np.int16)
+
+    spect32, _, _ = vak.spect.spectrogram(dat, SAMP_FREQ, thresh=6.25, transform_type='log_spect', dtype='float32')
+    spect64, _, _ = vak.spect.spectrogram(dat, SAMP_FREQ, thresh=6.25, transform_type='log_spect')
+
+    assert spect32.dtype == np.float32
+    np.testing.assert_allclose(spect32, spect64, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize(
+    'fft_size, step_size, thresh, transform_type, freq_cutoffs',
+    [
+        (512, 64, None, None, None),
+        (512, 64, 6.25, 'log_spect', [500, 10000]),
+        (512, 64, 0.5, 'log_spect_plus_one', None),
+        (511, 32, 1e-6, None, [500, 10000]),
+    ]
+)
+def test_spectrograms_torch_matches_numpy(fft_size, step_size, thresh, transform_type, freq_cutoffs):
+    rng = np.random.default_rng(0)
+    # two files with the same length, that are stacked into one batch, and one with a different length
+    dats = [(rng.standard_normal(n_samples) * 2 ** 12).astype(np.int16)
+            for n_samples in (SAMP_FREQ, SAMP_FREQ // 2, SAMP_FREQ)]
+
+    spects = vak.spect.spectrograms_torch(dats, SAMP_FREQ, fft_size, step_size, thresh, transform_type, freq_cutoffs)
+
+    assert len(spects) == len(dats)
+    for dat, (spect, freqbins, timebins) in zip(dats, spects):
+        expected_spect, expected_freqbins, expected_timebins = vak.spect.spectrogram(
+            dat, SAMP_FREQ, fft_size, step_size, thresh, transform_type, freq_cutoffs
+        )
+        assert spect.shape == expected_spect.shape
+        assert spect.dtype == np.float64
+        np.testing.assert_allclose(spect, expected_spect, rtol=1e-6, atol=1e-9)
+        np.testing.assert_array_equal(freqbins, expected_freqbins)
+        np.testing.assert_array_equal(timebins, expected_timebins)
+
+
+def test_butter_bandpass_filter_torch():
+    rng = np.random.default_rng(0)
+    dat = rng.standard_normal((2, SAMP_FREQ))
+
+    filtered = vak.spect.butter_bandpass_filter_torch(torch.from_numpy(dat), 500, 10000, SAMP_FREQ)
+
+    expected = vak.spect.butter_bandpass_filter(dat, 500, 10000, SAMP_FREQ)
+    np.testing.assert_allclose(filtered.numpy(), expected, atol=1e-9)
+
+
+def test_numpy_backend_does_not_import_torch():
+    # load the module by itself, since importing the vak package imports torch
+    code = textwrap.dedent(f"""
+        import importlib.util
+        import sys
+
+        import numpy as np
+
+        module_spec = importlib.util.spec_from_file_location('spect', {vak.spect.__file__!r})
+        spect = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(spect)
+        spect.spectrogram(np.random.default_rng(0).normal(size={SAMP_FREQ}), {SAMP_FREQ},
+                          freq_cutoffs=[500, 10000], backend='numpy')
+        assert 'torch' not in sys.modules
+    """)
+    subprocess.run([sys.executable, '-c', code], check=True)